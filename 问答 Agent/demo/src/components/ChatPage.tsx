@@ -37,6 +37,7 @@ export function ChatPage({
     sendMessage,
     confirmAllPrototypeEdits,
     cancelAllPrototypeEdits,
+    undoLastPrototypeEdit,
     editActionLoading,
     newSession,
     selectSession,
@@ -104,6 +105,7 @@ export function ChatPage({
           loading={editActionLoading}
           onConfirmAll={(pending) => void confirmAllPrototypeEdits(pending)}
           onCancelAll={(pending) => void cancelAllPrototypeEdits(pending)}
+          onUndoLast={(pending) => void undoLastPrototypeEdit(pending)}
         />
         <InputBar onSend={sendMessage} disabled={isGenerating || editActionLoading} />
       </main>
@@ -35,6 +35,9 @@ function toFormValues(config: AppConfig): ConfigFormValues {
     rerankEnabled: config.rerankEnabled ?? true,
     rerankCandidates: config.rerankCandidates ?? 20,
     rrfK: config.rrfK ?? 60,
+    rerankModel: config.rerankModel ?? '',
+    rerankBaseUrl: config.rerankBaseUrl ?? '',
+    contextTokens: config.contextTokens ?? 1800,
   };
 }
 
@@ -277,8 +280,45 @@ export function ConfigPage({ onBack }: ConfigPageProps) {
                     />
                   </div>
                 </div>
+                <div className="config-page__row">
+                  <div className="config-page__field">
+                    <label className="config-page__label" htmlFor="rerankModel">
+                      重排模型（可选）
+                    </label>
+                    <Input
+                      id="rerankModel"
+                      value={form.rerankModel}
+                      placeholder="如 bge-reranker-v2-m3，留空使用线性融合"
+                      onChange={(e) => patch('rerankModel', e.target.value)}
+                    />
+                  </div>
+                  <div className="config-page__field">
+                    <label className="config-page__label" htmlFor="rerankBaseUrl">
+                      重排服务地址
+                    </label>
+                    <Input
+                      id="rerankBaseUrl"
+                      value={form.rerankBaseUrl}
+                      placeholder="留空沿用 Base URL，请求 {地址}/rerank"
+                      onChange={(e) => patch('rerankBaseUrl', e.target.value)}
+                    />
+                  </div>
+                </div>
+                <div className="config-page__field">
+                  <label className="config-page__label" htmlFor="contextTokens">
+                    参考文档 token 预算
+                  </label>
+                  <Input
+                    id="contextTokens"
+                    type="number"
+                    min={300}
+                    max={8000}
+                    value={String(form.contextTokens)}
+                    onChange={(e) => patch('contextTokens', Number(e.target.value))}
+                  />
+                </div>
                 <p className="config-page__hint">
-                  混合检索对关键词精确匹配更友好；重排会在 Top-N 候选内二次打分。召回测试可查看 vector / bm25 / fusion 分量。
+                  混合检索对关键词精确匹配更友好；重排会在 Top-N 候选内二次打分；配置重排模型后同一 query 的候选一次性送入本地 rerank 服务，响应超时则本次回退线性融合。召回测试可查看 vector / bm25 / fusion 分量。同一章节的命中会去重合并，再按分数填入 token 预算。
                 </p>
               </section>
 
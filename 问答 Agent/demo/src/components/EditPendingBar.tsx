@@ -10,6 +10,7 @@ interface EditPendingBarProps {
   loading?: boolean;
   onConfirmAll: (pending: PrototypeEditPendingState) => void;
   onCancelAll: (pending: PrototypeEditPendingState) => void;
+  onUndoLast: (pending: PrototypeEditPendingState) => void;
 }
 
 function collectUnresolvedPending(
@@ -35,6 +36,7 @@ export function EditPendingBar({
   loading = false,
   onConfirmAll,
   onCancelAll,
+  onUndoLast,
 }: EditPendingBarProps) {
   const [collapsed, setCollapsed] = useState(false);
   const pending = useMemo(() => collectUnresolvedPending(editState, messages), [editState, messages]);
@@ -122,6 +124,16 @@ export function EditPendingBar({
         >
           {loading ? '处理中…' : '全部确认'}
         </Button>
+        {revision > 1 && (
+          <Button
+            type="default"
+            size="small"
+            disabled={loading}
+            onClick={() => onUndoLast(pending)}
+          >
+            撤销上一轮
+          </Button>
+        )}
         <Button
           type="default"
           size="small"
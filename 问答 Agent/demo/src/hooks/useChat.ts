@@ -1,7 +1,7 @@
 import { useCallback, useState } from 'react';
 import { createMessage, useChatSessions } from '../hooks/useChatSessions';
 import { streamChat } from '../services/chatApi';
-import { cancelPrototypeEdit, confirmPrototypeEdit } from '../services/prototypeApi';
+import { cancelPrototypeEdit, confirmPrototypeEdit, undoPrototypeEdit } from '../services/prototypeApi';
 import type { ChatRequestMessage, PrototypeEditPendingState } from '../types/chat';
 
 const EDIT_CONFIRM_RE = /^(确认|确认替换|应用修改|就这样|可以了|好的确认|确认修改)(吧|了)?[。！!]?$/i;
@@ -246,6 +246,66 @@ export function useChat(
     [activeId, appendMessage, editActionLoading, isGenerating, patchMessage, patchSessionContext, resolvePrototypeEditPending],
   );
 
+  const undoLastPrototypeEdit = useCallback(
+    async (pending: PrototypeEditPendingState) => {
+      if (!pending.editId || !pending.pageId || editActionLoading || isGenerating) return;
+      const sessionId = activeId;
+      setEditActionLoading(true);
+
+      const assistantId = crypto.randomUUID();
+      appendMessage(
+        sessionId,
+        createMessage('assistant', { id: assistantId, content: '正在撤销上一轮修改…', streaming: true }),
+      );
+
+      try {
+        const result = await undoPrototypeEdit(pending.pageId, pending.editId);
+        if (result.cancelled) {
+          resolvePrototypeEditPending(sessionId, pending.editId, 'cancelled');
+          patchSessionContext(sessionId, { prototypeEditState: null });
+          patchMessage(sessionId, assistantId, {
+            content: '已撤销唯一一轮修改，草稿已取消，当前原型保持不变。',
+            streaming: false,
+          });
+          return;
+        }
+        const next: PrototypeEditPendingState = {
+          ...pending,
+          phase: 'await_confirm',
+          summary: result.summary ?? pending.summary,
+          previewUrl: result.previewUrl || pending.previewUrl,
+          instruction: result.instruction ?? pending.instruction,
+          instructions: result.instructions ?? pending.instructions,
+          revision: result.revision ?? pending.revision,
+          editSlots: result.editSlots ?? pending.editSlots,
+        };
+        patchSessionContext(sessionId, { prototypeEditState: next });
+        patchMessage(sessionId, assistantId, {
+          content: `已撤销上一轮修改，草稿回到第 ${next.revision ?? 1} 轮：**${next.summary ?? ''}**\n\n可继续描述修改内容，或在上方确认 / 取消草稿。`,
+          streaming: false,
+        });
+      } catch (err) {
+        if (isAlreadyHandledEditError(err)) {
+          resolvePrototypeEditPending(sessionId, pending.editId, 'cancelled');
+          patchSessionContext(sessionId, { prototypeEditState: null });
+          patchMessage(sessionId, assistantId, {
+            content: '该修改已应用或失效，无法撤销。',
+            streaming: false,
+          });
+        } else {
+          patchMessage(sessionId, assistantId, {
+            content: err instanceof Error ? err.message : '撤销失败',
+            streaming: false,
+            refused: true,
+          });
+        }
+      } finally {
+        setEditActionLoading(false);
+      }
+    },
+    [activeId, appendMessage, editActionLoading, isGenerating, patchMessage, patchSessionContext, resolvePrototypeEditPending],
+  );
+
   const triggerPrototypePreview = useCallback(() => {
     if (isGenerating) return;
     onOpenPrototypePreview?.();
@@ -263,6 +323,7 @@ export function useChat(
     sendMessage,
     confirmAllPrototypeEdits,
     cancelAllPrototypeEdits,
+    undoLastPrototypeEdit,
     newSession,
     selectSession,
     deleteSession,
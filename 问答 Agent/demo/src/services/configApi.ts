@@ -21,6 +21,9 @@ export async function saveConfig(values: ConfigFormValues): Promise<AppConfig> {
     rerankEnabled: values.rerankEnabled,
     rerankCandidates: values.rerankCandidates,
     rrfK: values.rrfK,
+    rerankModel: values.rerankModel.trim(),
+    rerankBaseUrl: values.rerankBaseUrl.trim(),
+    contextTokens: values.contextTokens,
   };
 
   const key = values.openaiApiKey.trim();
@@ -3,8 +3,10 @@ import type {
   ChunkPreviewResult,
   KnowledgeBaseDetail,
   KnowledgeBaseListResponse,
+  KnowledgeBaseRetrievalOverrides,
   KnowledgeBaseSummary,
   RetrieveTestResult,
+  VectorQuantization,
 } from '../types/kb';
 
 const API_BASE = import.meta.env.VITE_API_BASE ?? '';
@@ -49,6 +51,9 @@ export async function updateKnowledgeBase(
     content: string;
     chunkSize: number;
     chunkOverlap: number;
+    vectorQuantization: VectorQuantization;
+    rescoreCandidates: number;
+    retrieval: KnowledgeBaseRetrievalOverrides;
   }>,
 ): Promise<KnowledgeBaseDetail> {
   const res = await fetch(`${API_BASE}/api/knowledge-bases/${id}`, {
@@ -106,7 +111,7 @@ export async function rebuildKnowledgeBase(id: string): Promise<{ message?: stri
 
 export async function runBatchRecallEval(
   id: string,
-  options?: { topK?: number; minScore?: number },
+  options?: { topK?: number; minScore?: number; quantization?: VectorQuantization },
 ): Promise<BatchRecallEvalResult> {
   const res = await fetch(`${API_BASE}/api/knowledge-bases/${id}/recall-eval-batch`, {
     method: 'POST',
@@ -114,6 +119,7 @@ export async function runBatchRecallEval(
     body: JSON.stringify({
       topK: options?.topK,
       minScore: options?.minScore,
+      quantization: options?.quantization,
     }),
   });
   if (!res.ok) throw new Error(await parseError(res));
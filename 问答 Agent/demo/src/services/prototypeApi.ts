@@ -1,5 +1,5 @@
 import type { PrototypeArchiveItem } from '../types/chat';
-import type { PrototypeEditConfirmResult } from '../types/prototypeEdit';
+import type { PrototypeEditConfirmResult, PrototypeEditUndoResult } from '../types/prototypeEdit';
 import type { PrototypeDesign, PrototypeGenerateResult } from '../types/prototypeDesign';
 
 const API_BASE = import.meta.env.VITE_API_BASE ?? '';
@@ -58,6 +58,18 @@ export async function cancelPrototypeEdit(pageId: string, editId: string): Promi
   }
 }
 
+export async function undoPrototypeEdit(pageId: string, editId: string): Promise<PrototypeEditUndoResult> {
+  const res = await fetch(`${API_BASE}/api/prototypes/${encodeURIComponent(pageId)}/edit-undo`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ editId }),
+  });
+  if (!res.ok) {
+    throw new Error(await res.text().catch(() => `HTTP ${res.status}`));
+  }
+  return (await res.json()) as PrototypeEditUndoResult;
+}
+
 export function resolvePreviewUrl(previewUrl: string): string {
   if (previewUrl.startsWith('http://') || previewUrl.startsWith('https://')) {
     return previewUrl;
@@ -12,6 +12,9 @@ export interface AppConfig {
   rerankEnabled: boolean;
   rerankCandidates: number;
   rrfK: number;
+  rerankModel: string;
+  rerankBaseUrl: string;
+  contextTokens: number;
   apiKeySet: boolean;
   apiKeyMasked: string;
   activeKbId?: string;
@@ -30,4 +33,7 @@ export interface ConfigFormValues {
   rerankEnabled: boolean;
   rerankCandidates: number;
   rrfK: number;
+  rerankModel: string;
+  rerankBaseUrl: string;
+  contextTokens: number;
 }
@@ -1,9 +1,24 @@
+export type VectorQuantization = 'none' | 'float16' | 'int8';
+
+/** 知识库级检索参数覆盖（未设置的项沿用全局配置） */
+export interface KnowledgeBaseRetrievalOverrides {
+  topK?: number | null;
+  minScore?: number | null;
+  hybridSearch?: boolean | null;
+  rerankEnabled?: boolean | null;
+  rerankCandidates?: number | null;
+  rrfK?: number | null;
+}
+
 export interface KnowledgeBaseSummary {
   id: string;
   name: string;
   description: string;
   chunkSize: number;
   chunkOverlap: number;
+  vectorQuantization?: VectorQuantization;
+  rescoreCandidates?: number;
+  retrieval?: KnowledgeBaseRetrievalOverrides;
   createdAt?: string;
   updatedAt?: string;
   active: boolean;
@@ -91,5 +106,7 @@ export interface BatchRecallEvalResult {
   passed: number;
   failed: number;
   passRate: number;
+  quantization?: VectorQuantization | null;
+  vectorBytes?: number;
   cases: BatchRecallCaseResult[];
 }
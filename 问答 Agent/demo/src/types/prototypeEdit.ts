@@ -22,3 +22,17 @@ export interface PrototypeEditConfirmResult {
   previewUrl: string;
   summary?: string;
 }
+
+export interface PrototypeEditUndoResult {
+  ok: boolean;
+  pageId: string;
+  editId: string;
+  /** 已撤销到首个修订之前，草稿被取消 */
+  cancelled: boolean;
+  summary?: string;
+  previewUrl?: string;
+  instruction?: string;
+  instructions?: string[];
+  revision?: number;
+  editSlots?: Record<string, unknown>;
+}
@@ -3,13 +3,31 @@
 from __future__ import annotations
 
 import argparse
+import hashlib
 import json
+import os
 import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
 from pathlib import Path
 
 ROOT = Path(__file__).resolve().parent.parent
 REPO_ROOT = ROOT.parent
 TEMPLATE = ROOT / "templates" / "index.html.template"
+GENERATED_DIR = ROOT / "generated"
+PERSISTED_SPECS_DIR = REPO_ROOT / "data" / "prototypes" / "specs"
+# 批量生成记录：pageId → spec + 模板哈希，二者未变且产物齐全时跳过
+BATCH_MANIFEST = GENERATED_DIR / ".generate-manifest.json"
+# 逻辑说明 HTML 缓存条数（按 logicDocs 内容哈希）
+LOGIC_HTML_CACHE_SIZE = 128
+
+_digest_lock = threading.Lock()
+# 已知文件内容摘要：路径 → ((mtime_ns, size), sha256)，stat 未变时无需重读文件比较
+_file_digests: dict[str, tuple[tuple[int, int], str]] = {}
+_logic_html_cache: OrderedDict[str, str] = OrderedDict()
 
 
 def _load_spec(path: Path) -> dict:
@@ -26,11 +44,56 @@ def _load_spec(path: Path) -> dict:
 
 
 def os_path_relpath(target: Path, base: Path) -> str:
-    import os
-
     return os.path.relpath(target, base)
 
 
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _stamp(path: Path) -> tuple[int, int] | None:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _current_digest(path: Path) -> str | None:
+    key = str(path)
+    stamp = _stamp(path)
+    if stamp is None:
+        return None
+    with _digest_lock:
+        known = _file_digests.get(key)
+    if known and known[0] == stamp:
+        return known[1]
+    try:
+        digest = _digest(path.read_bytes())
+    except OSError:
+        return None
+    with _digest_lock:
+        _file_digests[key] = (stamp, digest)
+    return digest
+
+
+def write_if_changed(path: Path, text: str) -> bool:
+    """内容哈希与磁盘一致时跳过；否则写临时文件后 rename（静态服务不会读到半截文件）。返回是否写入。"""
+    data = text.encode("utf-8")
+    digest = _digest(data)
+    if _current_digest(path) == digest:
+        return False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+    stamp = _stamp(path)
+    if stamp is not None:
+        with _digest_lock:
+            _file_digests[str(path)] = (stamp, digest)
+    return True
+
+
 def _href_dir(target: Path, from_dir: Path) -> str:
     rel = Path(os_path_relpath(target, from_dir)).as_posix()
     if not rel.endswith("/"):
@@ -97,6 +160,22 @@ def render_logic_docs(spec: dict) -> str:
     )
 
 
+def cached_logic_docs(spec: dict) -> str:
+    """render_logic_docs 按 logicDocs 内容哈希缓存；编辑未改动逻辑说明时不重复渲染。"""
+    key = _digest(json.dumps(spec.get("logicDocs") or {}, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+    with _digest_lock:
+        html = _logic_html_cache.get(key)
+        if html is not None:
+            _logic_html_cache.move_to_end(key)
+            return html
+    html = render_logic_docs(spec)
+    with _digest_lock:
+        _logic_html_cache[key] = html
+        while len(_logic_html_cache) > LOGIC_HTML_CACHE_SIZE:
+            _logic_html_cache.popitem(last=False)
+    return html
+
+
 def render_index(spec: dict, out_dir: Path) -> str:
     html = TEMPLATE.read_text(encoding="utf-8")
     skeleton_href = _href_dir(ROOT, out_dir)
@@ -106,7 +185,7 @@ def render_index(spec: dict, out_dir: Path) -> str:
     )
 
 
-def write_module_config(spec: dict, path: Path, *, logic_html: str) -> None:
+def write_module_config(spec: dict, path: Path, *, logic_html: str) -> bool:
     runtime = dict(spec)
     runtime["mockData"] = spec.get("mockData") or []
     runtime["logicDocsHtml"] = logic_html
@@ -114,13 +193,21 @@ def write_module_config(spec: dict, path: Path, *, logic_html: str) -> None:
         runtime["changelog"] = spec["changelog"]
     runtime.pop("logicDocs", None)
     text = "window.MODULE_SPEC = " + json.dumps(runtime, ensure_ascii=False, indent=2) + ";\n"
-    path.write_text(text, encoding="utf-8")
+    return write_if_changed(path, text)
 
 
-def sync_runtime(spec: dict, output_dir: Path, *, bootstrap_html: bool = False) -> Path:
+def sync_runtime(
+    spec: dict,
+    output_dir: Path,
+    *,
+    bootstrap_html: bool = False,
+    runtime_only: bool = False,
+) -> Path:
     """同步 spec 运行时产物：module.spec.json、module-config.js、mock 数据。
 
-    index.html / logic-docs.html 仅在 bootstrap_html=True 或 index.html 缺失时写入。
+    index.html / logic-docs.html 仅在 bootstrap_html=True 或 index.html 缺失时写入；
+    runtime_only=True 时从不写入（草稿目录，HTML 由预览路由按需渲染）。
+    各文件内容未变时跳过写入，变化时以临时文件 + rename 原子替换。
     """
     out = output_dir
     out.mkdir(parents=True, exist_ok=True)
@@ -129,17 +216,13 @@ def sync_runtime(spec: dict, output_dir: Path, *, bootstrap_html: bool = False)
 
     data_file = str(spec.get("dataFile") or f"data/{spec['pageId']}-data.json")
     mock = spec.get("mockData") or []
-    data_path = out / data_file
-    data_path.parent.mkdir(parents=True, exist_ok=True)
-    data_path.write_text(json.dumps(mock, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    write_if_changed(out / data_file, json.dumps(mock, ensure_ascii=False, indent=2) + "\n")
 
     spec_copy = dict(spec)
     spec_copy["dataFile"] = data_file
-    (out / "module.spec.json").write_text(
-        json.dumps(spec_copy, ensure_ascii=False, indent=2) + "\n", encoding="utf-8"
-    )
+    write_if_changed(out / "module.spec.json", json.dumps(spec_copy, ensure_ascii=False, indent=2) + "\n")
 
-    logic_html = render_logic_docs(spec)
+    logic_html = cached_logic_docs(spec)
     write_module_config(
         spec,
         out / "js" / "module-config.js",
@@ -147,9 +230,9 @@ def sync_runtime(spec: dict, output_dir: Path, *, bootstrap_html: bool = False)
     )
 
     index_path = out / "index.html"
-    if bootstrap_html or not index_path.is_file():
-        index_path.write_text(render_index(spec, out), encoding="utf-8")
-        (out / "logic-docs.html").write_text(logic_html, encoding="utf-8")
+    if not runtime_only and (bootstrap_html or not index_path.is_file()):
+        write_if_changed(index_path, render_index(spec, out))
+        write_if_changed(out / "logic-docs.html", logic_html)
 
     return out
 
@@ -160,9 +243,121 @@ def generate(spec_path: Path, output_dir: Path | None = None) -> Path:
     return sync_runtime(spec, out, bootstrap_html=True)
 
 
+@dataclass
+class BatchJob:
+    page_id: str
+    spec_path: Path
+    out_dir: Path
+    digest: str
+
+
+def _template_digest() -> str:
+    """影响生成结果的模板指纹：index.html 模板与本脚本（render_logic_docs 等渲染逻辑）。"""
+    h = hashlib.sha256()
+    for path in (TEMPLATE, Path(__file__).resolve()):
+        h.update(path.read_bytes())
+    return h.hexdigest()
+
+
+def discover_specs() -> tuple[list[tuple[str, Path]], list[tuple[Path, str]]]:
+    """收集 data/prototypes/specs/*.spec.json 与 generated/*/module.spec.json；同一 pageId 以前者为准。
+
+    generated 下的 spec 是生成产物（生成时会补 dataFile 等字段），只在没有持久化 spec 时作为输入。
+
+    返回 ((pageId, spec 路径) 列表, (无法解析的路径, 错误) 列表)。
+    """
+    candidates = sorted(PERSISTED_SPECS_DIR.glob("*.spec.json")) if PERSISTED_SPECS_DIR.is_dir() else []
+    if GENERATED_DIR.is_dir():
+        candidates += sorted(
+            p for p in GENERATED_DIR.glob("*/module.spec.json") if not p.parent.name.startswith(("_", "."))
+        )
+
+    chosen: dict[str, Path] = {}
+    invalid: list[tuple[Path, str]] = []
+    for path in candidates:
+        try:
+            page_id = str(_load_spec(path)["pageId"])
+        except (ValueError, OSError) as exc:
+            invalid.append((path, str(exc)))
+            continue
+        chosen.setdefault(page_id, path)
+    return sorted(chosen.items()), invalid
+
+
+def _load_manifest() -> dict[str, str]:
+    try:
+        data = json.loads(BATCH_MANIFEST.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return {}
+    return {str(k): str(v) for k, v in data.items()} if isinstance(data, dict) else {}
+
+
+def _regenerate_job(spec_path: str, out_dir: str) -> float:
+    """进程池任务：生成单个模块，返回耗时（秒）。"""
+    started = time.perf_counter()
+    generate(Path(spec_path), Path(out_dir))
+    return time.perf_counter() - started
+
+
+def regenerate_all(*, jobs: int | None = None, force: bool = False) -> int:
+    """批量重新生成全部原型；spec 与模板哈希均未变且产物齐全的模块跳过。返回失败数。"""
+    started = time.perf_counter()
+    template_digest = _template_digest()
+    manifest = _load_manifest()
+    specs, invalid = discover_specs()
+
+    pending: list[BatchJob] = []
+    skipped = 0
+    for page_id, spec_path in specs:
+        out_dir = GENERATED_DIR / page_id
+        # 按解析后的 spec 计算哈希：与文件格式（缩进、键顺序）及 dataFile 等默认字段是否写出无关
+        try:
+            spec_json = json.dumps(_load_spec(spec_path), ensure_ascii=False, sort_keys=True)
+        except (ValueError, OSError) as exc:
+            invalid.append((spec_path, str(exc)))
+            continue
+        digest = hashlib.sha256((template_digest + spec_json).encode("utf-8")).hexdigest()
+        complete = (out_dir / "index.html").is_file() and (out_dir / "js" / "module-config.js").is_file()
+        if not force and complete and manifest.get(page_id) == digest:
+            skipped += 1
+            continue
+        pending.append(BatchJob(page_id, spec_path, out_dir, digest))
+
+    regenerated = 0
+    failures = len(invalid)
+    for path, error in invalid:
+        print(f"  ✗ {path}：{error}")
+    if pending:
+        workers = max(1, min(jobs or os.cpu_count() or 1, len(pending)))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(_regenerate_job, str(job.spec_path), str(job.out_dir)): job for job in pending
+            }
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    elapsed = future.result()
+                except Exception as exc:
+                    failures += 1
+                    manifest.pop(job.page_id, None)
+                    print(f"  ✗ {job.page_id}（{job.spec_path}）：{exc}")
+                    continue
+                regenerated += 1
+                manifest[job.page_id] = job.digest
+                print(f"  ✓ {job.page_id}  {elapsed * 1000:.1f} ms")
+
+    if BATCH_MANIFEST.parent.is_dir():
+        write_if_changed(BATCH_MANIFEST, json.dumps(manifest, ensure_ascii=False, indent=2, sort_keys=True) + "\n")
+    total = time.perf_counter() - started
+    print(
+        f"批量生成完成：重新生成 {regenerated}，跳过未变 {skipped}，失败 {failures}，总耗时 {total:.2f} s"
+    )
+    return failures
+
+
 def main(argv: list[str] | None = None) -> int:
     parser = argparse.ArgumentParser(description="从 module.spec.json 生成原型模块")
-    parser.add_argument("spec", type=Path, help="spec JSON 路径")
+    parser.add_argument("spec", type=Path, nargs="?", help="spec JSON 路径（--all 时省略）")
     parser.add_argument(
         "-o",
         "--output",
@@ -175,7 +370,18 @@ def main(argv: list[str] | None = None) -> int:
         action="store_true",
         help="仅同步 spec 运行时产物（module-config.js 等），不强制重写 index.html",
     )
+    parser.add_argument(
+        "--all",
+        action="store_true",
+        help="批量重新生成 generated/ 与 data/prototypes/specs/ 下的全部原型（跳过 spec 与模板均未变的模块）",
+    )
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="--all 的并行进程数（默认 CPU 核数）")
+    parser.add_argument("--force", action="store_true", help="--all 时忽略哈希记录，全部重新生成")
     args = parser.parse_args(argv)
+    if args.all:
+        return 1 if regenerate_all(jobs=args.jobs, force=args.force) else 0
+    if args.spec is None:
+        parser.error("需要 spec 路径，或使用 --all 批量生成")
     spec_path = args.spec if args.spec.is_absolute() else Path.cwd() / args.spec
     if not spec_path.exists():
         print(f"错误：找不到 spec 文件 {spec_path}", file=sys.stderr)
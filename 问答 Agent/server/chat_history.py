@@ -1,13 +1,100 @@
 """对话历史格式化（供意图识别、RAG、上下文更新共用）。"""
 from __future__ import annotations
 
+from dataclasses import dataclass, field
 
-def format_history_text(messages: list[dict[str, str]], max_turns: int, *, content_limit: int = 300) -> str:
-    """将最近 max_turns 轮对话格式化为可读文本。"""
-    recent = messages[-max_turns * 2 :]
-    lines: list[str] = []
-    for m in recent:
-        role = "用户" if m["role"] == "user" else "助手"
-        content = m["content"][:content_limit]
-        lines.append(f"{role}：{content}")
-    return "\n".join(lines) if lines else "（无）"
+import config
+from token_budget import estimate_tokens, truncate_to_tokens
+
+# 各类提示词中对话历史的 token 预算（按估算值，newest-first 填充）
+HISTORY_BUDGETS: dict[str, int] = {
+    "intent": 600,
+    "rewrite": 500,
+    "rag": 900,
+    "context": 900,
+    "slots": 600,
+    "general": 1600,
+}
+# 单条消息最多占该消费方预算的比例，避免一条长回复挤掉其它轮次
+_MESSAGE_SHARE = 0.4
+_ROLE_LABELS = {"user": "用户", "assistant": "助手"}
+
+
+@dataclass
+class HistoryView:
+    """
+    单次请求内共享的对话历史视图。
+
+    构建时截取最近 max_turns 轮并估算每条消息的 token 数；各提示词按自己的预算取用，
+    同一预算的格式化结果会缓存，意图识别 / 改写 / RAG / 上下文更新不再重复格式化。
+    """
+
+    messages: list[dict[str, str]]
+    max_turns: int
+    _recent: list[dict[str, str]] = field(default_factory=list, repr=False)
+    _tokens: list[int] = field(default_factory=list, repr=False)
+    # 按预算缓存：选中的 (role, 内容) 列表、格式化后的文本
+    _selected: dict[int, list[tuple[str, str]]] = field(default_factory=dict, repr=False)
+    _texts: dict[int, str] = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def build(cls, messages: list[dict[str, str]], max_turns: int | None = None) -> HistoryView:
+        turns = config.HISTORY_TURNS if max_turns is None else max_turns
+        view = cls(messages, turns)
+        # 最后一条是当前提问，历史只取之前的消息
+        view._recent = messages[:-1][-turns * 2 :] if turns > 0 else []
+        view._tokens = [estimate_tokens(m.get("content", "")) for m in view._recent]
+        return view
+
+    @property
+    def last_text(self) -> str:
+        return self.messages[-1]["content"] if self.messages else ""
+
+    def _select(self, budget: int) -> list[tuple[str, str]]:
+        """从最新一条往前装入预算，返回 (role, 截断后内容)，按时间正序。"""
+        cached = self._selected.get(budget)
+        if cached is not None:
+            return cached
+        per_message = max(32, int(budget * _MESSAGE_SHARE))
+        picked: list[tuple[str, str]] = []
+        used = 0
+        for m, tokens in zip(reversed(self._recent), reversed(self._tokens)):
+            content = m.get("content", "")
+            cap = min(per_message, budget - used)
+            if cap <= 0:
+                break
+            if tokens > cap:
+                content = truncate_to_tokens(content, cap)
+                tokens = estimate_tokens(content)
+            picked.append((m.get("role", "user"), content))
+            used += tokens
+        picked.reverse()
+        self._selected[budget] = picked
+        return picked
+
+    def text(self, consumer: str, *, budget: int | None = None) -> str:
+        """按消费方预算格式化为「用户：… / 助手：…」文本。"""
+        limit = budget if budget is not None else HISTORY_BUDGETS[consumer]
+        cached = self._texts.get(limit)
+        if cached is None:
+            lines = [f"{_ROLE_LABELS.get(role, '助手')}：{content}" for role, content in self._select(limit)]
+            cached = "\n".join(lines) if lines else "（无）"
+            self._texts[limit] = cached
+        return cached
+
+    def dialogue(self, consumer: str = "context", *, budget: int | None = None) -> str:
+        """含当前提问的对话文本（上下文摘要更新用）。"""
+        limit = budget if budget is not None else HISTORY_BUDGETS[consumer]
+        last_tokens = min(estimate_tokens(self.last_text), int(limit * _MESSAGE_SHARE))
+        history = self.text(consumer, budget=max(0, limit - last_tokens))
+        last = truncate_to_tokens(self.last_text, max(32, last_tokens))
+        if not self.messages:
+            return history
+        if history == "（无）":
+            return f"用户：{last}"
+        return f"{history}\n用户：{last}"
+
+    def chat_messages(self, consumer: str = "general", *, budget: int | None = None) -> list[dict[str, str]]:
+        """按预算截取为 OpenAI messages 格式（不含当前提问）。"""
+        limit = budget if budget is not None else HISTORY_BUDGETS[consumer]
+        return [{"role": role, "content": content} for role, content in self._select(limit)]
@@ -0,0 +1,148 @@
+"""chunk 正文按偏移量存盘（index.payload.bin），检索时只常驻打分所需字段，命中后再按需读取。
+
+文件布局：
+    MAGIC | u64 头部长度 | 头部 JSON | 偏移数组（int64 / int32）| 数据区（UTF-8）
+
+- 每个 chunk 的 text、metadata（JSON）按偏移切片读取
+- parent_text 按章节去重只存一份，chunk 通过 parent id 引用
+- 数据区以 memmap 只读映射，读取的页由系统页缓存管理，不计入进程常驻内存
+"""
+from __future__ import annotations
+
+import json
+import os
+import struct
+from pathlib import Path
+
+import numpy as np
+
+MAGIC = b"KBPAYLOAD1\n"
+_LEN = struct.Struct("<Q")
+
+
+def _offsets(blobs: list[bytes], start: int = 0) -> np.ndarray:
+    out = np.empty(len(blobs) + 1, dtype=np.int64)
+    out[0] = start
+    if blobs:
+        np.cumsum([len(b) for b in blobs], out=out[1:])
+        out[1:] += start
+    return out
+
+
+def write_chunk_payloads(
+    path: Path,
+    texts: list[str],
+    metadata: list[dict[str, str]],
+    parent_texts: list[str],
+    *,
+    fingerprint: str = "",
+) -> None:
+    """写入 payload 文件（临时文件 + rename）；同一章节（anchor）下各 chunk 的 parent_text 只存一份。"""
+    parent_ids = np.full(len(texts), -1, dtype=np.int32)
+    parent_index: dict[str, int] = {}
+    parents: list[bytes] = []
+    for i, parent in enumerate(parent_texts):
+        if not parent:
+            continue
+        pid = parent_index.get(parent)
+        if pid is None:
+            pid = len(parents)
+            parent_index[parent] = pid
+            parents.append(parent.encode("utf-8"))
+        parent_ids[i] = pid
+
+    text_blobs = [t.encode("utf-8") for t in texts]
+    meta_blobs = [json.dumps(m, ensure_ascii=False).encode("utf-8") if m else b"" for m in metadata]
+    text_off = _offsets(text_blobs)
+    meta_off = _offsets(meta_blobs, int(text_off[-1]))
+    parent_off = _offsets(parents, int(meta_off[-1]))
+
+    arrays = [("textOffsets", text_off), ("metaOffsets", meta_off), ("parentIds", parent_ids), ("parentOffsets", parent_off)]
+    header = {"fingerprint": fingerprint, "chunks": len(texts), "parents": len(parents), "arrays": {}}
+    # 数组区紧跟头部；偏移数组中的值相对数据区起点
+    position = 0
+    for name, array in arrays:
+        header["arrays"][name] = [position, str(array.dtype), int(array.size)]
+        position += array.nbytes
+    header["dataOffset"] = position
+    header_bytes = json.dumps(header).encode("utf-8")
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with tmp.open("wb") as fh:
+        fh.write(MAGIC)
+        fh.write(_LEN.pack(len(header_bytes)))
+        fh.write(header_bytes)
+        for _, array in arrays:
+            fh.write(array.tobytes())
+        for blob in text_blobs:
+            fh.write(blob)
+        for blob in meta_blobs:
+            fh.write(blob)
+        for blob in parents:
+            fh.write(blob)
+    os.replace(tmp, path)
+
+
+class ChunkPayloads:
+    """payload 文件的只读视图；偏移数组常驻内存，正文按需从 memmap 解码。"""
+
+    def __init__(
+        self,
+        data: np.ndarray | None,
+        text_off: np.ndarray,
+        meta_off: np.ndarray,
+        parent_ids: np.ndarray,
+        parent_off: np.ndarray,
+    ) -> None:
+        self._data = data
+        self._text_off = text_off
+        self._meta_off = meta_off
+        self._parent_ids = parent_ids
+        self._parent_off = parent_off
+
+    @classmethod
+    def open(cls, path: Path, *, fingerprint: str = "", chunks: int | None = None) -> ChunkPayloads | None:
+        """打开 payload 文件；格式 / 指纹 / chunk 数不匹配时返回 None。"""
+        with path.open("rb") as fh:
+            if fh.read(len(MAGIC)) != MAGIC:
+                return None
+            (header_len,) = _LEN.unpack(fh.read(_LEN.size))
+            header = json.loads(fh.read(header_len).decode("utf-8"))
+            base = len(MAGIC) + _LEN.size + header_len
+            if fingerprint and header.get("fingerprint") != fingerprint:
+                return None
+            if chunks is not None and int(header.get("chunks", -1)) != chunks:
+                return None
+            arrays: dict[str, np.ndarray] = {}
+            for name, (position, dtype, count) in header["arrays"].items():
+                fh.seek(base + int(position))
+                arrays[name] = np.fromfile(fh, dtype=np.dtype(dtype), count=int(count))
+        data_start = base + int(header["dataOffset"])
+        data_size = int(arrays["parentOffsets"][-1])
+        data = np.memmap(path, dtype=np.uint8, mode="r", offset=data_start, shape=(data_size,)) if data_size else None
+        return cls(data, arrays["textOffsets"], arrays["metaOffsets"], arrays["parentIds"], arrays["parentOffsets"])
+
+    def _slice(self, start: int, end: int) -> str:
+        if self._data is None or end <= start:
+            return ""
+        return self._data[start:end].tobytes().decode("utf-8")
+
+    def text(self, row: int) -> str:
+        return self._slice(int(self._text_off[row]), int(self._text_off[row + 1]))
+
+    def metadata(self, row: int) -> dict[str, str]:
+        raw = self._slice(int(self._meta_off[row]), int(self._meta_off[row + 1]))
+        return json.loads(raw) if raw else {}
+
+    def parent_text(self, row: int) -> str:
+        pid = int(self._parent_ids[row])
+        if pid < 0:
+            return ""
+        return self._slice(int(self._parent_off[pid]), int(self._parent_off[pid + 1]))
+
+    def resident_bytes(self) -> int:
+        return int(self._text_off.nbytes + self._meta_off.nbytes + self._parent_ids.nbytes + self._parent_off.nbytes)
+
+    def mapped_bytes(self) -> int:
+        return int(self._data.nbytes) if self._data is not None else 0
@@ -100,7 +100,7 @@ def _split_section(
     parts: list[RawChunk] = []
     seq = 0
 
-    for block_type, block_text in _extract_blocks(body):
+    for block_no, (block_type, block_text) in enumerate(_extract_blocks(body)):
         if len(block_text) <= chunk_size:
             seq += 1
             parts.append(
@@ -118,6 +118,8 @@ def _split_section(
             )
             continue
 
+        # 滑窗片段：window 标记同一次切分，overlap 为相邻片段的重叠字符数（打包上下文时据此去重）
+        window_meta = {"window": str(block_no), "overlap": str(min(chunk_overlap, chunk_size - 1))}
         start = 0
         while start < len(block_text):
             end = min(start + chunk_size, len(block_text))
@@ -132,7 +134,7 @@ def _split_section(
                     anchor=anchor,
                     parent_text=parent_text,
                     block_type=block_type,
-                    metadata={"anchor": anchor, "blockType": block_type},
+                    metadata={"anchor": anchor, "blockType": block_type, **window_meta},
                 )
             )
             if end >= len(block_text):
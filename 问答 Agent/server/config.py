@@ -9,6 +9,8 @@ KNOWLEDGE_DIR = ROOT / "data" / "knowledge"
 PROTOTYPE_SKELETON_DIR = ROOT / "prototype-skeleton"
 PROTOTYPES_DIR = ROOT / "data" / "prototypes"
 PROTOTYPES_REGISTRY = PROTOTYPES_DIR / "registry.json"
+# 多 worker 共享的运行时状态（代数文件、锁文件）
+RUNTIME_DIR = ROOT / "data" / ".runtime"
 DEMO_DIR = ROOT / "demo"
 DEMO_DIST = DEMO_DIR / "dist"
 CHUNK_SIZE = 400
@@ -17,12 +19,43 @@ CHUNK_OVERLAP = 80
 HOST = os.getenv("HOST", "127.0.0.1")
 PORT = int(os.getenv("PORT", "8000"))
 SERVE_FRONTEND = os.getenv("SERVE_FRONTEND", "true").lower() != "false"
-RELOAD = os.getenv("RELOAD", "true").lower() != "false"
+# uvicorn worker 进程数；大于 1 时为生产模式（关闭热重载与前端监听，各 worker 共享 memmap 索引文件）
+WORKERS = max(1, int(os.getenv("WORKERS", "1")))
+RELOAD = os.getenv("RELOAD", "true").lower() != "false" and WORKERS == 1
 FRONTEND_AUTO_BUILD = os.getenv("FRONTEND_AUTO_BUILD", "true").lower() != "false"
 FRONTEND_WATCH = os.getenv(
     "FRONTEND_WATCH",
     "true" if SERVE_FRONTEND and RELOAD else "false",
-).lower() != "false"
+).lower() != "false" and WORKERS == 1
+# 已加载知识库索引的常驻内存预算（MB）；超出时按 LRU 淘汰非使用中的库
+KB_MEMORY_BUDGET_MB = int(os.getenv("KB_MEMORY_BUDGET_MB", "512"))
+# 启动后后台预热的知识库：all（全部已索引库）/ none / 逗号分隔的 kb_id 列表
+KB_WARMUP = os.getenv("KB_WARMUP", "all").strip()
+# 向量检索 / BM25 打分等 CPU 计算的线程池大小（与事件循环隔离，限制并发占用的核数）
+SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# LLM / Embedding HTTP 连接池（keep-alive 复用；装有 h2 时启用 HTTP/2）
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "32"))
+LLM_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_KEEPALIVE_CONNECTIONS", "16"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "120"))
+# SSE token 合并：累计字符数或等待毫秒数任一达到即发送（设为 0 / 1 可逐 token 发送）
+SSE_FLUSH_MS = int(os.getenv("SSE_FLUSH_MS", "40"))
+SSE_FLUSH_CHARS = int(os.getenv("SSE_FLUSH_CHARS", "32"))
+# 流空闲时的心跳间隔（秒）
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+# 重排服务（settings.json 的 rerankModel）等待预算（毫秒），超时本次检索回退线性融合
+RERANK_TIMEOUT_MS = int(os.getenv("RERANK_TIMEOUT_MS", "800"))
+# 重排结果缓存条数（按 query + chunk）
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "4096"))
+# 重排服务出错后暂停调用的秒数
+RERANK_COOLDOWN_SECONDS = float(os.getenv("RERANK_COOLDOWN_SECONDS", "30"))
+# 重排请求线程数；每个检索线程同一时刻至多等待一个重排请求，默认与 SEARCH_WORKERS 相同，避免排队
+RERANK_WORKERS = int(os.getenv("RERANK_WORKERS", str(SEARCH_WORKERS)))
+# 原型 spec 富化：与规则 spec 并发的 LLM 候选数（0 为只用规则 spec）与等待截止时间（秒）
+ENRICH_LLM_ATTEMPTS = int(os.getenv("ENRICH_LLM_ATTEMPTS", "2"))
+ENRICH_DEADLINE_SECONDS = float(os.getenv("ENRICH_DEADLINE_SECONDS", "60"))
+# 未确认的原型编辑草稿保留时长（小时），超时后连同草稿目录回收
+PENDING_EDIT_TTL_HOURS = float(os.getenv("PENDING_EDIT_TTL_HOURS", "72"))
 
 # 由 settings_store 在启动时写入
 LLM_PROVIDER = "ollama"
@@ -37,13 +70,17 @@ HYBRID_SEARCH = True
 RERANK_ENABLED = True
 RERANK_CANDIDATES = 20
 RRF_K = 60
+RERANK_MODEL = ""
+RERANK_BASE_URL = ""
+CONTEXT_TOKEN_BUDGET = 1800
 
 
 def apply_runtime_settings(data: dict[str, object]) -> None:
     """将 settings.json 内容应用到运行时模块变量。"""
     global LLM_PROVIDER, OPENAI_API_KEY, OPENAI_BASE_URL, CHAT_MODEL, EMBED_MODEL
     global TOP_K, MIN_SCORE, HISTORY_TURNS
-    global HYBRID_SEARCH, RERANK_ENABLED, RERANK_CANDIDATES, RRF_K
+    global HYBRID_SEARCH, RERANK_ENABLED, RERANK_CANDIDATES, RRF_K, CONTEXT_TOKEN_BUDGET
+    global RERANK_MODEL, RERANK_BASE_URL
 
     provider = str(data.get("llmProvider", "ollama")).strip().lower()
     LLM_PROVIDER = provider
@@ -57,6 +94,9 @@ def apply_runtime_settings(data: dict[str, object]) -> None:
     RERANK_ENABLED = bool(data.get("rerankEnabled", True))
     RERANK_CANDIDATES = int(data.get("rerankCandidates", 20))
     RRF_K = int(data.get("rrfK", 60))
+    RERANK_MODEL = str(data.get("rerankModel", "")).strip()
+    RERANK_BASE_URL = str(data.get("rerankBaseUrl", "")).strip()
+    CONTEXT_TOKEN_BUDGET = int(data.get("contextTokens", 1800))
 
     key = str(data.get("openaiApiKey", "")).strip()
     if provider == "ollama":
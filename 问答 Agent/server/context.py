@@ -5,10 +5,10 @@ import json
 import re
 from dataclasses import dataclass
 
-from chat_history import format_history_text
-from config import HISTORY_TURNS
+from chat_history import HistoryView
 from embedder import chat_once
 from prompts import CONTEXT_UPDATE_PROMPT, build_memory_block
+from token_budget import truncate_to_tokens
 
 
 @dataclass
@@ -37,14 +37,17 @@ async def refresh_session_context(
     assistant_reply: str,
     summary: str = "",
     user_profile: str = "",
+    *,
+    history: HistoryView | None = None,
 ) -> SessionContext:
     fallback = SessionContext(summary, user_profile)
     if not messages:
         return fallback
 
-    dialogue = format_history_text(messages, HISTORY_TURNS)
+    view = history if history is not None else HistoryView.build(messages)
+    dialogue = view.dialogue("context")
     if assistant_reply.strip():
-        dialogue = f"{dialogue}\n助手：{assistant_reply[:300]}"
+        dialogue = f"{dialogue}\n助手：{truncate_to_tokens(assistant_reply, 300)}"
 
     user_content = (
         f"现有会话摘要：{summary or '（无）'}\n"
@@ -0,0 +1,149 @@
+"""RAG 上下文打包：按章节去重、合并相邻片段，并在 token 预算内按分数贪心装箱。"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+
+from store import IndexedChunk
+from token_budget import estimate_tokens, truncate_to_tokens
+
+# 章节上下文预览上限（字符）
+PARENT_PREVIEW_CHARS = 800
+# 剩余预算不足该值时不再截断塞入片段
+MIN_FRAGMENT_TOKENS = 48
+# 滑窗片段去重时认可的最短重叠（字符），更短的首尾相同视为巧合
+MIN_OVERLAP_CHARS = 8
+
+_SEQ_RE = re.compile(r"-(\d+)$")
+
+
+@dataclass
+class PackedContext:
+    text: str
+    tokens: int
+    # 实际写入上下文的 chunk 数（合并前）
+    chunks: int = 0
+    # 因超出预算被丢弃的章节数
+    dropped: int = 0
+    sections: list[tuple[str, str]] = field(default_factory=list)
+
+
+@dataclass
+class _Group:
+    title: str
+    section: str
+    parent: str
+    score: float
+    hits: list[tuple[int, IndexedChunk]] = field(default_factory=list)
+
+
+def _group_key(chunk: IndexedChunk) -> str:
+    if chunk.anchor:
+        return f"{chunk.source_file}|{chunk.anchor}"
+    return f"{chunk.doc_title}|{chunk.section}"
+
+
+def _seq(chunk: IndexedChunk) -> int | None:
+    match = _SEQ_RE.search(chunk.chunk_id)
+    return int(match.group(1)) if match else None
+
+
+def _window(chunk: IndexedChunk) -> tuple[str, int] | None:
+    """滑窗切分标记：(同一次切分的 window 编号, 相邻片段重叠字符数)；非滑窗片段返回 None。"""
+    meta = chunk.metadata
+    if "window" not in meta:
+        return None
+    try:
+        return meta["window"], int(meta.get("overlap") or 0)
+    except ValueError:
+        return None
+
+
+def _join_overlap(left: str, right: str, overlap: int) -> str:
+    """拼接同一次滑窗切分的相邻片段，去掉至多 overlap 个字符的重叠部分。"""
+    limit = min(len(left), len(right), overlap)
+    for size in range(limit, MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:size]):
+            return left + right[size:]
+    return f"{left}\n{right}"
+
+
+def _merge_fragments(hits: list[tuple[int, IndexedChunk]]) -> list[str]:
+    """同一章节内按切分序号排序；同一次滑窗切分中序号连续的片段去掉重叠后合并为一段。"""
+    ordered = sorted(hits, key=lambda h: (_seq(h[1]) is None, _seq(h[1]) or 0, h[0]))
+    merged: list[str] = []
+    prev_seq: int | None = None
+    prev_window: tuple[str, int] | None = None
+    for _, chunk in ordered:
+        seq = _seq(chunk)
+        window = _window(chunk)
+        text = chunk.text.strip()
+        adjacent = seq is not None and prev_seq is not None and seq == prev_seq + 1
+        if merged and adjacent and window is not None and window == prev_window:
+            merged[-1] = _join_overlap(merged[-1], text, window[1])
+        elif text not in merged:
+            merged.append(text)
+        prev_seq = seq
+        prev_window = window
+    return merged
+
+
+def _render(index: int, group: _Group, fragments: list[str], with_parent: bool) -> str:
+    header = f"[{index}] 《{group.title}》· {group.section}"
+    text = "\n…\n".join(fragments)
+    parent = group.parent
+    if with_parent and parent and len(parent) <= PARENT_PREVIEW_CHARS and all(f in parent for f in fragments):
+        # 整个章节不长且已包含全部命中片段：直接给出章节全文，不再重复片段
+        return f"{header}\n{parent}"
+    if with_parent and parent and parent != text:
+        preview = parent if len(parent) <= PARENT_PREVIEW_CHARS else parent[:PARENT_PREVIEW_CHARS] + "…"
+        return f"{header}\n【章节上下文】\n{preview}\n\n【匹配片段】\n{text}"
+    return f"{header}\n{text}"
+
+
+def pack_context(hits: list[tuple[IndexedChunk, float]], budget: int) -> PackedContext:
+    """
+    将检索命中打包成参考文档块。
+
+    - 同一章节（anchor / 标题+小节）只保留一份章节上下文，命中片段归入同组
+    - 组内切分序号相邻的片段合并（去掉滑窗重叠）
+    - 按组内最高分从高到低贪心装入 budget；放不下时先去掉章节上下文，再截断片段
+    """
+    groups: dict[str, _Group] = {}
+    for order, (chunk, score) in enumerate(hits):
+        key = _group_key(chunk)
+        group = groups.get(key)
+        if group is None:
+            group = _Group(chunk.doc_title, chunk.section, chunk.parent_text.strip(), score)
+            groups[key] = group
+        group.score = max(group.score, score)
+        group.hits.append((order, chunk))
+
+    blocks: list[str] = []
+    sections: list[tuple[str, str]] = []
+    used = 0
+    chunks = 0
+    dropped = 0
+    separator = estimate_tokens("\n\n")
+    for group in sorted(groups.values(), key=lambda g: g.score, reverse=True):
+        fragments = _merge_fragments(group.hits)
+        index = len(blocks) + 1
+        remaining = budget - used - (separator if blocks else 0)
+        block = _render(index, group, fragments, with_parent=True)
+        cost = estimate_tokens(block)
+        if cost > remaining:
+            block = _render(index, group, fragments, with_parent=False)
+            cost = estimate_tokens(block)
+        if cost > remaining:
+            # 预算内至少保留最高分章节的截断片段，避免上下文为空
+            if remaining < MIN_FRAGMENT_TOKENS and blocks:
+                dropped += 1
+                continue
+            block = truncate_to_tokens(block, max(remaining, MIN_FRAGMENT_TOKENS))
+            cost = estimate_tokens(block)
+        blocks.append(block)
+        sections.append((group.title, group.section))
+        used += cost + (separator if len(blocks) > 1 else 0)
+        chunks += len(group.hits)
+
+    return PackedContext("\n\n".join(blocks), used, chunks, dropped, sections)
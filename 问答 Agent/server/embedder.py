@@ -1,61 +1,161 @@
 """OpenAI 兼容 Embedding / Chat。"""
 from __future__ import annotations
 
+import asyncio
+import importlib.util
+import threading
 from typing import AsyncIterator
 
+import httpx
 from openai import AsyncOpenAI, OpenAI
 
-from config import CHAT_MODEL, EMBED_MODEL, LLM_PROVIDER, OPENAI_API_KEY, OPENAI_BASE_URL
+import config
+from config import (
+    LLM_CONNECT_TIMEOUT,
+    LLM_KEEPALIVE_CONNECTIONS,
+    LLM_MAX_CONNECTIONS,
+    LLM_READ_TIMEOUT,
+)
 
 _sync: OpenAI | None = None
 _async: AsyncOpenAI | None = None
+# 创建 _async 时所在的事件循环（服务主循环），旧客户端须在该循环上关闭
+_async_loop: asyncio.AbstractEventLoop | None = None
+# 各客户端创建时的连接参数；reset_clients 只重建与当前配置不一致的那个
+_sync_key: tuple[str, str] | None = None
+_async_key: tuple[str, str] | None = None
+_clients_lock = threading.Lock()
+# 替换下来的旧客户端可能仍有进行中的请求（检索、预热、召回评测线程 / 流式对话），宽限期后再关闭
+_CLOSE_GRACE_SECONDS = LLM_READ_TIMEOUT + LLM_CONNECT_TIMEOUT
+
+# 安装了 h2 时启用 HTTP/2（多路复用，单连接承载并发流）
+_HTTP2 = importlib.util.find_spec("h2") is not None
 
 
 def _ensure_key() -> None:
-    if LLM_PROVIDER == "ollama":
+    if config.LLM_PROVIDER == "ollama":
         return
-    if not OPENAI_API_KEY:
+    if not config.OPENAI_API_KEY:
         raise RuntimeError("未配置 API Key，请打开页面「⚙️ 配置」填写并保存。")
 
 
+def _connection_key() -> tuple[str, str]:
+    return config.OPENAI_API_KEY, config.OPENAI_BASE_URL
+
+
+def _http_options() -> dict[str, object]:
+    return {
+        "http2": _HTTP2,
+        "limits": httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=60.0,
+        ),
+        # 流式回复按 read 超时计算相邻两个 chunk 的间隔，而非整次生成时长
+        "timeout": httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+    }
+
+
 def get_sync_client() -> OpenAI:
-    global _sync
+    global _sync, _sync_key
     _ensure_key()
-    if _sync is None:
-        _sync = OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL)
-    return _sync
+    with _clients_lock:
+        if _sync is None:
+            _sync = OpenAI(
+                api_key=config.OPENAI_API_KEY,
+                base_url=config.OPENAI_BASE_URL,
+                http_client=httpx.Client(**_http_options()),
+            )
+            _sync_key = _connection_key()
+        return _sync
 
 
 def get_async_client() -> AsyncOpenAI:
-    global _async
+    global _async, _async_loop, _async_key
     _ensure_key()
-    if _async is None:
-        _async = AsyncOpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL)
-    return _async
+    with _clients_lock:
+        if _async is None:
+            _async = AsyncOpenAI(
+                api_key=config.OPENAI_API_KEY,
+                base_url=config.OPENAI_BASE_URL,
+                http_client=httpx.AsyncClient(**_http_options()),
+            )
+            _async_loop = _running_loop()
+            _async_key = _connection_key()
+        return _async
+
+
+def _running_loop() -> asyncio.AbstractEventLoop | None:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+async def _close_async_later(client: AsyncOpenAI, delay: float) -> None:
+    await asyncio.sleep(delay)
+    await client.close()
+
+
+def _retire_clients(
+    old_sync: OpenAI | None,
+    old_async: AsyncOpenAI | None,
+    loop: asyncio.AbstractEventLoop | None,
+) -> None:
+    if old_sync is not None:
+        timer = threading.Timer(_CLOSE_GRACE_SECONDS, old_sync.close)
+        timer.daemon = True
+        timer.start()
+    if old_async is not None and loop is not None and not loop.is_closed():
+        try:
+            # 调用方多为同步路由线程 / 代数轮询线程，没有运行中的循环：投递到客户端所属的服务循环
+            asyncio.run_coroutine_threadsafe(_close_async_later(old_async, _CLOSE_GRACE_SECONDS), loop)
+        except RuntimeError:
+            pass  # 循环已停止：交给 GC 回收
 
 
 def reset_clients() -> None:
-    global _sync, _async
-    _sync = None
-    _async = None
+    """配置保存后调用：仅当 API Key / Base URL 变化时才丢弃连接池，模型名等变化无需重连。"""
+    global _sync, _async, _async_loop, _sync_key, _async_key
+    key = _connection_key()
+    old_sync: OpenAI | None = None
+    old_async: AsyncOpenAI | None = None
+    loop: asyncio.AbstractEventLoop | None = None
+    with _clients_lock:
+        if _sync is not None and _sync_key != key:
+            old_sync, _sync, _sync_key = _sync, None, None
+        if _async is not None and _async_key != key:
+            old_async, loop = _async, _async_loop
+            _async, _async_loop, _async_key = None, None, None
+    _retire_clients(old_sync, old_async, loop)
 
 
 def embed_texts(texts: list[str]) -> list[list[float]]:
-    resp = get_sync_client().embeddings.create(model=EMBED_MODEL, input=texts)
+    resp = get_sync_client().embeddings.create(model=config.EMBED_MODEL, input=texts)
+    return [d.embedding for d in resp.data]
+
+
+async def embed_texts_async(texts: list[str]) -> list[list[float]]:
+    """异步 embedding：在事件循环上等待网络，不阻塞其它并发对话流。"""
+    resp = await get_async_client().embeddings.create(model=config.EMBED_MODEL, input=texts)
     return [d.embedding for d in resp.data]
 
 
 async def stream_chat(messages: list[dict[str, str]]) -> AsyncIterator[str]:
     stream = await get_async_client().chat.completions.create(
-        model=CHAT_MODEL,
+        model=config.CHAT_MODEL,
         messages=messages,
         temperature=0.2,
         stream=True,
     )
-    async for chunk in stream:
-        delta = chunk.choices[0].delta.content or ""
-        if delta:
-            yield delta
+    try:
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content or ""
+            if delta:
+                yield delta
+    finally:
+        # 客户端断开 / 任务取消时主动关闭上游连接，停止模型继续生成
+        await stream.close()
 
 
 async def chat_once(
@@ -65,7 +165,7 @@ async def chat_once(
     json_mode: bool = False,
 ) -> str:
     kwargs: dict[str, object] = {
-        "model": CHAT_MODEL,
+        "model": config.CHAT_MODEL,
         "messages": messages,
         "temperature": temperature,
     }
@@ -1,7 +1,19 @@
-"""前端自动编译与源码监听。"""
+"""前端自动编译与源码监听。
+
+- 编译成功后把源码树内容哈希写入 dist/.source-hash，启动时哈希一致即跳过编译
+- Linux 下用 inotify 等待源码变更（空闲时无轮询），其他平台或 inotify 不可用时回退为按秒轮询
+"""
 from __future__ import annotations
 
+import ctypes
+import ctypes.util
+import errno
+import hashlib
+import os
+import select
+import struct
 import subprocess
+import sys
 import threading
 from pathlib import Path
 
@@ -14,6 +26,9 @@ _WATCH_ROOTS = (
     DEMO_DIR / "tsconfig.json",
 )
 
+# 随 vite 的 emptyOutDir 一并清除：手动 npm run build 后自动回退为 mtime 比较
+_SOURCE_HASH_FILE = DEMO_DIST / ".source-hash"
+
 _watcher: FrontendWatcher | None = None
 _build_lock = threading.Lock()
 _building = False
@@ -29,10 +44,50 @@ def _can_npm_build() -> bool:
     return (DEMO_DIR / "node_modules" / ".bin" / "tsc").is_file()
 
 
+def _source_files() -> list[Path]:
+    files: list[Path] = []
+    for root in _WATCH_ROOTS:
+        if root.is_file():
+            files.append(root)
+        elif root.is_dir():
+            files.extend(sorted(path for path in root.rglob("*") if path.is_file()))
+    return files
+
+
+def source_tree_hash() -> str:
+    """监听范围内全部源码（相对路径 + 内容）的 sha256。"""
+    digest = hashlib.sha256()
+    for path in _source_files():
+        try:
+            data = path.read_bytes()
+        except OSError:
+            continue
+        digest.update(path.relative_to(DEMO_DIR).as_posix().encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(hashlib.sha256(data).digest())
+    return digest.hexdigest()
+
+
+def _stored_source_hash() -> str | None:
+    try:
+        return _SOURCE_HASH_FILE.read_text(encoding="utf-8").strip() or None
+    except OSError:
+        return None
+
+
+def _store_source_hash(value: str) -> None:
+    if _dist_ready():
+        try:
+            _SOURCE_HASH_FILE.write_text(value, encoding="utf-8")
+        except OSError:
+            pass
+
+
 def build_frontend() -> None:
-    """在 demo 目录执行 npm run build。"""
+    """在 demo 目录执行 npm run build，成功后记录本次编译的源码哈希。"""
     if not (DEMO_DIR / "package.json").is_file():
         raise FileNotFoundError(f"未找到前端项目：{DEMO_DIR / 'package.json'}")
+    source_hash = source_tree_hash()
 
     print("正在编译前端…", flush=True)
     result = subprocess.run(
@@ -50,6 +105,7 @@ def build_frontend() -> None:
             f"前端编译失败 (exit {result.returncode})。"
             f"请确认已执行：cd demo && npm install"
         )
+    _store_source_hash(source_hash)
     print(f"前端编译完成 → {DEMO_DIST}", flush=True)
 
 
@@ -58,7 +114,18 @@ def _needs_build() -> bool:
     if not index.is_file():
         return True
 
-    dist_mtime = index.stat().st_mtime
+    stored = _stored_source_hash()
+    if stored is not None:
+        return source_tree_hash() != stored
+
+    # 无哈希记录（dist 为手动编译）：按 mtime 比较，未变更时补记哈希供下次启动使用
+    if _mtime_newer_than(index.stat().st_mtime):
+        return True
+    _store_source_hash(source_tree_hash())
+    return False
+
+
+def _mtime_newer_than(dist_mtime: float) -> bool:
     for root in _WATCH_ROOTS:
         if not root.exists():
             continue
@@ -116,6 +183,9 @@ def _run_build_once() -> None:
         _building = True
 
     try:
+        stored = _stored_source_hash()
+        if stored is not None and _dist_ready() and source_tree_hash() == stored:
+            return  # 保存但内容未变 / 改动已撤回
         if not _can_npm_build():
             if _dist_ready():
                 print(
@@ -137,8 +207,112 @@ def _run_build_once() -> None:
             _run_build_once()
 
 
+# inotify 事件（<sys/inotify.h>）
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = os.O_NONBLOCK
+_IN_CLOEXEC = os.O_CLOEXEC
+_WATCH_MASK = (
+    _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE
+    | _IN_DELETE | _IN_DELETE_SELF | _IN_MOVE_SELF | _IN_ONLYDIR
+)
+_EVENT = struct.Struct("iIII")
+
+
+class _Inotify:
+    """
+    inotify 的 ctypes 封装：递归监听目录树，新建子目录时补加监听。
+
+    单文件监听目标（index.html 等）改为监听其所在目录并按文件名过滤，
+    编辑器「写临时文件再 rename」的保存方式也能捕获。
+    """
+
+    def __init__(self) -> None:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        self.fd = fd
+        self._dirs: dict[int, Path] = {}
+        self._trees: set[Path] = set()
+        self._files: dict[Path, set[str]] = {}
+
+    def _watch(self, path: Path) -> None:
+        wd = self._add_watch(self.fd, os.fsencode(path), _WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err in (errno.ENOENT, errno.ENOTDIR):
+                return  # 扫描与添加之间目录已被删除
+            raise OSError(err, f"inotify_add_watch 失败：{path}")
+        self._dirs[wd] = path
+
+    def _watch_tree(self, root: Path) -> None:
+        self._watch(root)
+        for dirpath, dirnames, _ in os.walk(root):
+            for dirname in dirnames:
+                self._watch(Path(dirpath) / dirname)
+
+    def add_tree(self, root: Path) -> None:
+        self._trees.add(root)
+        self._watch_tree(root)
+
+    def add_file(self, path: Path) -> None:
+        names = self._files.setdefault(path.parent, set())
+        if not names:
+            self._watch(path.parent)
+        names.add(path.name)
+
+    def _relevant(self, directory: Path, name: str) -> bool:
+        if any(directory == root or root in directory.parents for root in self._trees):
+            return True
+        return name in self._files.get(directory, ())
+
+    def read_changes(self) -> bool:
+        """读取已就绪的事件，返回是否涉及监听范围内的源码。"""
+        changed = False
+        while True:
+            try:
+                buf = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(buf):
+                wd, mask, _, length = _EVENT.unpack_from(buf, offset)
+                offset += _EVENT.size
+                name = os.fsdecode(buf[offset : offset + length].rstrip(b"\0"))
+                offset += length
+                if mask & _IN_Q_OVERFLOW:
+                    changed = True
+                    continue
+                directory = self._dirs.get(wd)
+                if directory is None:
+                    continue
+                if mask & _IN_IGNORED:
+                    self._dirs.pop(wd, None)
+                    continue
+                if not self._relevant(directory, name):
+                    continue
+                if mask & _IN_ISDIR and mask & (_IN_CREATE | _IN_MOVED_TO):
+                    self._watch_tree(directory / name)
+                changed = True
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
 class FrontendWatcher:
-    """轮询 demo 源码变更并 debounce 触发重新编译。"""
+    """监听 demo 源码变更并 debounce 触发重新编译（Linux 用 inotify，否则轮询）。"""
 
     def __init__(self, interval: float = 1.0, debounce: float = 0.8) -> None:
         self._interval = interval
@@ -147,6 +321,9 @@ class FrontendWatcher:
         self._thread: threading.Thread | None = None
         self._timer: threading.Timer | None = None
         self._snapshots: dict[str, float] = {}
+        self._wake_r: int | None = None
+        self._wake_w: int | None = None
+        self.mode = ""
 
     def _snapshot(self) -> dict[str, float]:
         out: dict[str, float] = {}
@@ -168,31 +345,90 @@ class FrontendWatcher:
         self._timer.daemon = True
         self._timer.start()
 
-    def _loop(self) -> None:
+    def _changed(self) -> None:
+        print("检测到前端源码变更，准备重新编译…", flush=True)
+        self._schedule_rebuild()
+
+    def _open_inotify(self) -> _Inotify | None:
+        if not sys.platform.startswith("linux"):
+            return None
+        try:
+            notifier = _Inotify()
+        except (OSError, AttributeError):
+            return None
+        try:
+            for root in _WATCH_ROOTS:
+                if root.is_dir():
+                    notifier.add_tree(root)
+                else:
+                    notifier.add_file(root)
+        except OSError as err:
+            # 常见原因：fs.inotify.max_user_watches 不足
+            print(f"inotify 不可用（{err}），前端源码监听改为轮询", flush=True)
+            notifier.close()
+            return None
+        return notifier
+
+    def _inotify_loop(self, notifier: _Inotify) -> None:
+        assert self._wake_r is not None
+        try:
+            while not self._stop.is_set():
+                ready, _, _ = select.select([notifier.fd, self._wake_r], [], [])
+                if self._stop.is_set():
+                    break
+                if notifier.fd in ready:
+                    try:
+                        changed = notifier.read_changes()
+                    except OSError as err:
+                        print(f"inotify 监听出错（{err}），前端源码监听改为轮询", flush=True)
+                        self.mode = "poll"
+                        self._poll_loop()
+                        return
+                    if changed:
+                        self._changed()
+        finally:
+            notifier.close()
+
+    def _poll_loop(self) -> None:
         self._snapshots = self._snapshot()
         while not self._stop.wait(self._interval):
             current = self._snapshot()
             if current != self._snapshots:
                 self._snapshots = current
-                print("检测到前端源码变更，准备重新编译…", flush=True)
-                self._schedule_rebuild()
+                self._changed()
+
+    def _loop(self) -> None:
+        notifier = self._open_inotify()
+        if notifier is None:
+            self.mode = "poll"
+            self._poll_loop()
+        else:
+            self.mode = "inotify"
+            self._inotify_loop(notifier)
 
     def start(self) -> None:
         if self._thread and self._thread.is_alive():
             return
         self._stop.clear()
+        self._wake_r, self._wake_w = os.pipe()
         self._thread = threading.Thread(target=self._loop, name="frontend-watcher", daemon=True)
         self._thread.start()
         print("前端源码监听已开启（修改 demo/src 后自动编译）", flush=True)
 
     def stop(self) -> None:
         self._stop.set()
+        if self._wake_w is not None:
+            os.write(self._wake_w, b"\0")
         if self._timer:
             self._timer.cancel()
             self._timer = None
         if self._thread:
             self._thread.join(timeout=2)
             self._thread = None
+        for fd in (self._wake_r, self._wake_w):
+            if fd is not None:
+                os.close(fd)
+        self._wake_r = self._wake_w = None
 
 
 def start_frontend_watcher() -> FrontendWatcher | None:
@@ -0,0 +1,132 @@
+"""多 worker 部署的跨进程失效通知：共享文件记录各作用域代数，worker 据此丢弃本进程缓存。
+
+作用域约定：
+- settings：settings.json 已更新（模型、全局检索参数）
+- kb-registry：知识库增删、切换使用中的库
+- index:{kb_id}：该库索引文件已重建 / 量化参数变化 / 已删除
+- params:{kb_id}：该库检索参数覆盖变化
+"""
+from __future__ import annotations
+
+import importlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from types import ModuleType
+from typing import Callable, Iterator
+
+from config import RUNTIME_DIR
+
+try:
+    fcntl: ModuleType | None = importlib.import_module("fcntl")
+except ImportError:  # Windows：不加文件锁，退化为单进程语义
+    fcntl = None
+
+GENERATION_FILE = RUNTIME_DIR / "generation.json"
+_GENERATION_LOCK = RUNTIME_DIR / "generation.lock"
+
+
+@contextmanager
+def file_lock(path: Path, *, shared: bool = False) -> Iterator[None]:
+    """跨进程文件锁（flock）；shared=True 为读锁，多个读者可并存。"""
+    if fcntl is None:
+        yield
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a+b") as fh:
+        fcntl.flock(fh.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+def atomic_write_text(path: Path, text: str) -> None:
+    """写临时文件后 rename，其它进程只会读到完整的旧内容或新内容。"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _read_generations() -> dict[str, int]:
+    try:
+        data = json.loads(GENERATION_FILE.read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError, OSError):
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    return {str(k): int(v) for k, v in data.items() if isinstance(v, int)}
+
+
+class GenerationWatcher:
+    """按文件 stat 判断是否有其它进程推进了代数，变化时调用对应作用域的处理函数。"""
+
+    def __init__(self) -> None:
+        self._seen: dict[str, int] = {}
+        self._stamp: tuple[int, int, int] | None = None
+        self._handlers: list[tuple[str, Callable[[str], None]]] = []
+        self._lock = threading.Lock()
+
+    def on_change(self, prefix: str, handler: Callable[[str], None]) -> None:
+        """注册处理函数：作用域等于 prefix 或以 prefix 开头时调用，参数为冒号后的部分。"""
+        self._handlers.append((prefix, handler))
+
+    @staticmethod
+    def _file_stamp() -> tuple[int, int, int] | None:
+        try:
+            st = GENERATION_FILE.stat()
+        except OSError:
+            return None
+        return st.st_ino, st.st_size, st.st_mtime_ns
+
+    def prime(self) -> None:
+        """以当前磁盘状态为基线（启动时调用，之前的变更已体现在初次加载中）。"""
+        with self._lock:
+            self._stamp = self._file_stamp()
+            self._seen = _read_generations()
+
+    def bump(self, *scopes: str) -> None:
+        """推进作用域代数；本进程已自行处理该变更，记为已见，不再回调。"""
+        if not scopes:
+            return
+        with file_lock(_GENERATION_LOCK):
+            data = _read_generations()
+            for scope in scopes:
+                data[scope] = data.get(scope, 0) + 1
+            atomic_write_text(GENERATION_FILE, json.dumps(data, ensure_ascii=False, sort_keys=True))
+            with self._lock:
+                for scope in scopes:
+                    self._seen[scope] = data[scope]
+
+    def changed(self) -> bool:
+        """代数文件是否自上次检查后被改写（只做一次 stat）。"""
+        return self._file_stamp() != self._stamp
+
+    def poll(self) -> list[str]:
+        """文件未变时只有一次 stat；返回本次处理的作用域。"""
+        stamp = self._file_stamp()
+        with self._lock:
+            if stamp == self._stamp:
+                return []
+            self._stamp = stamp
+            latest = _read_generations()
+            changed = [scope for scope, gen in latest.items() if self._seen.get(scope) != gen]
+            self._seen = latest
+        for scope in changed:
+            for prefix, handler in self._handlers:
+                if scope == prefix or scope.startswith(f"{prefix}:"):
+                    try:
+                        handler(scope[len(prefix) + 1 :])
+                    except Exception as exc:
+                        print(f"处理跨进程变更「{scope}」失败：{exc}")
+        return changed
+
+
+generation_watcher = GenerationWatcher()
+
+
+def bump_generation(*scopes: str) -> None:
+    generation_watcher.bump(*scopes)
@@ -1,6 +1,7 @@
 """用户意图识别：通用对话 vs 知识库检索，并按库描述路由到指定 RAG。"""
 from __future__ import annotations
 
+import asyncio
 import json
 import re
 from dataclasses import dataclass
@@ -8,10 +9,9 @@ from typing import Literal
 
 import numpy as np
 
-from chat_history import format_history_text
-from config import HISTORY_TURNS
+from chat_history import HistoryView
 from context import memory_block
-from embedder import chat_once, embed_texts
+from embedder import chat_once, embed_texts_async
 from kb_registry import get_active_id, get_kb_paths, list_bases
 from prompts import INTENT_PROMPT_HEADER
 from prototype_flow import (
@@ -22,8 +22,8 @@ from prototype_flow import (
     extract_edit_intent_slots,
     is_new_edit_intent,
 )
-from prototype_registry import list_prototypes, sync_registry
-from store import get_store_for_search
+from prototype_registry import list_prototypes_async
+from store import get_store_for_search_async, run_search
 
 IntentKind = Literal["general", "rag", "prototype_new", "prototype_preview", "prototype_edit"]
 
@@ -90,7 +90,7 @@ def _build_kb_catalog() -> str:
     return "\n".join(lines)
 
 
-def _probe_retrieval_intent(query: str) -> IntentResult | None:
+async def _probe_retrieval_intent(query: str) -> IntentResult | None:
     """LLM 判 general 时，用向量检索探测是否其实属于某已索引知识库。
 
     优化：query 向量只 embed 一次，所有候选库复用同一向量，避免每库重复 embed。
@@ -99,15 +99,15 @@ def _probe_retrieval_intent(query: str) -> IntentResult | None:
     if not text:
         return None
 
-    indexed = [b for b in list_bases() if b.get("indexReady")]
+    indexed = [b for b in await asyncio.to_thread(list_bases) if b.get("indexReady")]
     if not indexed:
         return None
 
     # 仅 embed 一次，所有库共用
     try:
-        qv = np.array(embed_texts([text])[0], dtype=np.float32)
+        qv = np.array((await embed_texts_async([text]))[0], dtype=np.float32)
     except Exception:
-        qv = None
+        return None
 
     best_kb_id: str | None = None
     best_kb_name: str | None = None
@@ -115,10 +115,10 @@ def _probe_retrieval_intent(query: str) -> IntentResult | None:
 
     for item in indexed:
         kb_id = str(item["id"])
-        store = get_store_for_search(kb_id)
+        store = await get_store_for_search_async(kb_id)
         if store.size == 0:
             continue
-        hits = store.search_with_vector(text, qv, 1)
+        hits = await run_search(store.search_with_vector, text, qv, 1)
         if not hits:
             continue
         score = hits[0][1]
@@ -163,20 +163,25 @@ def _keyword_intent(text: str) -> IntentResult | None:
     if PROTOTYPE_PREVIEW_PATTERNS.search(stripped):
         return IntentResult("prototype_preview", reason="关键词命中原型预览")
     if PROTOTYPE_EDIT_PATTERNS.search(stripped):
-        sync_registry()
-        items = list_prototypes()
-        slots = extract_edit_intent_slots(stripped, items) if items else None
-        return IntentResult(
-            "prototype_edit",
-            edit_page_id=slots.page_id if slots else None,
-            edit_module_name=slots.module_name if slots else None,
-            reason="关键词命中原型修改",
-        )
+        # 目标页面槽位需读原型注册表，由 _edit_intent 在线程中补全
+        return IntentResult("prototype_edit", reason="关键词命中原型修改")
     if PROTOTYPE_NEW_PATTERNS.search(stripped):
         return IntentResult("prototype_new", reason="关键词命中新建原型")
     return None
 
 
+async def _edit_intent(text: str, reason: str) -> IntentResult:
+    """编辑意图：异步读取原型注册表，从消息中抽取目标页面 / 模块。"""
+    items = await list_prototypes_async()
+    slots = extract_edit_intent_slots(text.strip(), items) if items else None
+    return IntentResult(
+        "prototype_edit",
+        edit_page_id=slots.page_id if slots else None,
+        edit_module_name=slots.module_name if slots else None,
+        reason=reason,
+    )
+
+
 def _parse_intent(
     raw: str,
 ) -> tuple[IntentKind, str | None, str | None, str | None, str, str | None]:
@@ -241,6 +246,7 @@ async def classify_intent(
     user_profile: str = "",
     prototype_state: dict | None = None,
     prototype_edit_state: dict | None = None,
+    history: HistoryView | None = None,
 ) -> IntentResult:
     if not messages:
         return IntentResult("general")
@@ -261,15 +267,7 @@ async def classify_intent(
         if keyword and keyword.intent in ("prototype_preview", "prototype_new"):
             return keyword
         if is_new_edit_intent(last_text):
-            sync_registry()
-            items = list_prototypes()
-            slots = extract_edit_intent_slots(last_text, items) if items else None
-            return IntentResult(
-                "prototype_edit",
-                edit_page_id=slots.page_id if slots else None,
-                edit_module_name=slots.module_name if slots else None,
-                reason="新的编辑意图，打断当前流程",
-            )
+            return await _edit_intent(last_text, "新的编辑意图，打断当前流程")
         reason = {
             PHASE_SELECT: "等待选择要修改的原型",
             PHASE_INSTRUCTION: "等待输入修改内容",
@@ -282,14 +280,19 @@ async def classify_intent(
         return IntentResult("prototype_new", reason="打开需求配置页")
 
     keyword = _keyword_intent(last_text)
+    if keyword and keyword.intent == "prototype_edit":
+        return await _edit_intent(last_text, keyword.reason)
     if keyword:
         return keyword
 
     memory = memory_block(summary, user_profile)
-    prompt = INTENT_PROMPT_HEADER.format(kb_catalog=_build_kb_catalog())
+    view = history if history is not None else HistoryView.build(messages)
+    # 知识库目录需读 registry 与各库 content.md，放到线程中避免阻塞事件循环
+    catalog = await asyncio.to_thread(_build_kb_catalog)
+    prompt = INTENT_PROMPT_HEADER.format(kb_catalog=catalog)
     user_content = (
         f"会话记忆：\n{memory}\n\n"
-        f"对话历史：\n{format_history_text(messages[:-1], HISTORY_TURNS)}\n\n"
+        f"对话历史：\n{view.text('intent')}\n\n"
         f"当前用户消息：{messages[-1]['content']}"
     )
     intent_messages = [
@@ -314,12 +317,12 @@ async def classify_intent(
             reason=reason,
         )
     if intent == "general":
-        probed = _probe_retrieval_intent(messages[-1]["content"])
+        probed = await _probe_retrieval_intent(messages[-1]["content"])
         if probed:
             return probed
         return IntentResult("general", reason=reason)
 
-    kb_id, kb_name = resolve_search_kb(llm_kb_id)
+    kb_id, kb_name = await asyncio.to_thread(resolve_search_kb, llm_kb_id)
     return IntentResult(
         "rag",
         kb_id=kb_id,
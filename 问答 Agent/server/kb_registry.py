@@ -10,6 +10,8 @@ from typing import Any
 from uuid import uuid4
 
 from config import CHUNK_OVERLAP, CHUNK_SIZE, KNOWLEDGE_DIR, ROOT
+from generation import atomic_write_text, bump_generation
+from vector_index import QUANTIZATION_MODES
 
 DATA_DIR = ROOT / "data"
 KB_ROOT = DATA_DIR / "kb"
@@ -17,6 +19,16 @@ REGISTRY_FILE = DATA_DIR / "knowledge_bases.json"
 LEGACY_INDEX = DATA_DIR / "index.cache.json"
 
 DEFAULT_KB_ID = "default"
+DEFAULT_VECTOR_QUANTIZATION = "none"
+# 可按知识库覆盖的检索参数：key → (类型, 下限, 上限)
+_RETRIEVAL_OVERRIDE_FIELDS: dict[str, tuple[type, Any, Any]] = {
+    "topK": (int, 1, 20),
+    "minScore": (float, 0.0, 1.0),
+    "hybridSearch": (bool, None, None),
+    "rerankEnabled": (bool, None, None),
+    "rerankCandidates": (int, 5, 50),
+    "rrfK": (int, 10, 120),
+}
 
 
 def _now_iso() -> str:
@@ -74,7 +86,7 @@ def _read_registry() -> dict[str, Any]:
 
 def _write_registry(data: dict[str, Any]) -> None:
     DATA_DIR.mkdir(parents=True, exist_ok=True)
-    REGISTRY_FILE.write_text(json.dumps(data, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    atomic_write_text(REGISTRY_FILE, json.dumps(data, ensure_ascii=False, indent=2) + "\n")
 
 
 def _read_meta(kb_id: str) -> dict[str, Any]:
@@ -90,7 +102,7 @@ def _read_meta(kb_id: str) -> dict[str, Any]:
 def _write_meta(kb_id: str, meta: dict[str, Any]) -> None:
     meta["updatedAt"] = _now_iso()
     _kb_dir(kb_id).mkdir(parents=True, exist_ok=True)
-    _meta_path(kb_id).write_text(json.dumps(meta, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    atomic_write_text(_meta_path(kb_id), json.dumps(meta, ensure_ascii=False, indent=2) + "\n")
 
 
 def _merge_legacy_markdown(target: Path) -> None:
@@ -154,6 +166,9 @@ def list_bases() -> list[dict[str, Any]]:
                 "description": meta.get("description", ""),
                 "chunkSize": int(meta.get("chunkSize", CHUNK_SIZE)),
                 "chunkOverlap": int(meta.get("chunkOverlap", CHUNK_OVERLAP)),
+                "vectorQuantization": str(meta.get("vectorQuantization", DEFAULT_VECTOR_QUANTIZATION)),
+                "rescoreCandidates": int(meta.get("rescoreCandidates", 0)),
+                "retrieval": _retrieval_overrides(meta),
                 "createdAt": meta.get("createdAt"),
                 "updatedAt": meta.get("updatedAt"),
                 "active": kb_id == active_id,
@@ -184,6 +199,7 @@ def set_active_id(kb_id: str) -> dict[str, Any]:
     registry = _read_registry()
     registry["activeId"] = kb_id
     _write_registry(registry)
+    bump_generation("kb-registry")
     return get_base(kb_id)
 
 
@@ -233,6 +249,7 @@ def create_base(name: str, description: str = "") -> dict[str, Any]:
     if len(registry["bases"]) == 1:
         registry["activeId"] = kb_id
     _write_registry(registry)
+    bump_generation("kb-registry")
     return get_base(kb_id)
 
 
@@ -244,7 +261,11 @@ def update_base(
     content: str | None = None,
     chunk_size: int | None = None,
     chunk_overlap: int | None = None,
+    vector_quantization: str | None = None,
+    rescore_candidates: int | None = None,
+    retrieval: dict[str, Any] | None = None,
 ) -> dict[str, Any]:
+    """retrieval 为检索参数覆盖（camelCase），值为 None 的项恢复使用全局配置。"""
     ensure_migrated()
     meta = _read_meta(kb_id)
     if name is not None:
@@ -258,6 +279,19 @@ def update_base(
         meta["chunkSize"] = max(100, min(int(chunk_size), 2000))
     if chunk_overlap is not None:
         meta["chunkOverlap"] = max(0, min(int(chunk_overlap), 500))
+    if vector_quantization is not None:
+        if vector_quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"不支持的向量量化模式: {vector_quantization}")
+        meta["vectorQuantization"] = vector_quantization
+    if rescore_candidates is not None:
+        meta["rescoreCandidates"] = max(0, min(int(rescore_candidates), 200))
+    if retrieval is not None:
+        merged = {**_retrieval_overrides(meta), **retrieval}
+        cleaned = _clean_retrieval_overrides(merged)
+        if cleaned:
+            meta["retrieval"] = cleaned
+        else:
+            meta.pop("retrieval", None)
     _write_meta(kb_id, meta)
 
     if content is not None:
@@ -269,6 +303,13 @@ def update_base(
             item["name"] = meta["name"]
             break
     _write_registry(registry)
+
+    scopes = []
+    if vector_quantization is not None or rescore_candidates is not None:
+        scopes.append(f"index:{kb_id}")
+    if retrieval is not None:
+        scopes.append(f"params:{kb_id}")
+    bump_generation(*scopes)
     return get_base(kb_id)
 
 
@@ -289,6 +330,7 @@ def delete_base(kb_id: str) -> None:
     kb_path = _kb_dir(kb_id)
     if kb_path.exists():
         shutil.rmtree(kb_path)
+    bump_generation("kb-registry", f"index:{kb_id}")
 
 
 def get_kb_paths(kb_id: str) -> tuple[Path, Path]:
@@ -302,3 +344,40 @@ def get_kb_paths(kb_id: str) -> tuple[Path, Path]:
 def get_kb_chunk_params(kb_id: str) -> tuple[int, int]:
     meta = _read_meta(kb_id)
     return int(meta.get("chunkSize", CHUNK_SIZE)), int(meta.get("chunkOverlap", CHUNK_OVERLAP))
+
+
+def _clean_retrieval_overrides(raw: dict[str, Any]) -> dict[str, Any]:
+    out: dict[str, Any] = {}
+    for key, (kind, lo, hi) in _RETRIEVAL_OVERRIDE_FIELDS.items():
+        value = raw.get(key)
+        if value is None:
+            continue
+        if kind is bool:
+            out[key] = bool(value)
+        else:
+            out[key] = max(lo, min(kind(value), hi))
+    return out
+
+
+def _retrieval_overrides(meta: dict[str, Any]) -> dict[str, Any]:
+    raw = meta.get("retrieval")
+    if not isinstance(raw, dict):
+        return {}
+    try:
+        return _clean_retrieval_overrides(raw)
+    except (TypeError, ValueError):
+        return {}
+
+
+def get_kb_retrieval_overrides(kb_id: str) -> dict[str, Any]:
+    """meta.json 中该知识库的检索参数覆盖（camelCase），未配置的项沿用全局设置。"""
+    return _retrieval_overrides(_read_meta(kb_id))
+
+
+def get_kb_vector_params(kb_id: str) -> tuple[str, int]:
+    """返回 (向量量化模式, 精确重打分候选数)；未配置时为不量化、不重打分。"""
+    meta = _read_meta(kb_id)
+    mode = str(meta.get("vectorQuantization", DEFAULT_VECTOR_QUANTIZATION))
+    if mode not in QUANTIZATION_MODES:
+        mode = DEFAULT_VECTOR_QUANTIZATION
+    return mode, max(0, int(meta.get("rescoreCandidates", 0)))
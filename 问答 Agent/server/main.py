@@ -1,31 +1,72 @@
 """RAG API 入口。"""
 from __future__ import annotations
 
+import asyncio
 import os
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
 from pathlib import Path
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
 
-from config import FRONTEND_WATCH, HOST, PORT, PROTOTYPE_SKELETON_DIR, RELOAD, SERVE_FRONTEND
+from config import (
+    FRONTEND_WATCH,
+    HOST,
+    PORT,
+    PROTOTYPE_SKELETON_DIR,
+    RELOAD,
+    RUNTIME_DIR,
+    SERVE_FRONTEND,
+    WORKERS,
+)
 from frontend_build import prepare_frontend, start_frontend_watcher, stop_frontend_watcher
+from generation import file_lock, generation_watcher
 from routes import router
 from static import mount_frontend, mount_prototype_files
 from kb_registry import ensure_migrated
-from store import store_manager
+from store import store_manager, warm_up_stores
+from prototype_edit import collect_expired_drafts
 from prototype_registry import sync_registry
 from template_store import ensure_templates
 
+# 后台检查其它 worker 变更的间隔（秒）；请求到来时也会先做一次 stat 检查
+GENERATION_POLL_SECONDS = 1.0
+# 过期原型编辑草稿的回收间隔（秒）
+DRAFT_GC_SECONDS = 3600
+
 if SERVE_FRONTEND:
     prepare_frontend()
 
 
+async def _poll_generations() -> None:
+    while True:
+        await asyncio.sleep(GENERATION_POLL_SECONDS)
+        if generation_watcher.changed():
+            await asyncio.to_thread(generation_watcher.poll)
+
+
+async def _collect_drafts() -> None:
+    while True:
+        await asyncio.sleep(DRAFT_GC_SECONDS)
+        try:
+            removed = await asyncio.to_thread(collect_expired_drafts)
+        except Exception as exc:
+            print(f"回收过期编辑草稿失败：{exc}")
+            continue
+        if removed:
+            print(f"已回收 {removed} 个过期编辑草稿")
+
+
 @asynccontextmanager
 async def lifespan(_: FastAPI):
-    ensure_migrated()
-    ensure_templates()
-    sync_registry()
+    # 多 worker 同时启动时串行执行迁移 / 模板 / 原型注册表同步，避免并发写同一文件
+    with file_lock(RUNTIME_DIR / "startup.lock"):
+        ensure_migrated()
+        ensure_templates()
+        sync_registry()
+        collect_expired_drafts()
+    generation_watcher.prime()
     store = store_manager.reload_active()
     if store.load_cache():
         print(f"已加载知识库「{store.kb_id}」索引，共 {store.size} 个 chunk")
@@ -33,20 +74,46 @@ async def lifespan(_: FastAPI):
         print("当前知识库索引未构建，请在「📚 知识库」页预览分块并构建索引")
 
     watcher = start_frontend_watcher() if SERVE_FRONTEND and FRONTEND_WATCH else None
+    warmup = asyncio.create_task(warm_up_stores())
+    poller = asyncio.create_task(_poll_generations())
+    draft_gc = asyncio.create_task(_collect_drafts())
     try:
         yield
     finally:
+        for task in (poller, draft_gc):
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+        if not warmup.done():
+            warmup.cancel()
+            with suppress(asyncio.CancelledError):
+                await warmup
         if watcher:
             stop_frontend_watcher()
 
 
+class GenerationSyncMiddleware:
+    """其它 worker 重建索引或修改配置后，先切换到新快照再处理请求（纯 ASGI，不包装流式响应）。"""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and generation_watcher.changed():
+            await asyncio.to_thread(generation_watcher.poll)
+        await self.app(scope, receive, send)
+
+
 app = FastAPI(title="岛民知识助手", lifespan=lifespan)
+app.add_middleware(GenerationSyncMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
 )
+
+
 app.include_router(router, prefix="/api")
 
 if SERVE_FRONTEND:
@@ -61,11 +128,14 @@ if __name__ == "__main__":
     os.chdir(server_dir)
     display_host = "127.0.0.1" if HOST in {"0.0.0.0", "::"} else HOST
     print(f"打开浏览器访问: http://{display_host}:{PORT}")
+    if WORKERS > 1:
+        print(f"多进程模式：{WORKERS} 个 worker（已关闭热重载与前端监听）")
 
     uvicorn.run(
         "main:app",
         host=HOST,
         port=PORT,
         reload=RELOAD,
-        reload_dirs=[str(server_dir)],
+        reload_dirs=[str(server_dir)] if RELOAD else None,
+        workers=WORKERS,
     )
@@ -0,0 +1,211 @@
+"""待确认原型编辑草稿存储（SQLite）：按 pageId + 更新时间索引，事务写入，按 TTL 回收。"""
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager, suppress
+from pathlib import Path
+from typing import Iterator
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pending_edits (
+    edit_id    TEXT PRIMARY KEY,
+    page_id    TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    record     TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_pending_page_updated ON pending_edits (page_id, updated_at DESC);
+CREATE INDEX IF NOT EXISTS idx_pending_updated ON pending_edits (updated_at);
+CREATE TABLE IF NOT EXISTS pending_bases (
+    edit_id TEXT PRIMARY KEY,
+    spec    TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pending_revisions (
+    edit_id  TEXT NOT NULL,
+    revision INTEGER NOT NULL,
+    patch    TEXT NOT NULL,
+    record   TEXT NOT NULL,
+    PRIMARY KEY (edit_id, revision)
+);
+"""
+
+
+class PendingEditStore:
+    """
+    每条草稿一行，record 列存草稿元信息 JSON；spec 以「基准 spec + 每次修订的 patch」存放。
+
+    - latest(page_id) 走 (page_id, updated_at) 索引，不再遍历目录、stat 排序
+    - 写入 / 删除均在事务中完成，多 worker 由 SQLite 文件锁串行化
+    - 首次打开时导入旧版 pending/{pageId}/{editId}.json 文件并删除（旧记录 record 中仍带完整 spec）
+    - 撤销只删掉链尾修订，并把上一修订的元信息写回 pending_edits
+    """
+
+    def __init__(self, path: Path, legacy_dir: Path | None = None) -> None:
+        self.path = path
+        self._legacy_dir = legacy_dir
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        self._local.conn = conn
+        with self._init_lock:
+            if not self._ready:
+                conn.executescript(_SCHEMA)
+                self._import_legacy(conn)
+                self._ready = True
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _import_legacy(self, conn: sqlite3.Connection) -> None:
+        if self._legacy_dir is None or not self._legacy_dir.is_dir():
+            return
+        files = sorted(self._legacy_dir.glob("*/*.json"))
+        if not files:
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for path in files:
+                try:
+                    record = json.loads(path.read_text(encoding="utf-8"))
+                    updated_at = path.stat().st_mtime
+                except (OSError, json.JSONDecodeError):
+                    continue
+                if record.get("editId") and record.get("pageId"):
+                    conn.execute(
+                        "INSERT OR IGNORE INTO pending_edits VALUES (?, ?, ?, ?)",
+                        (str(record["editId"]), str(record["pageId"]), updated_at, json.dumps(record, ensure_ascii=False)),
+                    )
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        for path in files:
+            path.unlink(missing_ok=True)
+        for page_dir in self._legacy_dir.iterdir():
+            with suppress(OSError):
+                page_dir.rmdir()  # 仅空目录会被删除
+
+    def get(self, edit_id: str) -> dict | None:
+        row = self._connect().execute(
+            "SELECT record FROM pending_edits WHERE edit_id = ?", (edit_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def latest(self, page_id: str) -> dict | None:
+        """该原型最近更新的草稿。"""
+        row = self._connect().execute(
+            "SELECT record FROM pending_edits WHERE page_id = ? ORDER BY updated_at DESC LIMIT 1",
+            (page_id,),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(
+        self,
+        record: dict,
+        *,
+        base_spec: dict | None = None,
+        patch: list[dict] | None = None,
+    ) -> None:
+        """
+        写入草稿元信息；同一事务内可一并写入修订。
+
+        - base_spec：新的基准 spec（同时清空该草稿原有的修订链）
+        - patch：本次修订相对上一修订的 patch，按 record["revision"] 追加到链尾
+        """
+        edit_id = str(record["editId"])
+        payload = json.dumps(record, ensure_ascii=False)
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO pending_edits VALUES (?, ?, ?, ?)",
+                (edit_id, str(record["pageId"]), time.time(), payload),
+            )
+            if base_spec is not None:
+                conn.execute("DELETE FROM pending_revisions WHERE edit_id = ?", (edit_id,))
+                conn.execute(
+                    "INSERT OR REPLACE INTO pending_bases VALUES (?, ?)",
+                    (edit_id, json.dumps(base_spec, ensure_ascii=False)),
+                )
+            if patch is not None:
+                conn.execute(
+                    "INSERT OR REPLACE INTO pending_revisions VALUES (?, ?, ?, ?)",
+                    (edit_id, int(record.get("revision") or 1), json.dumps(patch, ensure_ascii=False), payload),
+                )
+
+    def spec_chain(self, edit_id: str) -> tuple[dict, list[list[dict]]] | None:
+        """草稿的基准 spec 与按修订号排列的 patch 链；没有基准时返回 None。"""
+        conn = self._connect()
+        row = conn.execute("SELECT spec FROM pending_bases WHERE edit_id = ?", (edit_id,)).fetchone()
+        if not row:
+            return None
+        patches = conn.execute(
+            "SELECT patch FROM pending_revisions WHERE edit_id = ? ORDER BY revision", (edit_id,)
+        ).fetchall()
+        return json.loads(row[0]), [json.loads(p[0]) for p in patches]
+
+    def undo(self, edit_id: str) -> dict | None:
+        """删除链尾修订并返回上一修订的元信息（已写回为当前记录）；没有更早的修订时返回 None，链不变。"""
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT revision, record FROM pending_revisions WHERE edit_id = ? ORDER BY revision DESC LIMIT 2",
+                (edit_id,),
+            ).fetchall()
+            if len(rows) < 2:
+                return None
+            conn.execute(
+                "DELETE FROM pending_revisions WHERE edit_id = ? AND revision = ?", (edit_id, rows[0][0])
+            )
+            record = json.loads(rows[1][1])
+            conn.execute(
+                "UPDATE pending_edits SET updated_at = ?, record = ? WHERE edit_id = ?",
+                (time.time(), rows[1][1], edit_id),
+            )
+        return record
+
+    @staticmethod
+    def _purge(conn: sqlite3.Connection, edit_ids: list[str]) -> None:
+        for edit_id in edit_ids:
+            conn.execute("DELETE FROM pending_edits WHERE edit_id = ?", (edit_id,))
+            conn.execute("DELETE FROM pending_bases WHERE edit_id = ?", (edit_id,))
+            conn.execute("DELETE FROM pending_revisions WHERE edit_id = ?", (edit_id,))
+
+    def delete(self, edit_id: str) -> None:
+        with self._transaction() as conn:
+            self._purge(conn, [edit_id])
+
+    def pop_page(self, page_id: str) -> list[dict]:
+        """删除并返回该原型的全部草稿。"""
+        with self._transaction() as conn:
+            rows = conn.execute("SELECT edit_id, record FROM pending_edits WHERE page_id = ?", (page_id,)).fetchall()
+            self._purge(conn, [row[0] for row in rows])
+        return [json.loads(row[1]) for row in rows]
+
+    def pop_expired(self, max_age_seconds: float) -> list[dict]:
+        """删除并返回超过 max_age_seconds 未更新的草稿。"""
+        cutoff = time.time() - max_age_seconds
+        with self._transaction() as conn:
+            rows = conn.execute("SELECT edit_id, record FROM pending_edits WHERE updated_at < ?", (cutoff,)).fetchall()
+            self._purge(conn, [row[0] for row in rows])
+        return [json.loads(row[1]) for row in rows]
+
+    def edit_ids(self) -> set[str]:
+        return {row[0] for row in self._connect().execute("SELECT edit_id FROM pending_edits")}
@@ -208,23 +208,5 @@ def build_memory_block(summary: str, user_profile: str) -> str:
     return "\n".join(lines) if lines else "（暂无）"
 
 
-def build_context_block(chunks: list[tuple[str, str, str, str]]) -> str:
-    """构建 RAG 上下文；每项为 (title, section, text, parent_text)。"""
-    seen_sections: set[str] = set()
-    lines = []
-    for i, (title, section, text, parent_text) in enumerate(chunks, 1):
-        header = f"[{i}] 《{title}》· {section}"
-        section_key = f"{title}|{section}"
-        body = text
-        if parent_text.strip() and parent_text.strip() != text.strip() and section_key not in seen_sections:
-            preview = parent_text.strip()
-            if len(preview) > 800:
-                preview = preview[:800] + "…"
-            body = f"【章节上下文】\n{preview}\n\n【匹配片段】\n{text}"
-            seen_sections.add(section_key)
-        lines.append(f"{header}\n{body}")
-    return "\n\n".join(lines)
-
-
 def is_refusal(text: str) -> bool:
     return any(h in text for h in REFUSAL_HINTS)
@@ -4,12 +4,13 @@ from __future__ import annotations
 import json
 import re
 import shutil
+import time
 from copy import deepcopy
 from datetime import datetime, timezone
 from pathlib import Path
 from uuid import uuid4
 
-from config import PROTOTYPE_SKELETON_DIR, PROTOTYPES_DIR
+from config import PENDING_EDIT_TTL_HOURS, PROTOTYPE_SKELETON_DIR, PROTOTYPES_DIR
 from embedder import chat_once
 from prompts import PROTOTYPE_EDIT_PROMPT
 from prototype_design import (
@@ -18,15 +19,24 @@ from prototype_design import (
     ROW_ACTION_MAP,
     _build_toolbar_buttons,
 )
+from pending_store import PendingEditStore
 from prototype_registry import register_prototype
 from prototype_edit_slots import EditOperationSlots, EditPlanResult, plan_edit_operation
 from prototype_spec import apply_instruction_toolbar_variants, normalize_spec, resolve_toolbar_variant
-from prototype_runtime import sync_spec_runtime
+from prototype_runtime import render_module_html, sync_spec_runtime
 from prototype_slots import _build_form_fields, _label_to_field
+from spec_patch import diff as diff_spec, replay as replay_spec
 
+# 旧版按文件存放的草稿目录（首次打开 pending_store 时导入）
 PENDING_DIR = PROTOTYPES_DIR / "pending"
+PENDING_DB = PROTOTYPES_DIR / "pending.sqlite3"
 DRAFTS_DIR = PROTOTYPE_SKELETON_DIR / "generated" / "_drafts"
 PREVIEW_PREFIX = "/api/prototype-files/generated/_drafts"
+# 草稿目录只存 spec 派生的运行时产物；HTML 壳按草稿 spec 即时渲染，其余文件回退到正式原型目录
+DRAFT_RENDERED_FILES = frozenset({"index.html", "logic-docs.html"})
+_DRAFT_ID = re.compile(r"[\w-]+")
+
+pending_store = PendingEditStore(PENDING_DB, legacy_dir=PENDING_DIR)
 
 ROW_ACTION_LABELS = {"edit": "编辑", "delete": "删除", "view": "查看"}
 
@@ -277,14 +287,41 @@ def _sync_logic_filters(spec: dict) -> None:
     docs["filters"] = filter_docs or [["无", "-", "展示全部"]]
 
 
-def _sync_spec_derivatives(spec: dict) -> None:
-    _sync_form_fields(spec)
-    _sync_logic_fields(spec)
-    _sync_logic_filters(spec)
+def _sync_spec_derivatives(spec: dict, touched: set[str] | None = None) -> None:
+    """重算派生字段；touched 给定时只重算受影响的部分（列 → 表单字段 / 字段说明，检索项 → 检索说明）。"""
+    if touched is None or "columns" in touched:
+        _sync_form_fields(spec)
+        _sync_logic_fields(spec)
+    if touched is None or "filters" in touched:
+        _sync_logic_filters(spec)
+
+
+class _SectionCopies:
+    """apply_ops 的写时复制：顶层字段首次被修改前才复制该字段，未改动字段与原 spec 共享。"""
+
+    def __init__(self, spec: dict) -> None:
+        self.spec = dict(spec)
+        self.touched: set[str] = set()
 
+    def own(self, *keys: str) -> dict:
+        for key in keys:
+            if key not in self.touched:
+                self.touched.add(key)
+                if key in self.spec:
+                    self.spec[key] = deepcopy(self.spec[key])
+        return self.spec
 
-def apply_ops(spec: dict, ops: list[dict]) -> dict:
-    updated = deepcopy(spec)
+
+def apply_ops(spec: dict, ops: list[dict], *, incremental: bool = False) -> dict:
+    """
+    应用编辑 ops，返回新 spec；未被 ops 涉及的顶层字段与传入 spec 共享（调用方不应原地修改）。
+
+    incremental=True 时只重算 / 归一化 ops 改动过的部分，要求传入的 spec 已归一化（见 prepare_spec_for_edit）；
+    否则整体重算派生字段并归一化。
+    """
+    sections = _SectionCopies(spec)
+    own = sections.own
+    updated = sections.spec
     for op in ops:
         if not isinstance(op, dict):
             continue
@@ -292,13 +329,13 @@ def apply_ops(spec: dict, ops: list[dict]) -> dict:
         if name == "set":
             path = str(op.get("path") or "")
             if path in ("moduleName", "breadcrumb", "notes"):
-                updated[path] = str(op.get("value") or "")
+                own(path)[path] = str(op.get("value") or "")
             continue
         if name == "updateModuleName":
-            updated["moduleName"] = str(op.get("value") or op.get("label") or "")
+            own("moduleName")["moduleName"] = str(op.get("value") or op.get("label") or "")
             continue
         if name == "updateBreadcrumb":
-            updated["breadcrumb"] = str(op.get("value") or "")
+            own("breadcrumb")["breadcrumb"] = str(op.get("value") or "")
             continue
         if name == "updateToolbarButton":
             match = str(op.get("match") or "")
@@ -306,7 +343,7 @@ def apply_ops(spec: dict, ops: list[dict]) -> dict:
             if idx is None:
                 continue
             patch = op.get("patch") or {}
-            btn = updated["toolbarButtons"][idx]
+            btn = own("toolbarButtons", "logicDocs")["toolbarButtons"][idx]
             if patch.get("label"):
                 old_label = btn.get("label")
                 btn["label"] = str(patch["label"])
@@ -338,6 +375,7 @@ def apply_ops(spec: dict, ops: list[dict]) -> dict:
             idx = _find_toolbar_index(updated, match)
             if idx is None:
                 continue
+            own("toolbarButtons", "logicDocs")
             label = updated["toolbarButtons"][idx].get("label")
             updated["toolbarButtons"].pop(idx)
             _remove_logic_button(updated, str(label), "工具栏")
@@ -347,7 +385,7 @@ def apply_ops(spec: dict, ops: list[dict]) -> dict:
             label = str(item.get("label") or "")
             if not label:
                 continue
-            buttons = list(updated.get("toolbarButtons") or [])
+            buttons = list(own("toolbarButtons", "logicDocs").get("toolbarButtons") or [])
             new_btn = _build_toolbar_buttons(
                 [{
                     "label": label,
@@ -376,7 +414,7 @@ def apply_ops(spec: dict, ops: list[dict]) -> dict:
             if idx is None:
                 continue
             patch = op.get("patch") or {}
-            col = updated["columns"][idx]
+            col = own("columns")["columns"][idx]
             if patch.get("label"):
                 col["label"] = str(patch["label"])
             if patch.get("fieldType"):
@@ -396,7 +434,7 @@ def apply_ops(spec: dict, ops: list[dict]) -> dict:
             idx = _find_column_index(updated, match)
             if idx is None:
                 continue
-            updated["columns"].pop(idx)
+            own("columns")["columns"].pop(idx)
             continue
         if name == "addColumn":
             item = op.get("item") or op
@@ -413,16 +451,17 @@ def apply_ops(spec: dict, ops: list[dict]) -> dict:
                 col["type"] = "datetime"
             if item.get("sortable"):
                 col["sortable"] = True
-            updated.setdefault("columns", []).append(col)
+            own("columns").setdefault("columns", []).append(col)
             continue
         if name == "removeFilter":
             match = str(op.get("match") or "")
             idx = _find_filter_index(updated, match)
             if idx is None:
                 continue
-            updated["filters"].pop(idx)
+            own("filters")["filters"].pop(idx)
             continue
         if name == "updateRowActionLogic":
+            own("logicDocs")
             label = str(op.get("match") or op.get("label") or "")
             _upsert_logic_button(
                 updated,
@@ -433,6 +472,7 @@ def apply_ops(spec: dict, ops: list[dict]) -> dict:
             )
             continue
         if name == "removeRowAction":
+            own("rowActions", "logicDocs")
             match = str(op.get("match") or "")
             action_key = ROW_ACTION_MAP.get(match)
             if not action_key:
@@ -447,6 +487,7 @@ def apply_ops(spec: dict, ops: list[dict]) -> dict:
         if name == "addRowAction":
             label = str(op.get("label") or op.get("match") or "")
             action_key = ROW_ACTION_MAP.get(label, "edit" if "编辑" in label else "delete" if "删" in label else "view")
+            own("rowActions", "logicDocs")
             actions = list(updated.get("rowActions") or [])
             if action_key not in actions:
                 actions.append(action_key)
@@ -461,7 +502,10 @@ def apply_ops(spec: dict, ops: list[dict]) -> dict:
 
     if not updated.get("columns"):
         raise ValueError("修改后至少需保留一列表格列")
-    _sync_spec_derivatives(updated)
+    touched = sections.touched if incremental else None
+    if touched is None or touched & {"columns", "filters"}:
+        own("logicDocs")
+    _sync_spec_derivatives(updated, touched)
     partial = {
         "moduleName": updated.get("moduleName"),
         "pageId": updated.get("pageId"),
@@ -471,48 +515,99 @@ def apply_ops(spec: dict, ops: list[dict]) -> dict:
         "dataFile": updated.get("dataFile"),
         "columns": updated.get("columns"),
     }
-    return normalize_spec(updated, partial)
+    return normalize_spec(updated, partial, sections=touched)
 
 
-def _pending_path(page_id: str, edit_id: str) -> Path:
-    return PENDING_DIR / page_id / f"{edit_id}.json"
+def prepare_spec_for_edit(spec: dict) -> dict:
+    """编辑基准：整体重算派生字段并归一化一次，此后各修订按改动部分增量处理。"""
+    return apply_ops(spec, [])
 
 
 def _load_pending(page_id: str, edit_id: str) -> dict:
-    path = _pending_path(page_id, edit_id)
-    if not path.is_file():
+    record = pending_store.get(edit_id)
+    if not record or str(record.get("pageId")) != page_id:
         raise FileNotFoundError("未找到待确认的修改草稿")
-    return json.loads(path.read_text(encoding="utf-8"))
+    return record
 
 
-def _save_pending(record: dict) -> None:
-    page_id = record["pageId"]
-    edit_id = record["editId"]
-    path = _pending_path(page_id, edit_id)
-    path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text(json.dumps(record, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+def _save_pending(record: dict, *, base_spec: dict | None = None, patch: list[dict] | None = None) -> None:
+    pending_store.put(record, base_spec=base_spec, patch=patch)
+
+
+def _record_spec(record: dict) -> dict | None:
+    """草稿当前 spec：旧记录直接内嵌 spec，新记录由基准 spec 回放 patch 链得到。"""
+    if record.get("spec"):
+        return deepcopy(record["spec"])
+    chain = pending_store.spec_chain(str(record.get("editId") or ""))
+    if chain is None:
+        return None
+    return replay_spec(*chain)
+
+
+def _remove_draft_dir(edit_id: str) -> None:
+    draft_dir = DRAFTS_DIR / edit_id
+    if draft_dir.is_dir():
+        shutil.rmtree(draft_dir, ignore_errors=True)
 
 
 def _cleanup_pending(record: dict) -> None:
     edit_id = record.get("editId")
-    page_id = record.get("pageId")
     if edit_id:
-        draft_dir = DRAFTS_DIR / edit_id
-        if draft_dir.is_dir():
-            shutil.rmtree(draft_dir, ignore_errors=True)
-    if page_id and edit_id:
-        path = _pending_path(page_id, edit_id)
-        path.unlink(missing_ok=True)
+        _remove_draft_dir(str(edit_id))
+        pending_store.delete(str(edit_id))
+
+
+def collect_expired_drafts() -> int:
+    """回收超过 PENDING_EDIT_TTL_HOURS 未更新的草稿记录，以及无记录且同样过期的草稿目录。返回回收数。"""
+    max_age = PENDING_EDIT_TTL_HOURS * 3600
+    expired = pending_store.pop_expired(max_age)
+    for record in expired:
+        _remove_draft_dir(str(record.get("editId") or ""))
+    removed = len(expired)
+    if DRAFTS_DIR.is_dir():
+        live = pending_store.edit_ids()
+        cutoff = time.time() - max_age
+        for draft_dir in DRAFTS_DIR.iterdir():
+            if draft_dir.is_dir() and draft_dir.name not in live and draft_dir.stat().st_mtime < cutoff:
+                shutil.rmtree(draft_dir, ignore_errors=True)
+                removed += 1
+    return removed
+
+
+def _within(path: Path, root: Path) -> bool:
+    try:
+        path.relative_to(root)
+    except ValueError:
+        return False
+    return True
+
+
+def resolve_draft_file(edit_id: str, rel_path: str) -> Path | str:
+    """草稿预览文件：草稿目录中有的直接返回路径，HTML 壳返回渲染后的文本，其余回退到正式原型目录。"""
+    if not _DRAFT_ID.fullmatch(edit_id):
+        raise FileNotFoundError("草稿不存在")
+    draft_dir = (DRAFTS_DIR / edit_id).resolve()
+    spec_path = draft_dir / "module.spec.json"
+    if not spec_path.is_file():
+        raise FileNotFoundError("草稿不存在")
+    name = rel_path.strip("/") or "index.html"
+    if name in DRAFT_RENDERED_FILES:
+        spec = json.loads(spec_path.read_text(encoding="utf-8"))
+        return render_module_html(spec, draft_dir, name)
+
+    candidate = (draft_dir / name).resolve()
+    if _within(candidate, draft_dir) and candidate.is_file():
+        return candidate
+    page_id = str(json.loads(spec_path.read_text(encoding="utf-8")).get("pageId") or "")
+    base_dir = (PROTOTYPE_SKELETON_DIR / "generated" / page_id).resolve()
+    candidate = (base_dir / name).resolve()
+    if page_id and _within(candidate, base_dir) and candidate.is_file():
+        return candidate
+    raise FileNotFoundError(name)
 
 
 def _load_active_pending_record(page_id: str) -> dict | None:
-    page_dir = PENDING_DIR / page_id
-    if not page_dir.is_dir():
-        return None
-    files = sorted(page_dir.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
-    if not files:
-        return None
-    return json.loads(files[0].read_text(encoding="utf-8"))
+    return pending_store.latest(page_id)
 
 
 def load_spec_for_edit(page_id: str, *, edit_id: str | None = None) -> tuple[dict, dict | None]:
@@ -525,8 +620,9 @@ def load_spec_for_edit(page_id: str, *, edit_id: str | None = None) -> tuple[dic
             record = None
     if record is None:
         record = _load_active_pending_record(page_id)
-    if record and record.get("spec"):
-        return deepcopy(record["spec"]), record
+    spec = _record_spec(record) if record else None
+    if spec is not None:
+        return spec, record
     return load_spec(page_id), None
 
 
@@ -565,7 +661,10 @@ async def create_edit_preview(
     if not plan.complete:
         raise ValueError(plan.clarification or "修改指令不完整，请补充信息。")
 
-    new_spec = apply_ops(spec, plan.ops or [])
+    # 新草稿 / 旧版内嵌 spec 的草稿：先整体归一化一次作为基准，之后各修订只增量处理改动部分
+    base_spec = prepare_spec_for_edit(spec) if not pending or pending.get("spec") else None
+    prev_spec = base_spec if base_spec is not None else spec
+    new_spec = apply_ops(prev_spec, plan.ops or [], incremental=True)
     new_spec = apply_instruction_toolbar_variants(new_spec, instruction, plan.ops or [])
     new_spec["pageId"] = page_id
 
@@ -578,14 +677,11 @@ async def create_edit_preview(
         revision = 1
         created_at = _now_iso()
 
-    draft_dir = DRAFTS_DIR / edit_id
-    draft_dir.mkdir(parents=True, exist_ok=True)
-
     sync_spec_runtime(
         new_spec,
-        output_dir=draft_dir,
+        output_dir=DRAFTS_DIR / edit_id,
         persist_spec=False,
-        bootstrap_html=True,
+        runtime_only=True,
     )
 
     instructions = _merge_instruction_history(pending, instruction)
@@ -598,12 +694,11 @@ async def create_edit_preview(
         "revision": revision,
         "summary": summary,
         "previewUrl": _preview_url(edit_id),
-        "spec": new_spec,
         "editSlots": plan.slots.to_dict(),
         "createdAt": created_at,
         "updatedAt": _now_iso(),
     }
-    _save_pending(record)
+    _save_pending(record, base_spec=base_spec, patch=diff_spec(prev_spec, new_spec))
     return {
         "editId": edit_id,
         "pageId": page_id,
@@ -644,29 +739,22 @@ async def try_plan_edit(
 
 async def create_edit_preview_legacy(page_id: str, instruction: str) -> dict:
     """旧版：LLM 直接生成 ops（fallback）。"""
-    page_dir = PENDING_DIR / page_id
-    if page_dir.is_dir():
-        for path in list(page_dir.glob("*.json")):
-            try:
-                _cleanup_pending(json.loads(path.read_text(encoding="utf-8")))
-            except (OSError, json.JSONDecodeError):
-                path.unlink(missing_ok=True)
+    for record in pending_store.pop_page(page_id):
+        _remove_draft_dir(str(record.get("editId") or ""))
 
     spec = load_spec(page_id)
     plan = await plan_edits_with_llm(spec, instruction)
-    new_spec = apply_ops(spec, plan.get("ops") or [])
+    base_spec = prepare_spec_for_edit(spec)
+    new_spec = apply_ops(base_spec, plan.get("ops") or [], incremental=True)
     new_spec = apply_instruction_toolbar_variants(new_spec, instruction, plan.get("ops") or [])
     new_spec["pageId"] = page_id
 
     edit_id = uuid4().hex[:12]
-    draft_dir = DRAFTS_DIR / edit_id
-    draft_dir.mkdir(parents=True, exist_ok=True)
-
     sync_spec_runtime(
         new_spec,
-        output_dir=draft_dir,
+        output_dir=DRAFTS_DIR / edit_id,
         persist_spec=False,
-        bootstrap_html=True,
+        runtime_only=True,
     )
 
     record = {
@@ -675,10 +763,10 @@ async def create_edit_preview_legacy(page_id: str, instruction: str) -> dict:
         "instruction": instruction.strip(),
         "summary": str(plan.get("summary") or "已生成修改预览"),
         "previewUrl": _preview_url(edit_id),
-        "spec": new_spec,
+        "revision": 1,
         "createdAt": _now_iso(),
     }
-    _save_pending(record)
+    _save_pending(record, base_spec=base_spec, patch=diff_spec(base_spec, new_spec))
     return {
         "editId": edit_id,
         "pageId": page_id,
@@ -690,7 +778,9 @@ async def create_edit_preview_legacy(page_id: str, instruction: str) -> dict:
 
 def confirm_edit(page_id: str, edit_id: str) -> dict:
     record = _load_pending(page_id, edit_id)
-    spec = record["spec"]
+    spec = _record_spec(record)
+    if spec is None:
+        raise FileNotFoundError("草稿 spec 不存在")
     if str(spec.get("pageId")) != page_id:
         raise ValueError("草稿与原型 pageId 不一致")
 
@@ -714,6 +804,37 @@ def cancel_edit(page_id: str, edit_id: str) -> dict:
     return {"ok": True, "pageId": page_id, "editId": edit_id}
 
 
+def undo_edit(page_id: str, edit_id: str) -> dict:
+    """撤销草稿最近一次修订；只剩首个修订时等同于取消草稿。"""
+    record = _load_pending(page_id, edit_id)
+    previous = None if record.get("spec") else pending_store.undo(edit_id)
+    if previous is None:
+        _cleanup_pending(record)
+        return {"ok": True, "pageId": page_id, "editId": edit_id, "cancelled": True}
+
+    spec = _record_spec(previous)
+    if spec is None:
+        raise FileNotFoundError("草稿 spec 不存在")
+    sync_spec_runtime(
+        spec,
+        output_dir=DRAFTS_DIR / edit_id,
+        persist_spec=False,
+        runtime_only=True,
+    )
+    return {
+        "ok": True,
+        "pageId": page_id,
+        "editId": edit_id,
+        "cancelled": False,
+        "summary": previous.get("summary", ""),
+        "previewUrl": previous.get("previewUrl", ""),
+        "instruction": previous.get("instruction", ""),
+        "instructions": previous.get("instructions") or [],
+        "revision": previous.get("revision", 1),
+        "editSlots": previous.get("editSlots") or {},
+    }
+
+
 def get_pending_edit(page_id: str) -> dict | None:
     record = _load_active_pending_record(page_id)
     if not record:
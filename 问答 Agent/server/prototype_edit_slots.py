@@ -6,8 +6,7 @@ import re
 from dataclasses import dataclass, field
 from typing import Literal
 
-from chat_history import format_history_text
-from config import HISTORY_TURNS
+from chat_history import HistoryView
 from embedder import chat_once
 from prompts import (
     PROTOTYPE_EDIT_ADD_SLOT_PROMPT,
@@ -48,6 +47,27 @@ _COLUMN_HINT = re.compile(r"列|字段|属性|栏位")
 _FILTER_HINT = re.compile(r"检索|筛选|过滤")
 _MODULE_HINT = re.compile(r"模块名|业务域|面包屑")
 _BUTTON_HINT = re.compile(r"按钮|toolbar|主要按钮|工具栏|顶部按钮|列表上方", re.IGNORECASE)
+# 规则快速路径只接受整句可解析的简单表述，带附加说明（逗号分句等）的交给 LLM
+_QUOTE = "「」“”\"'『』"
+_ADD_BUTTON_RE = re.compile(
+    rf"(?:请|帮我)?(?:在(?:列表上方|工具栏|顶部)的?)?(?:添加|新增|增加|加)(?:一个|个)?(?:工具栏|顶部)?按钮"
+    rf"[：:\s]*[{_QUOTE}]?(?P<a>[^，,。；;\s{_QUOTE}]{{1,12}})[{_QUOTE}]?"
+    rf"|(?:请|帮我)?(?:在(?:列表上方|工具栏|顶部)的?)?(?:添加|新增|增加|加)(?:一个|个)?"
+    rf"[{_QUOTE}]?(?P<b>[^，,。；;\s{_QUOTE}]{{1,12}}?)[{_QUOTE}]?按钮"
+)
+_RENAME_RE = re.compile(
+    rf"(?:请|帮我)?(?:把|将)?[{_QUOTE}]?(?P<old>[^，,。；;{_QUOTE}]+?)[{_QUOTE}]?"
+    rf"(?:的?(?:名称|文字|名字))?(?:改名为|改名叫|改名成|重命名为|改为|改成|换成)"
+    rf"[{_QUOTE}]?(?P<new>[^，,。；;\s{_QUOTE}]{{1,12}})[{_QUOTE}]?"
+)
+_SENTENCE_END = re.compile(r"[。！!\s]+$")
+# 并列多个目标（「审核按钮和导出按钮」）规则路径只能取到一个，交给 LLM
+_CONJUNCTION = re.compile(r"[和及、并]")
+# 否定 / 疑问句（「不要删除状态列」「删除状态列吗」）规则路径会规划出相反或未确认的操作，交给 LLM
+_NEGATION_OR_QUESTION = re.compile(r"不要|别|不用|吗|[？?]|是否")
+# 按钮名里的命名动词（「新增按钮叫审核」）
+_NAMING_PREFIX = re.compile(r"^(?:叫做|叫|名称为|名字为|名为|命名为)")
+_NAMING_VERB = re.compile(r"叫|名为|名称为|名字为|命名为")
 
 ROW_ACTION_LABELS = {"edit": "编辑", "delete": "删除", "view": "查看"}
 
@@ -343,6 +363,122 @@ def infer_change_kind(instruction: str, payload: dict) -> ChangeKind | None:
     return None
 
 
+def _hinted_target_type(instruction: str) -> TargetType | None:
+    if _TOOLBAR_HINT.search(instruction) or _BUTTON_HINT.search(instruction):
+        return "toolbarButton"
+    if _ROW_HINT.search(instruction):
+        return "rowAction"
+    if _FILTER_HINT.search(instruction) and not _COLUMN_HINT.search(instruction):
+        return "filter"
+    if _COLUMN_HINT.search(instruction):
+        return "column"
+    return None
+
+
+def _find_spec_target(spec: dict, text: str, instruction: str) -> tuple[TargetType, str] | None:
+    """
+    在 text 中找 spec 已有的名称；目标类型由提示词或名称唯一确定，否则返回 None。
+
+    text 中出现多个不同名称（被更长名称包含的除外）时同样返回 None。
+    """
+    label_sets: dict[TargetType, list[str]] = {
+        "toolbarButton": _toolbar_labels(spec),
+        "column": _column_labels(spec),
+        "filter": _filter_labels(spec),
+        "rowAction": _row_action_labels(spec),
+    }
+    hinted = _hinted_target_type(instruction)
+    if hinted and any(label in text for label in label_sets[hinted]):
+        label_sets = {hinted: label_sets[hinted]}
+    hits = {
+        (target_type, label)
+        for target_type, labels in label_sets.items()
+        for label in labels
+        if label and label in text
+    }
+    matched = {label for _, label in hits}
+    outermost = {label for label in matched if not any(label != other and label in other for other in matched)}
+    if len(outermost) != 1:
+        return None
+    label = outermost.pop()
+    types = {target_type for target_type, hit in hits if hit == label}
+    return (types.pop(), label) if len(types) == 1 else None
+
+
+def extract_edit_slots_by_rules(
+    spec: dict, instruction: str, state: EditOperationSlots
+) -> EditOperationSlots | None:
+    """
+    确定性槽位解析（LLM 之前的快速路径）。
+
+    仅处理全部槽位可由正则与 spec 现有名称确定的简单指令：删除已有项、新增列 / 工具栏按钮、
+    修改已有项的颜色或名称；存在歧义或附加说明时返回 None，由 extract_edit_slots 调用 LLM。
+    """
+    if state.target_type or state.target_match or state.change_kind or state.payload:
+        return None
+    if _NEGATION_OR_QUESTION.search(instruction):
+        return None
+    text = _SENTENCE_END.sub("", instruction.strip())
+    # 「把新增价卡改名为新建」：名称里的动词会误导 classify_op_type，整句改名优先
+    op_type = "update" if _RENAME_RE.fullmatch(text) else state.op_type or classify_op_type(text)
+    if not text or not op_type or re.search(r"[，,；;]", text) or _CONJUNCTION.search(text):
+        return None
+
+    if op_type == "remove":
+        residual = _REMOVE_PATTERN.sub("", text, count=1)
+        target = _find_spec_target(spec, residual, text)
+        if not target:
+            return None
+        return EditOperationSlots(op_type="remove", target_type=target[0], target_match=target[1])
+
+    if op_type == "add":
+        if extract_variant_from_text(text) or _UPDATE_PATTERN.search(text) or _REMOVE_PATTERN.search(text):
+            return None
+        column_labels = extract_add_column_labels(text)
+        if column_labels and not _FILTER_HINT.search(text):
+            return EditOperationSlots(
+                op_type="add",
+                target_type="column",
+                payload={"label": column_labels[0], "fieldType": _infer_column_field_type(column_labels[0])},
+            )
+        match = _ADD_BUTTON_RE.fullmatch(text)
+        if match and not _ROW_HINT.search(text):
+            label = _NAMING_PREFIX.sub("", (match.group("a") or match.group("b") or "").strip())
+            if label and "的" not in label and not _NAMING_VERB.search(label):
+                return EditOperationSlots(op_type="add", target_type="toolbarButton", payload={"label": label})
+        return None
+
+    variant = extract_variant_from_text(text)
+    change_kind = infer_change_kind(text, {})
+    if change_kind == "style" and variant:
+        # 目标名称在修改动词之前（「把导出按钮改成红色」）
+        target = _find_spec_target(spec, _UPDATE_PATTERN.split(text, maxsplit=1)[0], text)
+        if not target or target[0] not in ("toolbarButton", "column"):
+            return None
+        return EditOperationSlots(
+            op_type="update",
+            target_type=target[0],
+            target_match=target[1],
+            change_kind="style",
+            payload={"variant": variant},
+        )
+    if change_kind in (None, "label") and not variant:
+        match = _RENAME_RE.fullmatch(text)
+        if not match:
+            return None
+        target = _find_spec_target(spec, match.group("old"), text)
+        if not target or target[0] not in ("toolbarButton", "column"):
+            return None
+        return EditOperationSlots(
+            op_type="update",
+            target_type=target[0],
+            target_match=target[1],
+            change_kind="label",
+            payload={"label": match.group("new")},
+        )
+    return None
+
+
 def _slot_prompt_for(op_type: OpType) -> str:
     if op_type == "add":
         return PROTOTYPE_EDIT_ADD_SLOT_PROMPT
@@ -388,16 +524,18 @@ async def extract_edit_slots(
     state: EditOperationSlots,
     *,
     instruction: str,
+    history: HistoryView | None = None,
 ) -> EditOperationSlots:
     op_type = state.op_type or classify_op_type(instruction)
     if not op_type:
         return state
+    view = history if history is not None else HistoryView.build(messages)
 
     spec_summary = _spec_targets_summary(spec)
     user_content = (
         f"## 当前原型配置摘要\n{spec_summary}\n\n"
         f"## 已填槽位\n{json.dumps(state.to_dict(), ensure_ascii=False)}\n\n"
-        f"## 对话历史\n{format_history_text(messages[:-1], HISTORY_TURNS)}\n\n"
+        f"## 对话历史\n{view.text('slots')}\n\n"
         f"## 当前用户消息\n{instruction.strip()}\n\n"
         f"## 操作类型（已判定）\n{op_type}\n\n"
         "请抽取/更新槽位，合并已有槽位，只输出 JSON。"
@@ -615,7 +753,8 @@ async def plan_edit_operation(
         state.op_type = classify_op_type(instruction)
 
     try:
-        state = await extract_edit_slots(messages, spec, state, instruction=instruction)
+        ruled = extract_edit_slots_by_rules(spec, instruction, state)
+        state = ruled or await extract_edit_slots(messages, spec, state, instruction=instruction)
     except (json.JSONDecodeError, ValueError):
         if not state.is_complete():
             return EditPlanResult(
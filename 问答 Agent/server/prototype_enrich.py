@@ -1,18 +1,21 @@
 """Spec 富化：design / 槽位 → 完整 module.spec（P1）。"""
 from __future__ import annotations
 
+import asyncio
 import json
 import re
 from copy import deepcopy
 from pathlib import Path
 from typing import Literal
 
-from config import PROTOTYPE_SKELETON_DIR
+from config import ENRICH_DEADLINE_SECONDS, ENRICH_LLM_ATTEMPTS, PROTOTYPE_SKELETON_DIR
 from embedder import chat_once
 from prompts import PROTOTYPE_ENRICH_PROMPT
 from prototype_spec import normalize_spec, validate_spec
 
 _EXAMPLE_SPEC_PATH = PROTOTYPE_SKELETON_DIR / "examples" / "demo-list.spec.json"
+# 并发 LLM 候选的采样温度：第二个候选略放开，避免与第一个给出相同的错误输出
+_ATTEMPT_TEMPERATURES = (0.0, 0.4)
 
 
 class EnrichError(Exception):
@@ -61,6 +64,7 @@ async def enrich_spec(
     source: Literal["design", "chat"] = "design",
     raw: dict | None = None,
     repair_hint: str = "",
+    temperature: float = 0.0,
 ) -> dict:
     user_content = assemble_enrich_prompt(partial, raw, source)
     if repair_hint:
@@ -71,7 +75,7 @@ async def enrich_spec(
             {"role": "system", "content": PROTOTYPE_ENRICH_PROMPT},
             {"role": "user", "content": user_content},
         ],
-        temperature=0.0,
+        temperature=temperature,
     )
     parsed = _parse_spec_json(raw_llm)
     spec = normalize_spec(parsed, partial)
@@ -81,36 +85,68 @@ async def enrich_spec(
     return spec
 
 
+async def _enrich_candidate(
+    partial: dict,
+    raw: dict | None,
+    source: Literal["design", "chat"],
+    temperature: float,
+) -> dict | None:
+    try:
+        return await enrich_spec(partial, source=source, raw=raw, temperature=temperature)
+    except Exception as exc:
+        # 任一候选出错（含 API / 网络超时）只算该候选失败，不影响其它候选与规则 spec
+        print(f"Spec 富化候选失败（temperature={temperature}）：{exc}")
+        return None
+
+
+def _fallback_spec(partial: dict, raw: dict | None, source: Literal["design", "chat"]) -> dict:
+    from prototype_design import build_spec_from_design
+
+    if source == "design" and raw:
+        return normalize_spec(build_spec_from_design(raw), partial)
+    return normalize_spec(deepcopy(partial), partial)
+
+
+def _discard(task: asyncio.Future) -> None:
+    """不再需要的任务：未完成则取消，已完成则取走结果，避免 "Task exception was never retrieved"。"""
+    if not task.cancel() and not task.cancelled():
+        task.exception()
+
+
 async def enrich_spec_with_fallback(
     partial: dict,
     raw: dict | None = None,
     *,
     source: Literal["design", "chat"] = "design",
 ) -> tuple[dict, bool]:
-    """返回 (spec, enriched)。失败时 fallback 到规则 build_spec_from_design。"""
-    from prototype_design import build_spec_from_design
-
+    """
+    返回 (spec, enriched)。
+
+    规则 spec 与 ENRICH_LLM_ATTEMPTS 个 LLM 富化候选并发生成：ENRICH_DEADLINE_SECONDS 内首个通过
+    validate_spec 的 LLM 候选胜出并取消其余候选；全部失败或超时则返回规则 spec。
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max(0.0, ENRICH_DEADLINE_SECONDS)
+    fallback = asyncio.ensure_future(asyncio.to_thread(_fallback_spec, partial, raw, source))
+    pending = {
+        asyncio.ensure_future(_enrich_candidate(partial, raw, source, temperature))
+        for temperature in _ATTEMPT_TEMPERATURES[: max(0, ENRICH_LLM_ATTEMPTS)]
+    }
+    use_fallback = False
     try:
-        spec = await enrich_spec(partial, source=source, raw=raw)
-        return spec, True
-    except EnrichError as first_err:
-        try:
-            spec = await enrich_spec(
-                partial,
-                source=source,
-                raw=raw,
-                repair_hint=str(first_err),
-            )
-            return spec, True
-        except (EnrichError, json.JSONDecodeError, RuntimeError):
-            pass
-    except (json.JSONDecodeError, RuntimeError):
-        pass
-
-    if source == "design" and raw:
-        fallback = build_spec_from_design(raw)
-        fallback = normalize_spec(fallback, partial)
-        return fallback, False
-
-    fallback = normalize_spec(deepcopy(partial), partial)
-    return fallback, False
+        while pending:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                spec = task.result()
+                if spec is not None:
+                    return spec, True
+        use_fallback = True
+    finally:
+        for task in pending:
+            task.cancel()
+        if not use_fallback:
+            _discard(fallback)
+    return await fallback, False
@@ -7,7 +7,8 @@ from typing import AsyncIterator
 
 from context import refresh_session_context
 from prototype_edit import cancel_edit, confirm_edit, create_edit_preview, try_plan_edit
-from prototype_registry import list_prototypes, sync_registry
+from prototype_index import prototype_index
+from prototype_registry import list_prototypes_async
 
 _EDIT_CONFIRM = re.compile(
     r"^(确认|确认替换|应用修改|就这样|可以了|好的确认|确认修改)(吧|了)?[。！!]?$",
@@ -152,20 +153,16 @@ def _cleanup_draft_if_any(edit_state: dict | None) -> None:
 
 
 def _page_id_from_items(page_id: str, items: list[dict]) -> str | None:
-    for item in items:
-        if str(item.get("pageId") or "") == page_id:
-            return page_id
-    return None
+    return page_id if prototype_index(items).has_page(page_id) else None
 
 
 def resolve_target_page_id(instruction: str, items: list[dict], hint_page_id: str | None = None) -> str | None:
     """从用户回复中解析目标原型 pageId（优先 ID / 序号 / 最长模块名）。"""
     if not items:
         return None
-    if hint_page_id:
-        found = _page_id_from_items(hint_page_id, items)
-        if found:
-            return found
+    index = prototype_index(items)
+    if hint_page_id and index.has_page(hint_page_id):
+        return hint_page_id
 
     text = instruction.strip()
     if not text:
@@ -179,45 +176,20 @@ def resolve_target_page_id(instruction: str, items: list[dict], hint_page_id: st
 
     for pattern in (_PAGE_ID_EXPLICIT, _BACKTICK_ID):
         for match in pattern.finditer(text):
-            found = _page_id_from_items(match.group(1), items)
-            if found:
-                return found
-
-    for item in items:
-        page_id = str(item.get("pageId") or "")
-        if page_id and page_id in text:
-            explicit_hits = [
-                pid
-                for pid in (str(i.get("pageId") or "") for i in items)
-                if pid and pid in text
-            ]
-            if len(set(explicit_hits)) == 1:
-                return explicit_hits[0]
-
-    exact_name_hits: list[str] = []
-    for item in items:
-        module_name = str(item.get("moduleName") or "")
-        page_id = str(item.get("pageId") or "")
-        if module_name and module_name == text:
-            exact_name_hits.append(page_id)
-    if len(set(exact_name_hits)) == 1:
+            if index.has_page(match.group(1)):
+                return match.group(1)
+
+    explicit_hits = index.page_ids_in(text)
+    if len(explicit_hits) == 1:
+        return explicit_hits[0]
+
+    exact_name_hits = index.exact_name(text)
+    if len(exact_name_hits) == 1:
         return exact_name_hits[0]
 
-    best_len = 0
-    best_ids: list[str] = []
-    for item in items:
-        module_name = str(item.get("moduleName") or "")
-        page_id = str(item.get("pageId") or "")
-        if module_name and len(module_name) >= 2 and module_name in text:
-            name_len = len(module_name)
-            if name_len > best_len:
-                best_len = name_len
-                best_ids = [page_id]
-            elif name_len == best_len:
-                best_ids.append(page_id)
-    unique_best = list(dict.fromkeys(best_ids))
-    if len(unique_best) == 1:
-        return unique_best[0]
+    best_ids = index.longest_names_in(text)
+    if len(best_ids) == 1:
+        return best_ids[0]
 
     if len(items) == 1:
         return str(items[0]["pageId"])
@@ -271,10 +243,7 @@ def _confirm_state(result: dict, module_name: str) -> dict:
 
 
 def _module_name_for(page_id: str, items: list[dict]) -> str:
-    return next(
-        (str(i.get("moduleName") or page_id) for i in items if i.get("pageId") == page_id),
-        page_id,
-    )
+    return prototype_index(items).module_name(page_id)
 
 
 def _format_prototype_pick_list(items: list[dict]) -> str:
@@ -344,8 +313,7 @@ async def prototype_preview_stream(
     summary: str = "",
     user_profile: str = "",
 ) -> AsyncIterator[tuple[str, dict | None]]:
-    sync_registry()
-    items = list_prototypes()
+    items = await list_prototypes_async()
     if not items:
         text = (
             "目前还没有归档的原型模块。\n\n"
@@ -673,8 +641,7 @@ async def prototype_edit_stream(
 ) -> AsyncIterator[tuple[str, dict | None]]:
     last = messages[-1]["content"].strip()
 
-    sync_registry()
-    items = list_prototypes()
+    items = await list_prototypes_async()
     if not items:
         text = (
             "目前还没有可修改的归档原型。\n\n"
@@ -0,0 +1,129 @@
+"""原型目标解析索引：pageId 哈希表、规范化模块名映射、Aho-Corasick 名称匹配（注册表变化时才重建）。"""
+from __future__ import annotations
+
+import re
+import threading
+from collections import deque
+
+_SPACE_RE = re.compile(r"\s+")
+# 子串匹配的模块名最短长度（单字名容易误命中）
+MIN_NAME_MATCH_LEN = 2
+
+
+def normalize_name(text: str) -> str:
+    """去空白并 casefold，用于模块名精确 / 子串匹配。"""
+    return _SPACE_RE.sub("", text).casefold()
+
+
+class AhoCorasick:
+    """多模式串匹配自动机：一次扫描文本找出其中出现的全部模式串。"""
+
+    def __init__(self, patterns: list[str]) -> None:
+        self.patterns = patterns
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[list[int]] = [[]]
+        for pid, pattern in enumerate(patterns):
+            node = 0
+            for ch in pattern:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            self._out[node].append(pid)
+        self._build_fail_links()
+
+    def _build_fail_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fallback = self._fail[node]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, text: str) -> set[int]:
+        """返回 text 中出现过的模式串下标。"""
+        found: set[int] = set()
+        node = 0
+        for ch in text:
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            if self._out[node]:
+                found.update(self._out[node])
+        return found
+
+
+class PrototypeIndex:
+    """由原型列表构建的只读查找结构。"""
+
+    def __init__(self, items: list[dict]) -> None:
+        self.by_page_id: dict[str, dict] = {}
+        self.by_name: dict[str, list[str]] = {}
+        for item in items:
+            page_id = str(item.get("pageId") or "")
+            if not page_id:
+                continue
+            self.by_page_id.setdefault(page_id, item)
+            name = normalize_name(str(item.get("moduleName") or ""))
+            if name:
+                ids = self.by_name.setdefault(name, [])
+                if page_id not in ids:
+                    ids.append(page_id)
+        self._page_ids = list(self.by_page_id)
+        self._id_matcher = AhoCorasick(self._page_ids)
+        self._names = [name for name in self.by_name if len(name) >= MIN_NAME_MATCH_LEN]
+        self._name_matcher = AhoCorasick(self._names)
+
+    def has_page(self, page_id: str) -> bool:
+        return page_id in self.by_page_id
+
+    def module_name(self, page_id: str) -> str:
+        item = self.by_page_id.get(page_id)
+        return str(item.get("moduleName") or page_id) if item else page_id
+
+    def page_ids_in(self, text: str) -> list[str]:
+        """text 中出现的全部 pageId（按原型列表顺序）。"""
+        hits = self._id_matcher.find(text)
+        return [self._page_ids[i] for i in sorted(hits)]
+
+    def exact_name(self, text: str) -> list[str]:
+        return list(self.by_name.get(normalize_name(text), []))
+
+    def longest_names_in(self, text: str) -> list[str]:
+        """text 中包含的最长模块名对应的 pageId（同长多个名称时全部返回）。"""
+        hits = self._name_matcher.find(normalize_name(text))
+        if not hits:
+            return []
+        best = max(len(self._names[i]) for i in hits)
+        page_ids: list[str] = []
+        for i in sorted(hits):
+            if len(self._names[i]) == best:
+                page_ids.extend(pid for pid in self.by_name[self._names[i]] if pid not in page_ids)
+        return page_ids
+
+
+_lock = threading.Lock()
+_cached: tuple[tuple, PrototypeIndex] | None = None
+
+
+def prototype_index(items: list[dict]) -> PrototypeIndex:
+    """返回 items 对应的索引；(pageId, moduleName) 列表与上次相同时复用，注册表变化时才重建。"""
+    global _cached
+    key = tuple([(i.get("pageId"), i.get("moduleName")) for i in items])
+    with _lock:
+        if _cached is not None and _cached[0] == key:
+            return _cached[1]
+    index = PrototypeIndex(items)
+    with _lock:
+        _cached = (key, index)
+    return index
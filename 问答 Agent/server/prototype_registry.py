@@ -1,12 +1,15 @@
 """原型归档注册表：扫描 generated 目录并维护 registry.json。"""
 from __future__ import annotations
 
+import asyncio
 import json
+import threading
 from datetime import datetime, timezone
 from pathlib import Path
 from uuid import uuid4
 
 from config import PROTOTYPE_SKELETON_DIR, PROTOTYPES_DIR, PROTOTYPES_REGISTRY
+from generation import atomic_write_text
 
 GENERATED_DIR = PROTOTYPE_SKELETON_DIR / "generated"
 PREVIEW_PREFIX = "/api/prototype-files/generated"
@@ -20,117 +23,193 @@ def _preview_url(page_id: str) -> str:
     return f"{PREVIEW_PREFIX}/{page_id}/index.html"
 
 
-def _load_registry() -> dict:
-    if not PROTOTYPES_REGISTRY.exists():
+def _read_registry_text() -> str | None:
+    try:
+        return PROTOTYPES_REGISTRY.read_text(encoding="utf-8")
+    except OSError:
+        return None
+
+
+def _parse_registry(text: str | None) -> dict:
+    if text is None:
         return {"items": []}
     try:
-        data = json.loads(PROTOTYPES_REGISTRY.read_text(encoding="utf-8"))
+        data = json.loads(text)
         if isinstance(data, dict) and isinstance(data.get("items"), list):
             return data
-    except (OSError, json.JSONDecodeError):
+    except json.JSONDecodeError:
         pass
     return {"items": []}
 
 
-def _save_registry(data: dict) -> None:
-    PROTOTYPES_DIR.mkdir(parents=True, exist_ok=True)
-    PROTOTYPES_REGISTRY.write_text(
-        json.dumps(data, ensure_ascii=False, indent=2) + "\n",
-        encoding="utf-8",
-    )
-
-
-def _scan_generated() -> list[dict]:
-    if not GENERATED_DIR.is_dir():
-        return []
-    found: list[dict] = []
-    for entry in sorted(GENERATED_DIR.iterdir()):
-        if not entry.is_dir():
-            continue
-        index_file = entry / "index.html"
-        if not index_file.is_file():
-            continue
-        page_id = entry.name
-        spec_file = entry / "module.spec.json"
-        module_name = page_id
-        breadcrumb = ""
-        if spec_file.is_file():
-            try:
-                spec = json.loads(spec_file.read_text(encoding="utf-8"))
-                module_name = str(spec.get("moduleName") or page_id)
-                breadcrumb = str(spec.get("breadcrumb") or "")
-            except (OSError, json.JSONDecodeError):
-                pass
-        mtime = datetime.fromtimestamp(index_file.stat().st_mtime, tz=timezone.utc)
-        found.append(
-            {
-                "pageId": page_id,
-                "moduleName": module_name,
-                "breadcrumb": breadcrumb,
-                "previewUrl": _preview_url(page_id),
-                "updatedAt": mtime.replace(microsecond=0).isoformat(),
-            }
-        )
-    return found
+def _dump_registry(items: list[dict]) -> str:
+    return json.dumps({"items": items}, ensure_ascii=False, indent=2) + "\n"
 
 
-def sync_registry() -> None:
-    """将 generated 目录与 registry 合并（以磁盘为准补全）。"""
-    registry = _load_registry()
-    by_page: dict[str, dict] = {
-        str(item.get("pageId")): item for item in registry.get("items", []) if item.get("pageId")
+def _file_stamp(path: Path) -> tuple[int, int] | None:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _scan_page(entry: Path) -> dict | None:
+    index_file = entry / "index.html"
+    if not index_file.is_file():
+        return None
+    page_id = entry.name
+    spec_file = entry / "module.spec.json"
+    module_name = page_id
+    breadcrumb = ""
+    if spec_file.is_file():
+        try:
+            spec = json.loads(spec_file.read_text(encoding="utf-8"))
+            module_name = str(spec.get("moduleName") or page_id)
+            breadcrumb = str(spec.get("breadcrumb") or "")
+        except (OSError, json.JSONDecodeError):
+            pass
+    mtime = datetime.fromtimestamp(index_file.stat().st_mtime, tz=timezone.utc)
+    return {
+        "pageId": page_id,
+        "moduleName": module_name,
+        "breadcrumb": breadcrumb,
+        "previewUrl": _preview_url(page_id),
+        "updatedAt": mtime.replace(microsecond=0).isoformat(),
     }
-    for scanned in _scan_generated():
-        page_id = scanned["pageId"]
-        existing = by_page.get(page_id, {})
-        by_page[page_id] = {
-            "id": existing.get("id") or str(uuid4()),
-            "pageId": page_id,
-            "moduleName": scanned["moduleName"],
-            "breadcrumb": scanned["breadcrumb"],
-            "previewUrl": scanned["previewUrl"],
-            "createdAt": existing.get("createdAt") or scanned["updatedAt"],
-            "updatedAt": scanned["updatedAt"],
+
+
+def _merge_scanned(by_page: dict[str, dict], scanned: dict) -> None:
+    page_id = scanned["pageId"]
+    existing = by_page.get(page_id, {})
+    by_page[page_id] = {
+        "id": existing.get("id") or str(uuid4()),
+        "pageId": page_id,
+        "moduleName": scanned["moduleName"],
+        "breadcrumb": scanned["breadcrumb"],
+        "previewUrl": scanned["previewUrl"],
+        "createdAt": existing.get("createdAt") or scanned["updatedAt"],
+        "updatedAt": scanned["updatedAt"],
+    }
+
+
+class _RegistryCache:
+    """
+    registry.json 的内存副本与 generated 目录的增量扫描状态。
+
+    - generated 目录 mtime 不变时沿用已知子目录列表，只 stat 各页面的 index.html / module.spec.json
+    - 只重新解析文件有变化的页面；registry.json 被其它进程改写时重新读入并全量合并
+    - 序列化结果与磁盘内容相同则不写文件
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.RLock()
+        self.by_page: dict[str, dict] = {}
+        self._file_text: str | None = None
+        self._file_stamp: tuple[int, int] | None = None
+        self._loaded = False
+        self._dir_stamp: tuple[int, int] | None = None
+        self._pages: list[str] = []
+        # pageId → (index.html, module.spec.json) 的 stamp，用于判断是否需重新解析
+        self._page_stamps: dict[str, tuple] = {}
+
+    def _reload_file_if_changed(self) -> None:
+        stamp = _file_stamp(PROTOTYPES_REGISTRY)
+        if self._loaded and stamp == self._file_stamp:
+            return
+        text = _read_registry_text()
+        self._file_text = text
+        self._file_stamp = stamp
+        self._loaded = True
+        self.by_page = {
+            str(item.get("pageId")): item
+            for item in _parse_registry(text).get("items", [])
+            if item.get("pageId")
         }
-    items = sorted(by_page.values(), key=lambda x: x.get("updatedAt", ""), reverse=True)
-    _save_registry({"items": items})
+        # 注册表被外部改写：下一次扫描全部页面重新合并
+        self._page_stamps.clear()
+
+    def _page_ids(self) -> list[str]:
+        stamp = _file_stamp(GENERATED_DIR)
+        if stamp is None:
+            self._dir_stamp = None
+            self._pages = []
+            return []
+        if stamp != self._dir_stamp:
+            self._pages = sorted(entry.name for entry in GENERATED_DIR.iterdir() if entry.is_dir())
+            self._dir_stamp = stamp
+        return self._pages
+
+    def refresh_page(self, page_id: str) -> bool:
+        """按 stat 判断单个页面是否变化，变化时重新解析并合并；返回是否合并。"""
+        entry = GENERATED_DIR / page_id
+        stamp = (_file_stamp(entry / "index.html"), _file_stamp(entry / "module.spec.json"))
+        if self._page_stamps.get(page_id) == stamp:
+            return False
+        self._page_stamps[page_id] = stamp
+        if stamp[0] is None:
+            return False
+        scanned = _scan_page(entry)
+        if scanned is None:
+            return False
+        _merge_scanned(self.by_page, scanned)
+        return True
+
+    def sync(self) -> None:
+        self._reload_file_if_changed()
+        for page_id in self._page_ids():
+            self.refresh_page(page_id)
+        self.persist()
+
+    def items(self) -> list[dict]:
+        return sorted(self.by_page.values(), key=lambda x: x.get("updatedAt", ""), reverse=True)
+
+    def persist(self) -> None:
+        text = _dump_registry(self.items())
+        if text == self._file_text:
+            return
+        PROTOTYPES_DIR.mkdir(parents=True, exist_ok=True)
+        atomic_write_text(PROTOTYPES_REGISTRY, text)
+        self._file_text = text
+        self._file_stamp = _file_stamp(PROTOTYPES_REGISTRY)
+
+
+_cache = _RegistryCache()
+
+
+def sync_registry() -> None:
+    """将 generated 目录与 registry 合并（以磁盘为准补全）；无变化时只做 stat，不重写文件。"""
+    with _cache.lock:
+        _cache.sync()
 
 
 def list_prototypes() -> list[dict]:
-    sync_registry()
-    registry = _load_registry()
-    items = list(registry.get("items", []))
-    items.sort(key=lambda x: x.get("updatedAt", ""), reverse=True)
-    return items
+    with _cache.lock:
+        _cache.sync()
+        return [dict(item) for item in _cache.items()]
+
+
+async def list_prototypes_async() -> list[dict]:
+    """异步版 list_prototypes：扫描 generated 目录与读写 registry 放到线程中执行。"""
+    return await asyncio.to_thread(list_prototypes)
 
 
 def register_prototype(page_id: str, module_name: str, breadcrumb: str = "") -> dict:
-    sync_registry()
-    registry = _load_registry()
-    items: list[dict] = registry.get("items", [])
-    now = _now_iso()
-    preview = _preview_url(page_id)
-    for item in items:
-        if item.get("pageId") == page_id:
-            item.update(
-                {
-                    "moduleName": module_name,
-                    "breadcrumb": breadcrumb,
-                    "previewUrl": preview,
-                    "updatedAt": now,
-                }
-            )
-            _save_registry({"items": items})
-            return item
-    entry = {
-        "id": str(uuid4()),
-        "pageId": page_id,
-        "moduleName": module_name,
-        "breadcrumb": breadcrumb,
-        "previewUrl": preview,
-        "createdAt": now,
-        "updatedAt": now,
-    }
-    items.insert(0, entry)
-    _save_registry({"items": items})
-    return entry
+    """单个原型写入 / 确认后调用：只刷新该页面的缓存条目，不重扫整个 generated 目录。"""
+    with _cache.lock:
+        _cache._reload_file_if_changed()
+        _cache.refresh_page(page_id)
+        now = _now_iso()
+        existing = _cache.by_page.get(page_id)
+        entry = {
+            "id": existing.get("id") if existing else str(uuid4()),
+            "pageId": page_id,
+            "moduleName": module_name,
+            "breadcrumb": breadcrumb,
+            "previewUrl": _preview_url(page_id),
+            "createdAt": (existing or {}).get("createdAt") or now,
+            "updatedAt": now,
+        }
+        _cache.by_page[page_id] = entry
+        _cache.persist()
+        return dict(entry)
@@ -3,6 +3,7 @@ from __future__ import annotations
 
 import importlib.util
 import json
+import sys
 from functools import lru_cache
 from pathlib import Path
 
@@ -18,6 +19,8 @@ def _generate_module():
     if spec is None or spec.loader is None:
         raise ImportError(f"无法加载 {path}")
     mod = importlib.util.module_from_spec(spec)
+    # 先登记到 sys.modules：脚本中的 dataclass 与进程池任务需要按模块名解析
+    sys.modules[spec.name] = mod
     spec.loader.exec_module(mod)
     return mod
 
@@ -28,12 +31,14 @@ def sync_spec_runtime(
     output_dir: Path | None = None,
     persist_spec: bool = False,
     bootstrap_html: bool = False,
+    runtime_only: bool = False,
 ) -> Path:
     """将 spec 同步到模块目录的运行时产物。
 
-    - 始终写入：module.spec.json、js/module-config.js、mock 数据
+    - 始终同步（内容未变的文件跳过写入）：module.spec.json、js/module-config.js、mock 数据
     - persist_spec=True 时额外写入 data/prototypes/specs/{pageId}.spec.json
-    - bootstrap_html=True 或 index.html 缺失时写入 index.html（草稿预览用）
+    - bootstrap_html=True 或 index.html 缺失时写入 index.html
+    - runtime_only=True 时不写 HTML（写时复制草稿，见 render_module_html）
     """
     page_id = str(spec.get("pageId") or "").strip()
     if not page_id:
@@ -41,14 +46,23 @@ def sync_spec_runtime(
 
     out_dir = output_dir or (PROTOTYPE_SKELETON_DIR / "generated" / page_id)
     generate = _generate_module()
-    generate.sync_runtime(spec, out_dir, bootstrap_html=bootstrap_html)
+    generate.sync_runtime(spec, out_dir, bootstrap_html=bootstrap_html, runtime_only=runtime_only)
 
     if persist_spec:
         spec_path = PROTOTYPES_DIR / "specs" / f"{page_id}.spec.json"
-        spec_path.parent.mkdir(parents=True, exist_ok=True)
-        spec_path.write_text(json.dumps(spec, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        generate.write_if_changed(spec_path, json.dumps(spec, ensure_ascii=False, indent=2) + "\n")
 
     if not (out_dir / "js" / "module-config.js").is_file():
         raise RuntimeError(f"同步失败：{out_dir / 'js' / 'module-config.js'} 不存在")
 
     return out_dir
+
+
+def render_module_html(spec: dict, out_dir: Path, name: str) -> str:
+    """按 spec 渲染 index.html / logic-docs.html（骨架相对路径按 out_dir 计算），不落盘。"""
+    generate = _generate_module()
+    if name == "index.html":
+        return generate.render_index(spec, out_dir)
+    if name == "logic-docs.html":
+        return generate.cached_logic_docs(spec)
+    raise ValueError(f"不支持渲染的文件：{name}")
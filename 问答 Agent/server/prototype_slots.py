@@ -9,8 +9,8 @@ from dataclasses import dataclass, field
 from pathlib import Path
 from uuid import uuid4
 
-from chat_history import format_history_text
-from config import HISTORY_TURNS, PROTOTYPE_SKELETON_DIR, PROTOTYPES_DIR
+from chat_history import HistoryView
+from config import PROTOTYPE_SKELETON_DIR, PROTOTYPES_DIR
 from embedder import chat_once
 from prompts import PROTOTYPE_SLOT_EXTRACT_PROMPT
 from prototype_registry import register_prototype
@@ -82,12 +82,15 @@ def _parse_slot_json(raw: str) -> dict[str, str]:
 async def extract_slots_from_message(
     messages: list[dict[str, str]],
     state: PrototypeSlotState,
+    *,
+    history: HistoryView | None = None,
 ) -> PrototypeSlotState:
     if not messages:
         return state
+    view = history if history is not None else HistoryView.build(messages)
     user_content = (
         f"已有槽位：{json.dumps(state.filled, ensure_ascii=False)}\n\n"
-        f"对话历史：\n{format_history_text(messages[:-1], HISTORY_TURNS)}\n\n"
+        f"对话历史：\n{view.text('slots')}\n\n"
         f"当前用户消息：{messages[-1]['content']}"
     )
     raw = await chat_once(
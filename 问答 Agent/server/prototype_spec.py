@@ -150,10 +150,15 @@ def apply_instruction_toolbar_variants(spec: dict, instruction: str, ops: list[d
             if label and label in instruction:
                 target_labels.append(label)
 
+    # 按钮列表可能与编辑前的 spec 共享（apply_ops 写时复制），替换为新对象而非原地修改
+    buttons = []
     for btn in spec.get("toolbarButtons") or []:
         label = str(btn.get("label") or "")
         if label in target_labels or (not target_labels and label and label in instruction):
-            btn["variant"] = variant
+            btn = {**btn, "variant": variant}
+        buttons.append(btn)
+    if "toolbarButtons" in spec:
+        spec["toolbarButtons"] = buttons
     return spec
 
 
@@ -269,11 +274,17 @@ def validate_spec(spec: dict) -> list[str]:
     return errors
 
 
-def normalize_spec(spec: dict, partial: dict) -> dict:
-    """将 LLM 或规则产出归一化，并以 partial 锁定关键字段。"""
-    from prototype_slots import _build_form_fields, _label_to_field
+def normalize_spec(spec: dict, partial: dict, *, sections: set[str] | None = None) -> dict:
+    """将 LLM 或规则产出归一化，并以 partial 锁定关键字段。
 
-    out = deepcopy(spec)
+    sections 为本次改动过的顶层字段（编辑 ops 场景）：只归一化受其影响的部分，其余字段与 spec 共享不复制。
+    """
+    from prototype_slots import _build_form_fields
+
+    def affected(*keys: str) -> bool:
+        return sections is None or any(k in sections for k in keys)
+
+    out = deepcopy(spec) if sections is None else dict(spec)
 
     out["moduleName"] = str(partial.get("moduleName") or out.get("moduleName") or "")
     out["pageId"] = str(partial.get("pageId") or out.get("pageId") or "")
@@ -284,28 +295,57 @@ def normalize_spec(spec: dict, partial: dict) -> dict:
         partial.get("dataFile") or out.get("dataFile") or f"data/{out['pageId']}-data.json"
     )
 
-    if partial.get("columns"):
+    if partial.get("columns") and partial["columns"] is not out.get("columns"):
         out["columns"] = deepcopy(partial["columns"])
 
-    out["toolbarButtons"] = normalize_toolbar_buttons(
-        out.get("toolbarButtons"),
-        out["moduleName"],
-    )
+    if affected("toolbarButtons", "moduleName"):
+        out["toolbarButtons"] = normalize_toolbar_buttons(
+            out.get("toolbarButtons"),
+            out["moduleName"],
+        )
 
-    row_actions = out.get("rowActions") or ["edit", "delete"]
-    cleaned_actions: list[str] = []
-    for action in row_actions:
-        action_str = str(action)
-        if action_str in ("view", "edit", "delete") and action_str not in cleaned_actions:
-            cleaned_actions.append(action_str)
-    out["rowActions"] = cleaned_actions or ["edit", "delete"]
+    if affected("rowActions"):
+        row_actions = out.get("rowActions") or ["edit", "delete"]
+        cleaned_actions: list[str] = []
+        for action in row_actions:
+            action_str = str(action)
+            if action_str in ("view", "edit", "delete") and action_str not in cleaned_actions:
+                cleaned_actions.append(action_str)
+        out["rowActions"] = cleaned_actions or ["edit", "delete"]
 
-    if _has_status_column(out):
+    if affected("columns", "statusLabels") and _has_status_column(out):
         out["statusLabels"] = out.get("statusLabels") or deepcopy(DEFAULT_STATUS_LABELS)
-    elif out.get("statusLabels"):
-        out["statusLabels"] = out["statusLabels"]
 
-    out["formFields"] = _build_form_fields(out.get("columns") or [])
+    if affected("columns", "formFields"):
+        out["formFields"] = _build_form_fields(out.get("columns") or [])
+
+    if affected("columns", "filters"):
+        out["filters"] = _normalize_filters(out)
+
+    if affected("columns", "mockData"):
+        out["mockData"] = _normalize_mock_data(out)
+
+    if affected("toolbarButtons", "rowActions", "logicDocs", "moduleName"):
+        logic = dict(out.get("logicDocs") or {})
+        if not logic.get("buttons"):
+            toolbar_docs = []
+            for b in out["toolbarButtons"]:
+                detail = "打开表单弹窗" if b["action"] == "create" else "原型演示"
+                toolbar_docs.append([b["label"], "工具栏", "无", detail])
+            row_label_map = {"edit": "编辑", "delete": "删除", "view": "查看"}
+            row_docs = [
+                [row_label_map[a], "行操作", "无", "原型演示"]
+                for a in out["rowActions"]
+                if a in row_label_map
+            ]
+            logic["buttons"] = toolbar_docs + row_docs
+        out["logicDocs"] = logic
+
+    return out
+
+
+def _normalize_filters(out: dict) -> list[dict]:
+    from prototype_slots import _label_to_field
 
     filters: list[dict] = []
     fields = _column_fields(out)
@@ -329,8 +369,10 @@ def normalize_spec(spec: dict, partial: dict) -> dict:
         item["field"] = field
         item.setdefault("id", f"filter{i}")
         filters.append(item)
-    out["filters"] = filters
+    return filters
+
 
+def _normalize_mock_data(out: dict) -> list:
     mock = out.get("mockData") or []
     if not mock:
         mock_row: dict = {"id": "row_001"}
@@ -342,24 +384,10 @@ def normalize_spec(spec: dict, partial: dict) -> dict:
                 mock_row[field] = "2026-06-27T10:00:00.000Z"
             else:
                 mock_row[field] = f"示例{col.get('label', field)}"
-        out["mockData"] = [mock_row]
-    else:
-        for row in mock:
-            if isinstance(row, dict):
-                row.setdefault("id", "row_001")
-
-    logic = out.setdefault("logicDocs", {})
-    if not logic.get("buttons"):
-        toolbar_docs = []
-        for b in out["toolbarButtons"]:
-            detail = "打开表单弹窗" if b["action"] == "create" else "原型演示"
-            toolbar_docs.append([b["label"], "工具栏", "无", detail])
-        row_label_map = {"edit": "编辑", "delete": "删除", "view": "查看"}
-        row_docs = [
-            [row_label_map[a], "行操作", "无", "原型演示"]
-            for a in out["rowActions"]
-            if a in row_label_map
-        ]
-        logic["buttons"] = toolbar_docs + row_docs
-
-    return out
+        return [mock_row]
+    rows = []
+    for row in mock:
+        if isinstance(row, dict) and "id" not in row:
+            row = {**row, "id": "row_001"}
+        rows.append(row)
+    return rows
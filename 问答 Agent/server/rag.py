@@ -4,12 +4,15 @@ from __future__ import annotations
 import asyncio
 from typing import AsyncIterator
 
-from chat_history import format_history_text
-from config import HISTORY_TURNS, MIN_SCORE, TOP_K
+import numpy as np
+
+from chat_history import HistoryView
+import config
 from context import SessionContext, memory_block, refresh_session_context
-from embedder import stream_chat
+from context_packer import pack_context
+from embedder import embed_texts_async, stream_chat
 from intent import IntentResult, classify_intent, detect_edit_flow_exit
-from prompts import GENERAL_SYSTEM_PROMPT, RAG_SYSTEM_PROMPT, REWRITE_PROMPT, build_context_block, is_refusal
+from prompts import GENERAL_SYSTEM_PROMPT, RAG_SYSTEM_PROMPT, REWRITE_PROMPT, is_refusal
 from prototype_flow import (
     PHASE_CONFIRM,
     PHASE_INSTRUCTION,
@@ -26,9 +29,10 @@ from prototype_flow import (
     prototype_new_stream,
     prototype_preview_stream,
 )
-from prototype_registry import list_prototypes, sync_registry
+from prototype_registry import list_prototypes_async
 from prototype_slots import PrototypeSlotState
-from store import IndexedChunk, get_store_for_search
+from retrieval import RetrievalParams
+from store import IndexedChunk, get_store_for_search_async, run_search
 
 
 # 等待并行 summary 任务的最长时间（秒）。超时则用旧 summary，保证响应不被阻塞。
@@ -42,6 +46,7 @@ async def _finalize(
     user_profile: str,
     extra: dict,
     ctx_task: asyncio.Task[SessionContext] | None = None,
+    history: HistoryView | None = None,
 ) -> dict:
     if ctx_task is not None:
         try:
@@ -49,7 +54,9 @@ async def _finalize(
         except (asyncio.TimeoutError, Exception):
             ctx = SessionContext(summary, user_profile)
     else:
-        ctx = await refresh_session_context(messages, assistant_reply, summary, user_profile)
+        ctx = await refresh_session_context(
+            messages, assistant_reply, summary, user_profile, history=history
+        )
     return {
         **extra,
         "summary": ctx.summary,
@@ -71,13 +78,13 @@ def _build_general_messages(
     messages: list[dict[str, str]],
     summary: str,
     user_profile: str,
+    history: HistoryView,
 ) -> list[dict[str, str]]:
     memory = memory_block(summary, user_profile)
     chat_msgs: list[dict[str, str]] = [{"role": "system", "content": GENERAL_SYSTEM_PROMPT}]
     if memory != "（暂无）":
         chat_msgs.append({"role": "system", "content": f"会话记忆：\n{memory}"})
-    for m in messages[:-1][-(HISTORY_TURNS * 2) :]:
-        chat_msgs.append({"role": m["role"], "content": m["content"][:800]})
+    chat_msgs.extend(history.chat_messages("general"))
     chat_msgs.append({"role": "user", "content": messages[-1]["content"]})
     return chat_msgs
 
@@ -86,18 +93,20 @@ async def rewrite_query(
     messages: list[dict[str, str]],
     summary: str = "",
     user_profile: str = "",
+    history: HistoryView | None = None,
 ) -> str:
     if len(messages) < 2:
         return messages[-1]["content"]
 
     memory = memory_block(summary, user_profile)
+    view = history if history is not None else HistoryView.build(messages)
     rewrite_msgs = [
         {"role": "system", "content": REWRITE_PROMPT},
         {
             "role": "user",
             "content": (
                 f"会话记忆：\n{memory}\n\n"
-                f"对话历史：\n{format_history_text(messages[:-1], HISTORY_TURNS)}\n\n"
+                f"对话历史：\n{view.text('rewrite')}\n\n"
                 f"最后一问：{messages[-1]['content']}"
             ),
         },
@@ -136,14 +145,18 @@ def _to_citations(
     return out
 
 
-def retrieve(
+async def retrieve(
     query: str,
     kb_id: str,
     kb_name: str | None = None,
+    params: RetrievalParams | None = None,
 ) -> tuple[list[tuple[IndexedChunk, float]], list[dict[str, str]]]:
-    store = get_store_for_search(kb_id)
-    hits = store.search_detailed(query, TOP_K)
-    filtered = [(c, s) for c, s, _ in hits if s >= MIN_SCORE]
+    store = await get_store_for_search_async(kb_id)
+    p = params if params is not None else store.retrieval_params()
+    # query 向量走异步 embedding，避免同步 HTTP 调用阻塞事件循环
+    qv = np.array((await embed_texts_async([query]))[0], dtype=np.float32)
+    hits = await run_search(store.search_detailed, query, params=p, query_vector=qv)
+    filtered = [(c, s) for c, s, _ in hits if s >= p.min_score]
     return filtered, _to_citations(filtered or [(c, s) for c, s, _ in hits[:2]], kb_id=kb_id, kb_name=kb_name)
 
 
@@ -178,8 +191,7 @@ async def rag_stream(
                 return
         elif edit_state.get("editId"):
             if is_new_edit_intent(last_text):
-                sync_registry()
-                items = list_prototypes()
+                items = await list_prototypes_async()
                 slots = (
                     extract_edit_intent_slots(last_text, items)
                     if items
@@ -225,12 +237,15 @@ async def rag_stream(
                 yield token, meta
             return
 
+    # 本轮请求共用一份历史视图（意图 / 改写 / RAG / 上下文更新各取所需预算）
+    history = HistoryView.build(messages)
     routed: IntentResult = await classify_intent(
         messages,
         summary,
         user_profile,
         prototype_state=prototype_state,
         prototype_edit_state=edit_state,
+        history=history,
     )
 
     if routed.intent == "prototype_preview":
@@ -257,17 +272,21 @@ async def rag_stream(
         return
 
     if routed.intent == "general":
-        chat_msgs = _build_general_messages(messages, summary, user_profile)
+        chat_msgs = _build_general_messages(messages, summary, user_profile, history)
         # 并行启动 summary 更新（基于截至本轮 user 提问的对话，不含本轮 assistant reply），
         # 与流式生成同时进行，避免串行等待
         ctx_task = asyncio.create_task(
-            refresh_session_context(messages, "", summary, user_profile)
+            refresh_session_context(messages, "", summary, user_profile, history=history)
         )
         parts: list[str] = []
         try:
             async for token in stream_chat(chat_msgs):
                 parts.append(token)
                 yield token, None
+        except BaseException:
+            # 流被取消（客户端断开）时不再需要本轮 summary
+            ctx_task.cancel()
+            raise
         finally:
             if not ctx_task.done():
                 ctx_task.add_done_callback(_swallow_task_exception)
@@ -293,11 +312,12 @@ async def rag_stream(
             summary,
             user_profile,
             {"citations": [], "refused": True, "mode": "rag"},
+            history=history,
         )
         yield text, meta
         return
 
-    store = get_store_for_search(kb_id)
+    store = await get_store_for_search_async(kb_id)
     if store.size == 0:
         label = kb_name or kb_id
         text = (
@@ -310,13 +330,14 @@ async def rag_stream(
             summary,
             user_profile,
             {"citations": [], "refused": True, "mode": "rag", "kbId": kb_id, "kbName": kb_name},
+            history=history,
         )
         yield text, meta
         return
 
     # 优先用 intent 阶段已改写好的 query，避免重复调用 LLM
-    query = routed.rewritten_query or await rewrite_query(messages, summary, user_profile)
-    hits, citations = retrieve(query, kb_id, kb_name)
+    query = routed.rewritten_query or await rewrite_query(messages, summary, user_profile, history)
+    hits, citations = await retrieve(query, kb_id, kb_name)
     memory = memory_block(summary, user_profile)
 
     if not hits:
@@ -328,13 +349,13 @@ async def rag_stream(
             summary,
             user_profile,
             {"citations": [], "refused": True, "mode": "rag", "kbId": kb_id, "kbName": kb_name},
+            history=history,
         )
         yield text, meta
         return
 
-    ctx = build_context_block(
-        [(h.doc_title, h.section, h.text, h.parent_text) for h, _ in hits]
-    )
+    packed = pack_context(hits, config.CONTEXT_TOKEN_BUDGET)
+    ctx = packed.text
     rag_prompt = RAG_SYSTEM_PROMPT
     if kb_name:
         rag_prompt = f"{RAG_SYSTEM_PROMPT}\n\n当前参考知识库：{kb_name}（id: {kb_id}）"
@@ -346,7 +367,7 @@ async def rag_stream(
             "content": (
                 f"会话记忆：\n{memory}\n\n"
                 f"参考文档：\n{ctx}\n\n"
-                f"对话历史：\n{format_history_text(messages[:-1], HISTORY_TURNS)}\n\n"
+                f"对话历史：\n{history.text('rag')}\n\n"
                 f"当前问题：{messages[-1]['content']}"
             ),
         },
@@ -355,13 +376,17 @@ async def rag_stream(
     # 并行启动 summary 更新（基于截至本轮 user 提问的对话，不含本轮 assistant reply），
     # 与 RAG 流式生成同时进行，避免串行等待
     ctx_task = asyncio.create_task(
-        refresh_session_context(messages, "", summary, user_profile)
+        refresh_session_context(messages, "", summary, user_profile, history=history)
     )
     parts = []
     try:
         async for token in stream_chat(chat_msgs):
             parts.append(token)
             yield token, None
+    except BaseException:
+        # 流被取消（客户端断开）时不再需要本轮 summary
+        ctx_task.cancel()
+        raise
     finally:
         if not ctx_task.done():
             ctx_task.add_done_callback(_swallow_task_exception)
@@ -378,6 +403,7 @@ async def rag_stream(
             "mode": "rag",
             "kbId": kb_id,
             "kbName": kb_name,
+            "contextTokens": packed.tokens,
         },
         ctx_task=ctx_task,
     )
@@ -1,13 +1,20 @@
 """知识库检索召回测试（单条 + 批量）。"""
 from __future__ import annotations
 
+import itertools
 import json
+import time
+from dataclasses import replace
 from pathlib import Path
 from typing import Any
 
-from config import MIN_SCORE, TOP_K
+import numpy as np
+
+from embedder import embed_texts
 from kb_registry import get_kb_paths
-from store import get_store_for_search
+from retrieval import hybrid_search
+from store import IndexedChunk, get_store_for_search
+from vector_index import QUANTIZATION_MODES
 
 RECALL_TESTS_FILENAME = "recall_tests.json"
 
@@ -53,6 +60,47 @@ def _case_passed(
     return True
 
 
+def _matched_rank(
+    detailed: list[tuple[IndexedChunk, float, dict[str, float]]],
+    expected_title: str | None,
+    expected_section: str | None,
+    threshold: float,
+) -> int | None:
+    """返回首个命中期望文档/章节的名次（1 起），未命中为 None。"""
+    for rank, (chunk, score, _) in enumerate(detailed, start=1):
+        if _case_passed(
+            chunk.doc_title,
+            chunk.section,
+            score,
+            expected_title=expected_title,
+            expected_section=expected_section,
+            threshold=threshold,
+        ):
+            return rank
+    return None
+
+
+def _hit_item(
+    rank: int,
+    chunk: IndexedChunk,
+    score: float,
+    debug: dict[str, float],
+    threshold: float,
+) -> dict[str, object]:
+    return {
+        "rank": rank,
+        "docTitle": chunk.doc_title,
+        "section": chunk.section,
+        "text": chunk.text,
+        "excerpt": chunk.text.replace("\n", " ")[:200],
+        "score": round(score, 4),
+        "passed": score >= threshold,
+        "vectorScore": debug.get("vector"),
+        "bm25Score": debug.get("bm25"),
+        "fusionScore": debug.get("fusion"),
+    }
+
+
 def run_retrieve_test(
     kb_id: str,
     query: str,
@@ -64,35 +112,19 @@ def run_retrieve_test(
     if not text:
         raise ValueError("请输入测试问题")
 
-    k = top_k if top_k is not None else TOP_K
-    threshold = min_score if min_score is not None else MIN_SCORE
-
     store = get_store_for_search(kb_id)
     if store.size == 0:
         raise ValueError("索引未构建，请先构建索引")
+    params = store.retrieval_params(top_k=top_k, min_score=min_score)
+    k = params.top_k
+    threshold = params.min_score
 
-    detailed = store.search_detailed(text, k)
-    items: list[dict[str, object]] = []
-    passed_count = 0
-
-    for rank, (chunk, score, debug) in enumerate(detailed, start=1):
-        passed = score >= threshold
-        if passed:
-            passed_count += 1
-        items.append(
-            {
-                "rank": rank,
-                "docTitle": chunk.doc_title,
-                "section": chunk.section,
-                "text": chunk.text,
-                "excerpt": chunk.text.replace("\n", " ")[:200],
-                "score": round(score, 4),
-                "passed": passed,
-                "vectorScore": debug.get("vector"),
-                "bm25Score": debug.get("bm25"),
-                "fusionScore": debug.get("fusion"),
-            }
-        )
+    detailed = store.search_detailed(text, params=params)
+    items = [
+        _hit_item(rank, chunk, score, debug, threshold)
+        for rank, (chunk, score, debug) in enumerate(detailed, start=1)
+    ]
+    passed_count = sum(1 for item in items if item["passed"])
 
     return {
         "kbId": kb_id,
@@ -105,55 +137,90 @@ def run_retrieve_test(
     }
 
 
+def run_batch_search(
+    kb_id: str,
+    queries: list[str],
+    *,
+    top_k: int | None = None,
+    min_score: float | None = None,
+) -> dict[str, object]:
+    """多条 query 一次检索（批量 embed + 矩阵打分），结果格式同单条检索测试。"""
+    texts = [q.strip() for q in queries]
+    if not texts or not all(texts):
+        raise ValueError("请输入测试问题")
+
+    store = get_store_for_search(kb_id)
+    if store.size == 0:
+        raise ValueError("索引未构建，请先构建索引")
+    params = store.retrieval_params(top_k=top_k, min_score=min_score)
+    k = params.top_k
+    threshold = params.min_score
+
+    results: list[dict[str, object]] = []
+    for text, detailed in zip(texts, store.search_batch(texts, params=params)):
+        items = [
+            _hit_item(rank, chunk, score, debug, threshold)
+            for rank, (chunk, score, debug) in enumerate(detailed, start=1)
+        ]
+        results.append(
+            {
+                "query": text,
+                "total": sum(1 for item in items if item["passed"]),
+                "candidates": len(items),
+                "items": items,
+            }
+        )
+
+    return {
+        "kbId": kb_id,
+        "topK": k,
+        "minScore": threshold,
+        "results": results,
+    }
+
+
 def run_batch_recall_eval(
     kb_id: str,
     *,
     top_k: int | None = None,
     min_score: float | None = None,
+    quantization: str | None = None,
 ) -> dict[str, object]:
+    """批量召回评测；quantization 指定时用该量化模式临时重建向量矩阵，便于对比召回影响。"""
     cases = load_recall_cases(kb_id)
     if not cases:
         raise ValueError(f"未找到测试用例，请在 {RECALL_TESTS_FILENAME} 中添加 cases")
 
-    k = top_k if top_k is not None else TOP_K
-    threshold = min_score if min_score is not None else MIN_SCORE
-
     store = get_store_for_search(kb_id)
     if store.size == 0:
         raise ValueError("索引未构建，请先构建索引")
+    params = store.retrieval_params(top_k=top_k, min_score=min_score)
+    k = params.top_k
+    threshold = params.min_score
+    if quantization and store.matrix is not None and quantization != store.matrix.mode:
+        store = store.with_quantization(quantization)
 
     results: list[dict[str, object]] = []
     passed = 0
+    questions = [str(case.get("question", "")).strip() for case in cases]
+    batch = store.search_batch(questions, params=params)
 
-    for index, case in enumerate(cases, start=1):
-        question = str(case.get("question", "")).strip()
+    for index, (case, question, detailed) in enumerate(zip(cases, questions, batch), start=1):
         expected_title = str(case.get("docTitle", "")).strip() or None
         expected_section = str(case.get("section", "")).strip() or None
 
-        detailed = store.search_detailed(question, k)
-        hit = False
-        matched_rank: int | None = None
+        matched_rank = _matched_rank(detailed, expected_title, expected_section, threshold)
+        hit = matched_rank is not None
         matched: dict[str, object] | None = None
-
-        for rank, (chunk, score, debug) in enumerate(detailed, start=1):
-            if _case_passed(
-                chunk.doc_title,
-                chunk.section,
-                score,
-                expected_title=expected_title,
-                expected_section=expected_section,
-                threshold=threshold,
-            ):
-                hit = True
-                matched_rank = rank
-                matched = {
-                    "docTitle": chunk.doc_title,
-                    "section": chunk.section,
-                    "score": round(score, 4),
-                    "vectorScore": debug.get("vector"),
-                    "bm25Score": debug.get("bm25"),
-                }
-                break
+        if matched_rank is not None:
+            chunk, score, debug = detailed[matched_rank - 1]
+            matched = {
+                "docTitle": chunk.doc_title,
+                "section": chunk.section,
+                "score": round(score, 4),
+                "vectorScore": debug.get("vector"),
+                "bm25Score": debug.get("bm25"),
+            }
 
         if hit:
             passed += 1
@@ -188,5 +255,124 @@ def run_batch_recall_eval(
         "passed": passed,
         "failed": total - passed,
         "passRate": round(passed / total, 4) if total else 0.0,
+        "retrieval": params.to_dict(),
+        "quantization": store.matrix.mode if store.matrix else None,
+        "vectorBytes": store.matrix.resident_bytes() if store.matrix else 0,
         "cases": results,
     }
+
+
+SWEEP_MAX_POINTS = 200
+
+
+def run_recall_sweep(
+    kb_id: str,
+    *,
+    top_k: int | None = None,
+    min_score: float | None = None,
+    hybrid: list[bool] | None = None,
+    rerank_candidates: list[int] | None = None,
+    rrf_k: list[int] | None = None,
+    quantization: list[str] | None = None,
+    target_pass_rate: float | None = None,
+) -> dict[str, object]:
+    """召回参数网格扫描：hybrid × 重排候选数 × RRF k × 量化模式。
+
+    query 向量只 embed 一次，在各网格点间复用；每个点报告通过率、MRR 与单条检索耗时。
+    target_pass_rate 指定时给出达标配置中平均耗时最低的一项（recommended）。
+    未传的维度取知识库当前检索参数（量化取当前模式）；重排候选数 0 表示关闭重排。
+    """
+    cases = load_recall_cases(kb_id)
+    if not cases:
+        raise ValueError(f"未找到测试用例，请在 {RECALL_TESTS_FILENAME} 中添加 cases")
+
+    base = get_store_for_search(kb_id)
+    if base.size == 0 or base.matrix is None:
+        raise ValueError("索引未构建，请先构建索引")
+    params = base.retrieval_params(top_k=top_k, min_score=min_score)
+    k = params.top_k
+    threshold = params.min_score
+
+    hybrid_grid = _dedupe(hybrid) or [params.hybrid]
+    rerank_grid = _dedupe(rerank_candidates) or [params.rerank_candidates if params.rerank_enabled else 0]
+    rrf_grid = _dedupe(rrf_k) or [params.rrf_k]
+    quant_grid = _dedupe(quantization) or [base.matrix.mode]
+    for mode in quant_grid:
+        if mode not in QUANTIZATION_MODES:
+            raise ValueError(f"不支持的向量量化模式: {mode}")
+    total_points = len(hybrid_grid) * len(rerank_grid) * len(rrf_grid) * len(quant_grid)
+    if total_points > SWEEP_MAX_POINTS:
+        raise ValueError(f"网格点过多（{total_points}），上限 {SWEEP_MAX_POINTS}")
+
+    questions = [str(case.get("question", "")).strip() for case in cases]
+    expected = [
+        (
+            str(case.get("docTitle", "")).strip() or None,
+            str(case.get("section", "")).strip() or None,
+        )
+        for case in cases
+    ]
+    embed_started = time.perf_counter()
+    query_vectors = np.array(embed_texts(questions), dtype=np.float32)
+    embed_ms = (time.perf_counter() - embed_started) * 1000
+
+    points: list[dict[str, object]] = []
+    for mode in quant_grid:
+        store = base if mode == base.matrix.mode else base.with_quantization(mode)
+        for use_hybrid, rerank, rrf in itertools.product(hybrid_grid, rerank_grid, rrf_grid):
+            point_params = replace(
+                params,
+                hybrid=use_hybrid,
+                rerank_enabled=rerank > 0,
+                rerank_candidates=rerank or params.rerank_candidates,
+                rrf_k=rrf,
+            )
+            passed = 0
+            reciprocal_sum = 0.0
+            latencies: list[float] = []
+            for question, qv, (expected_title, expected_section) in zip(questions, query_vectors, expected):
+                started = time.perf_counter()
+                detailed = hybrid_search(store, question, point_params, query_vector=qv)
+                latencies.append((time.perf_counter() - started) * 1000)
+                rank = _matched_rank(detailed, expected_title, expected_section, threshold)
+                if rank is not None:
+                    passed += 1
+                    reciprocal_sum += 1.0 / rank
+            total = len(questions)
+            points.append(
+                {
+                    "hybrid": use_hybrid,
+                    "rerankCandidates": rerank,
+                    "rrfK": rrf,
+                    "quantization": mode,
+                    "passed": passed,
+                    "passRate": round(passed / total, 4) if total else 0.0,
+                    "mrr": round(reciprocal_sum / total, 4) if total else 0.0,
+                    "avgLatencyMs": round(float(np.mean(latencies)), 3) if latencies else 0.0,
+                    "p95LatencyMs": round(float(np.percentile(latencies, 95)), 3) if latencies else 0.0,
+                    "vectorBytes": store.matrix.resident_bytes() if store.matrix else 0,
+                }
+            )
+
+    recommended: dict[str, object] | None = None
+    if target_pass_rate is not None:
+        qualified = [p for p in points if float(p["passRate"]) >= target_pass_rate]
+        if qualified:
+            recommended = min(qualified, key=lambda p: (p["avgLatencyMs"], p["vectorBytes"]))
+
+    return {
+        "kbId": kb_id,
+        "topK": k,
+        "minScore": threshold,
+        "total": len(questions),
+        "embedMs": round(embed_ms, 3),
+        "targetPassRate": target_pass_rate,
+        "recommended": recommended,
+        "points": points,
+    }
+
+
+def _dedupe(values: list | None) -> list:
+    if not values:
+        return []
+    return list(dict.fromkeys(values))
@@ -0,0 +1,160 @@
+"""检索候选重排插件：配置 rerankModel 后调用本地 rerank 服务（cross-encoder），超时或失败时由调用方回退线性融合。"""
+from __future__ import annotations
+
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Protocol
+
+import httpx
+
+import config
+from config import RERANK_CACHE_SIZE, RERANK_COOLDOWN_SECONDS, RERANK_TIMEOUT_MS, RERANK_WORKERS
+
+# 单次重排请求在后台线程执行：超出预算时检索先返回线性融合结果，请求完成后仍写入缓存
+# 单个重排 HTTP 请求的超时；配置变更后旧客户端至少保留这么久再关闭，让已发出的请求正常结束
+_REQUEST_TIMEOUT = httpx.Timeout(30.0, connect=2.0)
+_CLOSE_GRACE_SECONDS = 32.0
+_rerank_pool = ThreadPoolExecutor(max_workers=max(1, RERANK_WORKERS), thread_name_prefix="rerank")
+
+
+class Reranker(Protocol):
+    name: str
+
+    def score(self, query: str, docs: list[tuple[str, str]]) -> list[float] | None:
+        """docs 为 (chunk_id, 文本)；返回与 docs 对齐的相关度，None 表示本次不可用。"""
+        ...
+
+
+class _ScoreCache:
+    """(模型, query, chunk) → 相关度 的 LRU 缓存；chunk 以 chunk_id + 文本校验和区分，重建索引后自然失效。"""
+
+    def __init__(self, capacity: int) -> None:
+        self._capacity = max(0, capacity)
+        self._data: OrderedDict[tuple[str, str, str], float] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: list[tuple[str, str, str]]) -> list[float | None]:
+        with self._lock:
+            out: list[float | None] = []
+            for key in keys:
+                value = self._data.get(key)
+                if value is not None:
+                    self._data.move_to_end(key)
+                out.append(value)
+            return out
+
+    def put_many(self, items: list[tuple[tuple[str, str, str], float]]) -> None:
+        if self._capacity <= 0:
+            return
+        with self._lock:
+            for key, value in items:
+                self._data[key] = value
+                self._data.move_to_end(key)
+            while len(self._data) > self._capacity:
+                self._data.popitem(last=False)
+
+
+_cache = _ScoreCache(RERANK_CACHE_SIZE)
+
+
+def _doc_key(chunk_id: str, text: str) -> str:
+    return f"{chunk_id}:{zlib.crc32(text.encode('utf-8')):08x}"
+
+
+class HttpReranker:
+    """
+    调用 Jina / Cohere 兼容的 POST {base}/rerank（vLLM、llama.cpp server、TEI、Xinference 等本地服务）。
+
+    - 同一 query 的全部未缓存候选合并为一次请求
+    - 等待超过 RERANK_TIMEOUT_MS 返回 None（调用方回退线性融合）
+    - 请求出错后 RERANK_COOLDOWN_SECONDS 秒内不再调用，避免每次检索都等待失败
+    """
+
+    def __init__(self, model: str, base_url: str, api_key: str) -> None:
+        self.name = model
+        self._url = f"{base_url.rstrip('/')}/rerank"
+        self._headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self._client = httpx.Client(timeout=_REQUEST_TIMEOUT)
+        self._cooldown_until = 0.0
+
+    def close(self) -> None:
+        self._client.close()
+
+    def _request(self, query: str, texts: list[str]) -> list[float]:
+        resp = self._client.post(
+            self._url,
+            json={"model": self.name, "query": query, "documents": texts, "top_n": len(texts)},
+            headers=self._headers,
+        )
+        resp.raise_for_status()
+        data = resp.json()
+        # Jina / Cohere / vLLM：{"results": [...]}；TEI：直接返回列表
+        results = data if isinstance(data, list) else data.get("results") or data.get("data") or []
+        scores = [0.0] * len(texts)
+        for item in results:
+            index = int(item["index"])
+            if 0 <= index < len(texts):
+                scores[index] = float(item.get("relevance_score", item.get("score", 0.0)))
+        return scores
+
+    def _fetch(self, query: str, keys: list[tuple[str, str, str]], texts: list[str]) -> list[float]:
+        try:
+            scores = self._request(query, texts)
+        except Exception:
+            self._cooldown_until = time.monotonic() + RERANK_COOLDOWN_SECONDS
+            raise
+        _cache.put_many(list(zip(keys, scores)))
+        return scores
+
+    def score(self, query: str, docs: list[tuple[str, str]]) -> list[float] | None:
+        keys = [(self.name, query, _doc_key(chunk_id, text)) for chunk_id, text in docs]
+        scores = _cache.get_many(keys)
+        missing = [i for i, value in enumerate(scores) if value is None]
+        if not missing:
+            return [value for value in scores if value is not None]
+        if time.monotonic() < self._cooldown_until:
+            return None
+
+        future = _rerank_pool.submit(
+            self._fetch,
+            query,
+            [keys[i] for i in missing],
+            [docs[i][1] for i in missing],
+        )
+        try:
+            fresh = future.result(timeout=max(0, RERANK_TIMEOUT_MS) / 1000)
+        except FutureTimeoutError:
+            return None
+        except Exception as exc:
+            print(f"重排服务调用失败，{RERANK_COOLDOWN_SECONDS:g} 秒内改用线性融合：{exc}")
+            return None
+        filled = dict(zip(missing, fresh))
+        return [value if value is not None else filled[i] for i, value in enumerate(scores)]
+
+
+_reranker: HttpReranker | None = None
+_reranker_key: tuple[str, str, str] | None = None
+_reranker_lock = threading.Lock()
+
+
+def get_reranker() -> Reranker | None:
+    """按当前配置返回重排插件；未配置 rerankModel 时返回 None（使用线性融合）。"""
+    global _reranker, _reranker_key
+    model = config.RERANK_MODEL
+    if not model:
+        return None
+    key = (model, config.RERANK_BASE_URL or config.OPENAI_BASE_URL, config.OPENAI_API_KEY)
+    with _reranker_lock:
+        if _reranker is None or _reranker_key != key:
+            if _reranker is not None:
+                # 重排线程池中可能仍有请求在用旧客户端：宽限期后再关闭，避免其失败并触发冷却
+                timer = threading.Timer(_CLOSE_GRACE_SECONDS, _reranker.close)
+                timer.daemon = True
+                timer.start()
+            _reranker = HttpReranker(*key)
+            _reranker_key = key
+        return _reranker
@@ -1,26 +1,86 @@
 """混合检索（向量 + BM25）与轻量重排。"""
 from __future__ import annotations
 
-import math
+import os
 import re
 from collections import Counter
-from typing import TYPE_CHECKING
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
 
 import numpy as np
 
-from config import (
-    HYBRID_SEARCH,
-    MIN_SCORE,
-    RERANK_CANDIDATES,
-    RERANK_ENABLED,
-    RRF_K,
-    TOP_K,
-)
+import config
 from embedder import embed_texts
+from reranker import get_reranker
+from vector_index import top_from_scores
 
 if TYPE_CHECKING:
     from store import IndexedChunk, VectorStore
 
+
+@dataclass(frozen=True)
+class RetrievalParams:
+    """一次检索使用的参数快照。
+
+    按「全局配置（settings.json）→ 知识库 meta.json 的 retrieval 覆盖 → 调用方覆盖」逐层合并，
+    检索过程中不再读取全局变量，评测扫描 / A/B 可并发使用不同参数。
+    """
+
+    top_k: int
+    min_score: float
+    hybrid: bool
+    rerank_enabled: bool
+    rerank_candidates: int
+    rrf_k: int
+
+    @classmethod
+    def from_config(cls) -> RetrievalParams:
+        return cls(
+            top_k=config.TOP_K,
+            min_score=config.MIN_SCORE,
+            hybrid=config.HYBRID_SEARCH,
+            rerank_enabled=config.RERANK_ENABLED,
+            rerank_candidates=config.RERANK_CANDIDATES,
+            rrf_k=config.RRF_K,
+        )
+
+    def merged(self, overrides: dict[str, Any] | None) -> RetrievalParams:
+        """合并 camelCase 覆盖项（meta.json / API 请求体格式），忽略缺失与 None。"""
+        if not overrides:
+            return self
+        changes: dict[str, Any] = {}
+        for key, field_name in _PARAM_KEYS.items():
+            value = overrides.get(key)
+            if value is not None:
+                changes[field_name] = value
+        return self.with_overrides(**changes)
+
+    def with_overrides(self, **changes: Any) -> RetrievalParams:
+        """snake_case 覆盖，值为 None 的项保持不变。"""
+        changes = {k: v for k, v in changes.items() if v is not None}
+        return replace(self, **changes) if changes else self
+
+    def candidate_pool(self, size: int) -> int:
+        k = self.top_k
+        return min(size, max(k * 4, self.rerank_candidates if self.rerank_enabled else k * 2))
+
+    def to_dict(self) -> dict[str, Any]:
+        return {key: getattr(self, field_name) for key, field_name in _PARAM_KEYS.items()}
+
+
+_PARAM_KEYS = {
+    "topK": "top_k",
+    "minScore": "min_score",
+    "hybridSearch": "hybrid",
+    "rerankEnabled": "rerank_enabled",
+    "rerankCandidates": "rerank_candidates",
+    "rrfK": "rrf_k",
+}
+
+# 配置重排模型时，最终分中模型分（归一化后）所占权重
+_MODEL_RERANK_WEIGHT = 0.7
+
 _CJK_RE = re.compile(r"[\u4e00-\u9fff]")
 _LATIN_RE = re.compile(r"[a-zA-Z0-9]+")
 
@@ -48,42 +108,144 @@ def tokenize_for_bm25(text: str) -> list[str]:
 
 
 class BM25Index:
-    """轻量 BM25 实现，避免额外依赖。"""
+    """轻量 BM25 倒排索引（CSR 存储 postings），可序列化为紧凑二进制文件。
+
+    - vocab：term → term_id
+    - term_ptr[t]:term_ptr[t+1]：term t 的 postings 区间
+    - post_docs / post_tf：命中文档下标与词频
+    - doc_len / avgdl：文档长度归一化
+    """
 
-    def __init__(self, corpus_tokens: list[list[str]], k1: float = 1.5, b: float = 0.75) -> None:
+    def __init__(
+        self,
+        vocab: dict[str, int],
+        term_ptr: np.ndarray,
+        post_docs: np.ndarray,
+        post_tf: np.ndarray,
+        doc_len: np.ndarray,
+        k1: float = 1.5,
+        b: float = 0.75,
+    ) -> None:
         self.k1 = k1
         self.b = b
-        self.corpus = corpus_tokens
-        self.n = len(corpus_tokens)
-        self.avgdl = sum(len(doc) for doc in corpus_tokens) / self.n if self.n else 0.0
-        self.doc_freq: Counter[str] = Counter()
-        for doc in corpus_tokens:
-            for term in set(doc):
-                self.doc_freq[term] += 1
+        self.vocab = vocab
+        self.term_ptr = term_ptr
+        self.post_docs = post_docs
+        self.post_tf = post_tf
+        self.doc_len = doc_len
+        self.n = int(len(doc_len))
+        self.avgdl = float(doc_len.sum() / self.n) if self.n else 0.0
+        df = np.diff(term_ptr).astype(np.float64)
+        self.idf = np.log(1 + (self.n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        self._norm = (self.k1 * (1 - self.b + self.b * doc_len / (self.avgdl or 1.0))).astype(np.float32)
+
+    @classmethod
+    def from_corpus(cls, corpus_tokens: list[list[str]], k1: float = 1.5, b: float = 0.75) -> BM25Index:
+        vocab: dict[str, int] = {}
+        postings: list[list[tuple[int, int]]] = []
+        for doc_index, doc in enumerate(corpus_tokens):
+            for term, freq in Counter(doc).items():
+                term_id = vocab.setdefault(term, len(vocab))
+                if term_id == len(postings):
+                    postings.append([])
+                postings[term_id].append((doc_index, freq))
+        term_ptr = np.zeros(len(postings) + 1, dtype=np.int64)
+        term_ptr[1:] = np.cumsum([len(p) for p in postings])
+        total = int(term_ptr[-1])
+        post_docs = np.empty(total, dtype=np.int32)
+        post_tf = np.empty(total, dtype=np.uint16)
+        for term_id, plist in enumerate(postings):
+            start = int(term_ptr[term_id])
+            for offset, (doc_index, freq) in enumerate(plist):
+                post_docs[start + offset] = doc_index
+                post_tf[start + offset] = min(freq, 65535)
+        doc_len = np.array([len(doc) for doc in corpus_tokens], dtype=np.int32)
+        return cls(vocab, term_ptr, post_docs, post_tf, doc_len, k1, b)
+
+    def save(self, path: Path, *, fingerprint: str = "") -> None:
+        """写入 .npz（临时文件 + rename）；fingerprint 用于加载时校验与向量索引同一批次。"""
+        terms = sorted(self.vocab, key=self.vocab.__getitem__)
+        blob = "\x00".join(terms).encode("utf-8")
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with tmp.open("wb") as fh:
+            np.savez(
+                fh,
+                vocab=np.frombuffer(blob, dtype=np.uint8),
+                vocab_size=np.array([len(terms)], dtype=np.int64),
+                term_ptr=self.term_ptr,
+                post_docs=self.post_docs,
+                post_tf=self.post_tf,
+                doc_len=self.doc_len,
+                params=np.array([self.k1, self.b], dtype=np.float64),
+                fingerprint=np.frombuffer(fingerprint.encode("utf-8"), dtype=np.uint8),
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path, *, fingerprint: str = "") -> BM25Index | None:
+        """读取 save 写出的文件；fingerprint 不一致时返回 None（调用方重建）。"""
+        with np.load(path) as data:
+            if data["fingerprint"].tobytes().decode("utf-8") != fingerprint:
+                return None
+            size = int(data["vocab_size"][0])
+            terms = data["vocab"].tobytes().decode("utf-8").split("\x00") if size else []
+            if len(terms) != size:
+                return None
+            k1, b = (float(v) for v in data["params"])
+            return cls(
+                {term: i for i, term in enumerate(terms)},
+                data["term_ptr"],
+                data["post_docs"],
+                data["post_tf"],
+                data["doc_len"],
+                k1,
+                b,
+            )
+
+    def memory_bytes(self) -> int:
+        arrays = (self.term_ptr, self.post_docs, self.post_tf, self.doc_len, self.idf, self._norm)
+        return sum(a.nbytes for a in arrays) + len(self.vocab) * 120
+
+    def _postings(self, term: str) -> tuple[int, np.ndarray, np.ndarray] | None:
+        term_id = self.vocab.get(term)
+        if term_id is None:
+            return None
+        start, end = int(self.term_ptr[term_id]), int(self.term_ptr[term_id + 1])
+        return term_id, self.post_docs[start:end], self.post_tf[start:end]
 
     def score(self, query_tokens: list[str], doc_index: int) -> float:
         if doc_index < 0 or doc_index >= self.n or not query_tokens:
             return 0.0
-        doc = self.corpus[doc_index]
-        doc_len = len(doc)
-        tf = Counter(doc)
         total = 0.0
-        for term in query_tokens:
-            if term not in tf:
+        for term, count in Counter(query_tokens).items():
+            hit = self._postings(term)
+            if hit is None:
                 continue
-            df = self.doc_freq.get(term, 0)
-            idf = math.log(1 + (self.n - df + 0.5) / (df + 0.5))
-            freq = tf[term]
-            denom = freq + self.k1 * (1 - self.b + self.b * doc_len / (self.avgdl or 1.0))
-            total += idf * (freq * (self.k1 + 1)) / (denom or 1.0)
+            term_id, docs, tfs = hit
+            pos = int(np.searchsorted(docs, doc_index))
+            if pos >= len(docs) or docs[pos] != doc_index:
+                continue
+            freq = float(tfs[pos])
+            total += count * float(self.idf[term_id]) * freq * (self.k1 + 1) / (freq + float(self._norm[doc_index]))
         return total
 
     def top_scores(self, query_tokens: list[str], limit: int) -> list[tuple[int, float]]:
-        if not query_tokens or not self.corpus:
+        """按 query term 遍历倒排表累加得分，仅触达命中文档。"""
+        if not query_tokens or self.n == 0:
+            return []
+        acc = np.zeros(self.n, dtype=np.float32)
+        for term, count in Counter(query_tokens).items():
+            hit = self._postings(term)
+            if hit is None:
+                continue
+            term_id, docs, tfs = hit
+            freq = tfs.astype(np.float32)
+            acc[docs] += count * self.idf[term_id] * freq * (self.k1 + 1) / (freq + self._norm[docs])
+        touched = np.flatnonzero(acc > 0)
+        if touched.size == 0:
             return []
-        scored = [(idx, self.score(query_tokens, idx)) for idx in range(self.n)]
-        scored.sort(key=lambda x: x[1], reverse=True)
-        return [(idx, score) for idx, score in scored[:limit] if score > 0]
+        ranked = top_from_scores(acc[touched], limit)
+        return [(int(touched[i]), score) for i, score in ranked]
 
 
 def build_bm25_index(items: list[IndexedChunk]) -> BM25Index | None:
@@ -95,7 +257,7 @@ def build_bm25_index(items: list[IndexedChunk]) -> BM25Index | None:
     ]
     if not any(corpus):
         return None
-    return BM25Index(corpus)
+    return BM25Index.from_corpus(corpus)
 
 
 def _normalize_scores(scored: list[tuple[int, float]]) -> dict[int, float]:
@@ -108,7 +270,9 @@ def _normalize_scores(scored: list[tuple[int, float]]) -> dict[int, float]:
     return {idx: (score - lo) / (hi - lo) for idx, score in scored}
 
 
-def reciprocal_rank_fusion(rank_lists: list[list[int]], k: int = RRF_K) -> dict[int, float]:
+def reciprocal_rank_fusion(rank_lists: list[list[int]], k: int | None = None) -> dict[int, float]:
+    if k is None:
+        k = config.RRF_K
     scores: dict[int, float] = {}
     for ranks in rank_lists:
         for rank, idx in enumerate(ranks):
@@ -128,28 +292,25 @@ def lexical_overlap(query: str, item: IndexedChunk) -> float:
     return len(q_tokens & doc_tokens) / len(q_tokens)
 
 
-def _vector_scores(items: list[IndexedChunk], query: str, limit: int) -> list[tuple[int, float]]:
-    if not items:
+def _vector_scores(store: VectorStore, query: str, limit: int) -> list[tuple[int, float]]:
+    if not store.items:
         return []
     qv = np.array(embed_texts([query])[0], dtype=np.float32)
-    return _vector_scores_with_qv(items, qv, limit)
+    return _vector_scores_with_qv(store, qv, limit)
 
 
 def _vector_scores_with_qv(
-    items: list[IndexedChunk],
+    store: VectorStore,
     qv: np.ndarray,
     limit: int,
 ) -> list[tuple[int, float]]:
-    """向量打分（复用调用方预计算的 query 向量，避免重复 embed）。"""
-    if not items:
+    """向量打分（复用调用方预计算的 query 向量，避免重复 embed）。
+
+    直接在（可能已量化的）矩阵上整体打分，按知识库配置可对头部候选精确重打分。
+    """
+    if not store.items:
         return []
-    qn = float(np.linalg.norm(qv)) or 1.0
-    scored: list[tuple[int, float]] = []
-    for idx, item in enumerate(items):
-        score = float(np.dot(item.vector, qv) / ((np.linalg.norm(item.vector) or 1.0) * qn))
-        scored.append((idx, score))
-    scored.sort(key=lambda x: x[1], reverse=True)
-    return scored[:limit]
+    return store.vector_scores(qv, limit)
 
 
 def _bm25_scores(bm25: BM25Index | None, query: str, limit: int) -> list[tuple[int, float]]:
@@ -159,7 +320,7 @@ def _bm25_scores(bm25: BM25Index | None, query: str, limit: int) -> list[tuple[i
     return bm25.top_scores(tokens, limit)
 
 
-def _rerank(
+def _linear_rerank(
     query: str,
     items: list[IndexedChunk],
     candidate_indices: list[int],
@@ -182,43 +343,110 @@ def _rerank(
     return reranked
 
 
+def _rerank(
+    query: str,
+    items: list[IndexedChunk],
+    candidate_indices: list[int],
+    vector_norm: dict[int, float],
+    bm25_norm: dict[int, float],
+    rrf_scores: dict[int, float],
+) -> tuple[list[tuple[int, float]], dict[int, float]]:
+    """返回 (重排结果, 重排模型原始分)；未配置或本次超时 / 失败时为线性融合结果与空 dict。"""
+    linear = _linear_rerank(query, items, candidate_indices, vector_norm, bm25_norm, rrf_scores)
+    reranker = get_reranker()
+    if reranker is None:
+        return linear, {}
+    docs = [
+        (items[idx].chunk_id, f"{items[idx].doc_title}\n{items[idx].section}\n{items[idx].text}")
+        for idx in candidate_indices
+    ]
+    scores = reranker.score(query, docs)
+    if scores is None:
+        return linear, {}
+    model_scores = dict(zip(candidate_indices, scores))
+    model_norm = _normalize_scores(list(model_scores.items()))
+    # 模型分为主，保留少量线性融合分：模型对多个候选打分接近时仍参考召回信号
+    reranked = [
+        (idx, _MODEL_RERANK_WEIGHT * model_norm.get(idx, 0.0) + (1 - _MODEL_RERANK_WEIGHT) * score)
+        for idx, score in linear
+    ]
+    reranked.sort(key=lambda x: x[1], reverse=True)
+    return reranked, model_scores
+
+
 def hybrid_search(
     store: VectorStore,
     query: str,
-    top_k: int | None = None,
+    params: RetrievalParams | None = None,
     *,
-    min_score: float | None = None,
     query_vector: np.ndarray | None = None,
 ) -> list[tuple[IndexedChunk, float, dict[str, float]]]:
     """
     混合检索，返回 (chunk, score, debug) 列表。
     score 为归一化融合分（0~1），用于阈值过滤；debug 含 vector/bm25/rrf 分量。
 
+    params 缺省时取知识库默认参数（全局配置 + meta.json 覆盖）。
     若传入 query_vector（预计算的 query 向量），则跳过内部 embed 调用，便于多库探测时复用。
     """
-    k = top_k if top_k is not None else TOP_K
-    threshold = min_score if min_score is not None else MIN_SCORE
-    items = store.items
-    if not items:
+    p = params if params is not None else store.retrieval_params()
+    if not store.items:
         return []
 
-    pool = min(len(items), max(k * 4, RERANK_CANDIDATES if RERANK_ENABLED else k * 2))
-
+    pool = p.candidate_pool(len(store.items))
     if query_vector is not None:
-        vector_ranked = _vector_scores_with_qv(items, query_vector, pool)
+        vector_ranked = _vector_scores_with_qv(store, query_vector, pool)
     else:
-        vector_ranked = _vector_scores(items, query, pool)
+        vector_ranked = _vector_scores(store, query, pool)
+    return _fuse(store, query, vector_ranked, pool, p)
+
+
+def hybrid_search_batch(
+    store: VectorStore,
+    queries: list[str],
+    params: RetrievalParams | None = None,
+) -> list[list[tuple[IndexedChunk, float, dict[str, float]]]]:
+    """批量混合检索：一次 embed 请求 + 一次矩阵乘拿到全部向量分，再逐条融合。
+
+    每条结果与单独调用 hybrid_search 一致。
+    """
+    p = params if params is not None else store.retrieval_params()
+    if not queries:
+        return []
+    if not store.items:
+        return [[] for _ in queries]
+
+    pool = p.candidate_pool(len(store.items))
+    qvs = np.array(embed_texts(list(queries)), dtype=np.float32)
+    vector_lists = store.vector_scores_batch(qvs, pool)
+    return [
+        _fuse(store, query, vector_ranked, pool, p)
+        for query, vector_ranked in zip(queries, vector_lists)
+    ]
+
+
+def _fuse(
+    store: VectorStore,
+    query: str,
+    vector_ranked: list[tuple[int, float]],
+    pool: int,
+    params: RetrievalParams,
+) -> list[tuple[IndexedChunk, float, dict[str, float]]]:
+    """向量召回结果 + BM25 融合、重排与阈值过滤。"""
+    items = store.items
+    k = params.top_k
+    threshold = params.min_score
+    use_hybrid = params.hybrid
     vector_by_idx = {idx: score for idx, score in vector_ranked}
     vector_norm = _normalize_scores(vector_ranked)
 
-    if HYBRID_SEARCH and store.bm25 is not None:
+    if use_hybrid and store.bm25 is not None:
         bm25_ranked = _bm25_scores(store.bm25, query, pool)
         bm25_norm = _normalize_scores(bm25_ranked)
         rank_lists = [
             [idx for idx, _ in vector_ranked],
             [idx for idx, _ in bm25_ranked],
         ]
-        rrf_scores = reciprocal_rank_fusion(rank_lists)
+        rrf_scores = reciprocal_rank_fusion(rank_lists, params.rrf_k)
         candidate_indices = sorted(
             set(vector_by_idx) | {idx for idx, _ in bm25_ranked},
             key=lambda i: rrf_scores.get(i, 0.0),
@@ -226,11 +454,12 @@ def hybrid_search(
         )[:pool]
     else:
         bm25_norm = {}
-        rrf_scores = {idx: 1.0 / (RRF_K + rank + 1) for rank, (idx, _) in enumerate(vector_ranked)}
+        rrf_scores = {idx: 1.0 / (params.rrf_k + rank + 1) for rank, (idx, _) in enumerate(vector_ranked)}
         candidate_indices = [idx for idx, _ in vector_ranked]
 
-    if RERANK_ENABLED and len(candidate_indices) > k:
-        final_ranked = _rerank(query, items, candidate_indices, vector_norm, bm25_norm, rrf_scores)
+    model_scores: dict[int, float] = {}
+    if params.rerank_enabled and len(candidate_indices) > k:
+        final_ranked, model_scores = _rerank(query, items, candidate_indices, vector_norm, bm25_norm, rrf_scores)
     else:
         final_ranked = [(idx, rrf_scores.get(idx, vector_by_idx.get(idx, 0.0))) for idx in candidate_indices]
         final_ranked.sort(key=lambda x: x[1], reverse=True)
@@ -241,8 +470,8 @@ def hybrid_search(
     for idx, _ in final_ranked:
         vec = vector_by_idx.get(idx, 0.0)
         fusion = fusion_norm.get(idx, 0.0)
-        display_score = fusion if HYBRID_SEARCH else vec
-        if HYBRID_SEARCH and vec >= threshold and fusion < threshold:
+        display_score = fusion if use_hybrid else vec
+        if use_hybrid and vec >= threshold and fusion < threshold:
             display_score = max(fusion, vec * 0.85)
         debug = {
             "vector": round(vec, 4),
@@ -250,7 +479,9 @@ def hybrid_search(
             "rrf": round(rrf_scores.get(idx, 0.0), 4),
             "fusion": round(display_score, 4),
         }
-        if display_score >= threshold or (HYBRID_SEARCH and vec >= threshold):
+        if model_scores:
+            debug["rerank"] = round(model_scores.get(idx, 0.0), 4)
+        if display_score >= threshold or (use_hybrid and vec >= threshold):
             out.append((items[idx], display_score, debug))
         if len(out) >= k:
             break
@@ -1,15 +1,15 @@
 """FastAPI 路由。"""
 from __future__ import annotations
 
-import json
-from typing import Literal
+from typing import Annotated, Literal
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
 from chunker import chunk_markdown_text, title_from_markdown
-from config import CHAT_MODEL, CHUNK_OVERLAP, CHUNK_SIZE, EMBED_MODEL, LLM_PROVIDER
+import config
+from config import CHUNK_OVERLAP, CHUNK_SIZE
 from kb_registry import (
     create_base,
     delete_base,
@@ -19,11 +19,16 @@ from kb_registry import (
     set_active_id,
     update_base,
 )
-from recall_eval import run_batch_recall_eval, run_retrieve_test
+from recall_eval import (
+    run_batch_recall_eval,
+    run_batch_search,
+    run_recall_sweep,
+    run_retrieve_test,
+)
 from rag import rag_stream
-from prototype_registry import list_prototypes, sync_registry
+from prototype_registry import list_prototypes
 from prototype_design import generate_from_design, get_design_template
-from prototype_edit import cancel_edit, confirm_edit
+from prototype_edit import cancel_edit, confirm_edit, undo_edit
 from template_store import (
     create_template,
     delete_template,
@@ -34,6 +39,7 @@ from template_store import (
 )
 from settings_store import get_public_config, update_config
 from store import get_active_store, store_manager
+from streaming import coalesced_sse
 
 router = APIRouter()
 
@@ -65,6 +71,9 @@ class ConfigUpdate(BaseModel):
     rerankEnabled: bool | None = None
     rerankCandidates: int | None = Field(default=None, ge=5, le=50)
     rrfK: int | None = Field(default=None, ge=10, le=120)
+    rerankModel: str | None = None
+    rerankBaseUrl: str | None = None
+    contextTokens: int | None = Field(default=None, ge=300, le=8000)
 
 
 class KnowledgeBaseCreate(BaseModel):
@@ -72,12 +81,26 @@ class KnowledgeBaseCreate(BaseModel):
     description: str = ""
 
 
+class KnowledgeBaseRetrievalUpdate(BaseModel):
+    """知识库级检索参数覆盖；显式传 null 表示恢复使用全局配置。"""
+
+    topK: int | None = Field(default=None, ge=1, le=20)
+    minScore: float | None = Field(default=None, ge=0, le=1)
+    hybridSearch: bool | None = None
+    rerankEnabled: bool | None = None
+    rerankCandidates: int | None = Field(default=None, ge=5, le=50)
+    rrfK: int | None = Field(default=None, ge=10, le=120)
+
+
 class KnowledgeBaseUpdate(BaseModel):
     name: str | None = Field(default=None, min_length=1, max_length=80)
     description: str | None = None
     content: str | None = None
     chunkSize: int | None = Field(default=None, ge=100, le=2000)
     chunkOverlap: int | None = Field(default=None, ge=0, le=500)
+    vectorQuantization: Literal["none", "float16", "int8"] | None = None
+    rescoreCandidates: int | None = Field(default=None, ge=0, le=200)
+    retrieval: KnowledgeBaseRetrievalUpdate | None = None
 
 
 class ChunkPreviewRequest(BaseModel):
@@ -93,9 +116,26 @@ class RetrieveTestRequest(BaseModel):
     minScore: float | None = Field(default=None, ge=0, le=1)
 
 
+class BatchSearchRequest(BaseModel):
+    queries: list[str] = Field(min_length=1, max_length=200)
+    topK: int | None = Field(default=None, ge=1, le=20)
+    minScore: float | None = Field(default=None, ge=0, le=1)
+
+
 class BatchRecallEvalRequest(BaseModel):
     topK: int | None = Field(default=None, ge=1, le=20)
     minScore: float | None = Field(default=None, ge=0, le=1)
+    quantization: Literal["none", "float16", "int8"] | None = None
+
+
+class RecallSweepRequest(BaseModel):
+    topK: int | None = Field(default=None, ge=1, le=20)
+    minScore: float | None = Field(default=None, ge=0, le=1)
+    hybrid: list[bool] | None = None
+    rerankCandidates: list[Annotated[int, Field(ge=0, le=200)]] | None = None
+    rrfK: list[Annotated[int, Field(ge=1, le=1000)]] | None = None
+    quantization: list[Literal["none", "float16", "int8"]] | None = None
+    targetPassRate: float | None = Field(default=None, ge=0, le=1)
 
 
 class PrototypeEditConfirmRequest(BaseModel):
@@ -206,14 +246,24 @@ def knowledge_bases_get(kb_id: str):
 @router.put("/knowledge-bases/{kb_id}")
 def knowledge_bases_update(kb_id: str, body: KnowledgeBaseUpdate):
     try:
-        return update_base(
+        kb = update_base(
             kb_id,
             name=body.name,
             description=body.description,
             content=body.content,
             chunk_size=body.chunkSize,
             chunk_overlap=body.chunkOverlap,
+            vector_quantization=body.vectorQuantization,
+            rescore_candidates=body.rescoreCandidates,
+            retrieval=body.retrieval.model_dump(exclude_unset=True) if body.retrieval else None,
         )
+        if body.vectorQuantization is not None or body.rescoreCandidates is not None:
+            store_manager.invalidate(kb_id)
+            if kb_id == get_active_id():
+                store_manager.reload_active()
+        elif body.retrieval is not None:
+            store_manager.refresh_params(kb_id)
+        return kb
     except FileNotFoundError as exc:
         raise HTTPException(404, str(exc)) from exc
     except ValueError as exc:
@@ -287,6 +337,8 @@ def knowledge_bases_rebuild(kb_id: str):
         count = store.build()
         if kb_id == get_active_id():
             store_manager.reload_active()
+        else:
+            store_manager.trim()
         return {**store.status(), "message": f"索引完成，共 {count} 个 chunk"}
     except FileNotFoundError as exc:
         raise HTTPException(404, str(exc)) from exc
@@ -311,6 +363,23 @@ def knowledge_bases_retrieve_test(kb_id: str, body: RetrieveTestRequest):
         raise HTTPException(500, str(exc)) from exc
 
 
+@router.post("/knowledge-bases/{kb_id}/search-batch")
+def knowledge_bases_search_batch(kb_id: str, body: BatchSearchRequest):
+    try:
+        return run_batch_search(
+            kb_id,
+            body.queries,
+            top_k=body.topK,
+            min_score=body.minScore,
+        )
+    except FileNotFoundError as exc:
+        raise HTTPException(404, str(exc)) from exc
+    except ValueError as exc:
+        raise HTTPException(400, str(exc)) from exc
+    except Exception as exc:
+        raise HTTPException(500, str(exc)) from exc
+
+
 @router.post("/knowledge-bases/{kb_id}/recall-eval-batch")
 def knowledge_bases_recall_eval_batch(kb_id: str, body: BatchRecallEvalRequest | None = None):
     try:
@@ -319,6 +388,29 @@ def knowledge_bases_recall_eval_batch(kb_id: str, body: BatchRecallEvalRequest |
             kb_id,
             top_k=opts.topK,
             min_score=opts.minScore,
+            quantization=opts.quantization,
+        )
+    except FileNotFoundError as exc:
+        raise HTTPException(404, str(exc)) from exc
+    except ValueError as exc:
+        raise HTTPException(400, str(exc)) from exc
+    except Exception as exc:
+        raise HTTPException(500, str(exc)) from exc
+
+
+@router.post("/knowledge-bases/{kb_id}/recall-eval-sweep")
+def knowledge_bases_recall_eval_sweep(kb_id: str, body: RecallSweepRequest | None = None):
+    try:
+        opts = body or RecallSweepRequest()
+        return run_recall_sweep(
+            kb_id,
+            top_k=opts.topK,
+            min_score=opts.minScore,
+            hybrid=opts.hybrid,
+            rerank_candidates=opts.rerankCandidates,
+            rrf_k=opts.rrfK,
+            quantization=opts.quantization,
+            target_pass_rate=opts.targetPassRate,
         )
     except FileNotFoundError as exc:
         raise HTTPException(404, str(exc)) from exc
@@ -350,15 +442,15 @@ def health():
         "ok": True,
         "chunks": store.size,
         "activeKbId": get_active_id(),
-        "provider": LLM_PROVIDER,
-        "chatModel": CHAT_MODEL,
-        "embedModel": EMBED_MODEL,
+        "provider": config.LLM_PROVIDER,
+        "chatModel": config.CHAT_MODEL,
+        "embedModel": config.EMBED_MODEL,
+        "residency": store_manager.residency(),
     }
 
 
 @router.get("/prototypes")
 def prototypes_list():
-    sync_registry()
     return {"items": list_prototypes()}
 
 
@@ -462,8 +554,18 @@ def prototypes_edit_cancel(page_id: str, body: PrototypeEditConfirmRequest):
         raise HTTPException(500, str(exc)) from exc
 
 
+@router.post("/prototypes/{page_id}/edit-undo")
+def prototypes_edit_undo(page_id: str, body: PrototypeEditConfirmRequest):
+    try:
+        return undo_edit(page_id, body.editId)
+    except FileNotFoundError as exc:
+        raise HTTPException(404, str(exc)) from exc
+    except Exception as exc:
+        raise HTTPException(500, str(exc)) from exc
+
+
 @router.post("/chat")
-async def chat(body: ChatRequest):
+async def chat(body: ChatRequest, request: Request):
     msgs = [{"role": m.role, "content": m.content.strip()} for m in body.messages if m.content.strip()]
     if not body.triggerPrototypePreview:
         if not msgs or msgs[-1]["role"] != "user":
@@ -471,25 +573,12 @@ async def chat(body: ChatRequest):
     elif not msgs:
         msgs = [{"role": "user", "content": "查看所有归档原型"}]
 
-    async def sse():
-        meta: dict | None = None
-        try:
-            async for token, done in rag_stream(
-                msgs,
-                body.summary,
-                body.userProfile,
-                prototype_state=body.prototypeState,
-                prototype_edit_state=body.prototypeEditState,
-                trigger_prototype_preview=body.triggerPrototypePreview,
-            ):
-                if token:
-                    yield f"event: token\ndata: {json.dumps({'text': token}, ensure_ascii=False)}\n\n"
-                if done is not None:
-                    meta = done
-            payload = meta or {"citations": [], "refused": False}
-            yield f"event: done\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
-        except Exception as exc:
-            err = {"message": str(exc)}
-            yield f"event: error\ndata: {json.dumps(err, ensure_ascii=False)}\n\n"
-
-    return StreamingResponse(sse(), media_type="text/event-stream")
+    source = rag_stream(
+        msgs,
+        body.summary,
+        body.userProfile,
+        prototype_state=body.prototypeState,
+        prototype_edit_state=body.prototypeEditState,
+        trigger_prototype_preview=body.triggerPrototypePreview,
+    )
+    return StreamingResponse(coalesced_sse(request, source), media_type="text/event-stream")
@@ -8,8 +8,9 @@ from typing import Any
 
 import config
 from embedder import reset_clients
+from generation import atomic_write_text, bump_generation, file_lock, generation_watcher
 from kb_registry import get_active_id, get_kb_paths, list_bases
-from store import store_manager
+from store import index_lock_for, index_sidecars_for, store_manager
 
 SETTINGS_FILE = Path(__file__).resolve().parent / "settings.json"
 
@@ -26,6 +27,9 @@ DEFAULT_SETTINGS: dict[str, Any] = {
     "rerankEnabled": True,
     "rerankCandidates": 20,
     "rrfK": 60,
+    "rerankModel": "",
+    "rerankBaseUrl": "",
+    "contextTokens": 1800,
 }
 
 
@@ -53,7 +57,7 @@ def _read_raw() -> dict[str, Any]:
 
 def _write_raw(data: dict[str, Any]) -> None:
     SETTINGS_FILE.parent.mkdir(parents=True, exist_ok=True)
-    SETTINGS_FILE.write_text(json.dumps(data, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    atomic_write_text(SETTINGS_FILE, json.dumps(data, ensure_ascii=False, indent=2) + "\n")
 
 
 def reload_settings() -> None:
@@ -86,6 +90,9 @@ def get_public_config() -> dict[str, Any]:
         "rerankEnabled": data.get("rerankEnabled", DEFAULT_SETTINGS["rerankEnabled"]),
         "rerankCandidates": data.get("rerankCandidates", DEFAULT_SETTINGS["rerankCandidates"]),
         "rrfK": data.get("rrfK", DEFAULT_SETTINGS["rrfK"]),
+        "rerankModel": data.get("rerankModel", DEFAULT_SETTINGS["rerankModel"]),
+        "rerankBaseUrl": data.get("rerankBaseUrl", DEFAULT_SETTINGS["rerankBaseUrl"]),
+        "contextTokens": data.get("contextTokens", DEFAULT_SETTINGS["contextTokens"]),
         "apiKeySet": bool(key),
         "apiKeyMasked": _mask_secret(key) if key else "",
         "activeKbId": get_active_id(),
@@ -109,6 +116,9 @@ def update_config(payload: dict[str, Any]) -> dict[str, Any]:
         "rerankEnabled",
         "rerankCandidates",
         "rrfK",
+        "rerankModel",
+        "rerankBaseUrl",
+        "contextTokens",
     ):
         if field in payload and payload[field] is not None:
             merged[field] = payload[field]
@@ -124,16 +134,29 @@ def update_config(payload: dict[str, Any]) -> dict[str, Any]:
     _write_raw(merged)
     reload_settings()
     reset_clients()
+    scopes = ["settings"]
     if str(merged.get("embedModel", prev_embed)) != prev_embed:
         for base in list_bases():
             kb_id = str(base["id"])
             store_manager.get(kb_id).clear()
             _, index_path = get_kb_paths(kb_id)
-            if index_path.exists():
+            # 与 _write_cache 一致持有独占锁，读者（_read_cache 共享锁）不会看到删了一半的文件组
+            with file_lock(index_lock_for(index_path)):
                 index_path.unlink(missing_ok=True)
+                for sidecar in index_sidecars_for(index_path):
+                    sidecar.unlink(missing_ok=True)
             store_manager.invalidate(kb_id)
+            scopes.append(f"index:{kb_id}")
+    bump_generation(*scopes)
 
     return get_public_config()
 
 
+def _on_settings_changed(_: str) -> None:
+    """其它 worker 修改了配置：重新读取 settings.json 并按需重建模型客户端。"""
+    reload_settings()
+    reset_clients()
+
+
 reload_settings()
+generation_watcher.on_change("settings", _on_settings_changed)
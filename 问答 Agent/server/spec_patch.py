@@ -0,0 +1,98 @@
+"""module.spec 的 JSON Patch（RFC 6902 子集：add / remove / replace）差异与应用。
+
+- diff：对比两个 spec 生成 patch；同一对象（结构共享的未改动部分）直接跳过
+- apply_patch：沿路径复制容器后修改，未涉及的子树与原 spec 共享，不整体 deepcopy
+- 编辑草稿只存基准 spec + 每次修订的 patch 链，撤销即去掉链尾
+"""
+from __future__ import annotations
+
+from copy import deepcopy
+from typing import Any
+
+
+def _escape(token: str) -> str:
+    return token.replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def _split(path: str) -> list[str]:
+    if not path:
+        return []
+    if not path.startswith("/"):
+        raise ValueError(f"非法 patch 路径：{path}")
+    return [_unescape(t) for t in path[1:].split("/")]
+
+
+def diff(old: Any, new: Any, path: str = "") -> list[dict]:
+    """生成把 old 变为 new 的 patch；等长列表逐项对比，长度变化时整体替换该列表。"""
+    if old is new:
+        return []
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops: list[dict] = []
+        for key, value in old.items():
+            child = f"{path}/{_escape(str(key))}"
+            if key not in new:
+                ops.append({"op": "remove", "path": child})
+            else:
+                ops.extend(diff(value, new[key], child))
+        for key, value in new.items():
+            if key not in old:
+                ops.append({"op": "add", "path": f"{path}/{_escape(str(key))}", "value": deepcopy(value)})
+        return ops
+    if isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        ops = []
+        for i, (a, b) in enumerate(zip(old, new)):
+            ops.extend(diff(a, b, f"{path}/{i}"))
+        return ops
+    if type(old) is type(new) and old == new:
+        return []
+    return [{"op": "replace", "path": path, "value": deepcopy(new)}]
+
+
+def _copy(container: Any) -> Any:
+    return list(container) if isinstance(container, list) else dict(container)
+
+
+def apply_patch(doc: Any, patch: list[dict]) -> Any:
+    """应用 patch 并返回新文档；只复制被修改路径上的容器，其余部分与 doc 共享（调用方不应原地修改结果）。"""
+    for op in patch:
+        tokens = _split(str(op.get("path") or ""))
+        kind = op.get("op")
+        if not tokens:
+            if kind not in ("add", "replace"):
+                raise ValueError("不能删除文档根节点")
+            doc = deepcopy(op.get("value"))
+            continue
+        root = _copy(doc)
+        parent = root
+        for token in tokens[:-1]:
+            key: Any = int(token) if isinstance(parent, list) else token
+            child = _copy(parent[key])
+            parent[key] = child
+            parent = child
+        last = tokens[-1]
+        if isinstance(parent, list):
+            index = len(parent) if last == "-" else int(last)
+            if kind == "remove":
+                parent.pop(index)
+            elif kind == "add":
+                parent.insert(index, deepcopy(op.get("value")))
+            else:
+                parent[index] = deepcopy(op.get("value"))
+        elif kind == "remove":
+            parent.pop(last, None)
+        else:
+            parent[last] = deepcopy(op.get("value"))
+        doc = root
+    return doc
+
+
+def replay(base: Any, patches: list[list[dict]]) -> Any:
+    """基准文档依次应用修订 patch 链。"""
+    for patch in patches:
+        base = apply_patch(base, patch)
+    return base
+
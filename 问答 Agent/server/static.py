@@ -1,11 +1,15 @@
 """前端静态资源。"""
 from __future__ import annotations
 
+import asyncio
+from pathlib import Path
+
 from fastapi import HTTPException
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, HTMLResponse
 from fastapi.staticfiles import StaticFiles
 
 from config import DEMO_DIST, PROTOTYPE_SKELETON_DIR
+from prototype_edit import PREVIEW_PREFIX, resolve_draft_file
 
 
 def ensure_dist() -> None:
@@ -40,6 +44,18 @@ def mount_prototype_files(app) -> None:
     if not PROTOTYPE_SKELETON_DIR.is_dir():
         print(f"警告：未找到 prototype-skeleton 目录：{PROTOTYPE_SKELETON_DIR}")
         return
+
+    # 须先于 /api/prototype-files 挂载注册：草稿只含差异产物，缺失文件回退正式原型目录
+    @app.get(PREVIEW_PREFIX + "/{edit_id}/{file_path:path}", include_in_schema=False)
+    async def draft_file(edit_id: str, file_path: str):
+        try:
+            resolved = await asyncio.to_thread(resolve_draft_file, edit_id, file_path)
+        except FileNotFoundError:
+            raise HTTPException(404, "Not Found") from None
+        if isinstance(resolved, Path):
+            return FileResponse(resolved)
+        return HTMLResponse(resolved, headers={"Cache-Control": "no-store"})
+
     app.mount(
         "/api/prototype-files",
         StaticFiles(directory=str(PROTOTYPE_SKELETON_DIR)),
@@ -1,33 +1,144 @@
 """向量索引与混合检索（支持多知识库）。"""
 from __future__ import annotations
 
+import asyncio
 import json
-from dataclasses import dataclass, field
+import os
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timezone
+from functools import partial
+from pathlib import Path
+from typing import Callable, TypeVar
 
 import numpy as np
 
+from chunk_payloads import ChunkPayloads, write_chunk_payloads
 from chunker import RawChunk, load_kb_chunks
-from config import EMBED_MODEL
+import config
+from config import KB_MEMORY_BUDGET_MB, KB_WARMUP, SEARCH_WORKERS
 from embedder import embed_texts
-from kb_registry import get_active_id, get_kb_paths, get_kb_chunk_params
-from retrieval import BM25Index, build_bm25_index, hybrid_search
+from generation import atomic_write_text, bump_generation, file_lock, generation_watcher
+from kb_registry import (
+    get_active_id,
+    get_kb_chunk_params,
+    get_kb_paths,
+    get_kb_retrieval_overrides,
+    get_kb_vector_params,
+    list_bases,
+)
+from retrieval import BM25Index, RetrievalParams, build_bm25_index, hybrid_search, hybrid_search_batch
+from vector_index import VectorMatrix
 
-INDEX_VERSION = 2
+# v3：向量从 index.cache.json 拆出为 index.vectors.npy（float32，可 memmap）
+# v4：chunk 正文 / 章节上下文 / metadata 拆出为 index.payload.bin（按偏移按需读取）
+INDEX_VERSION = 4
+VECTORS_FILENAME = "index.vectors.npy"
+BM25_FILENAME = "index.bm25.npz"
+PAYLOAD_FILENAME = "index.payload.bin"
+# 索引文件组（JSON / 向量 / BM25）的跨进程读写锁：写整组时独占，worker 加载时共享
+INDEX_LOCK_FILENAME = "index.lock"
+
+
+def vectors_path_for(index_path: Path) -> Path:
+    return index_path.with_name(VECTORS_FILENAME)
+
+
+def bm25_path_for(index_path: Path) -> Path:
+    return index_path.with_name(BM25_FILENAME)
+
+
+def payload_path_for(index_path: Path) -> Path:
+    return index_path.with_name(PAYLOAD_FILENAME)
+
+
+def index_lock_for(index_path: Path) -> Path:
+    return index_path.with_name(INDEX_LOCK_FILENAME)
+
+
+def index_sidecars_for(index_path: Path) -> list[Path]:
+    """与 index.cache.json 配套的二进制文件（向量矩阵、BM25 倒排、chunk 正文）。"""
+    return [vectors_path_for(index_path), bm25_path_for(index_path), payload_path_for(index_path)]
+
+
+def _atomic_save_npy(path: Path, array: np.ndarray) -> None:
+    """先写临时文件再 rename，已 memmap 旧文件的读者不会读到截断内容。"""
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with tmp.open("wb") as fh:
+        np.save(fh, array)
+    os.replace(tmp, path)
 
 
-@dataclass
 class IndexedChunk:
-    doc_title: str
-    section: str
-    text: str
-    source_file: str
-    vector: np.ndarray
-    chunk_id: str = ""
-    anchor: str = ""
-    parent_text: str = ""
-    block_type: str = "text"
-    metadata: dict[str, str] = field(default_factory=dict)
+    """
+    检索单元。
+
+    打分只用标题、小节、来源等短字段；text / parent_text / metadata 在索引落盘后改为
+    从 payload 文件按需读取（展示命中、打包上下文时才解码），不随 chunk 常驻内存。
+    """
+
+    __slots__ = (
+        "doc_title",
+        "section",
+        "source_file",
+        "chunk_id",
+        "anchor",
+        "block_type",
+        "_text",
+        "_parent_text",
+        "_metadata",
+        "_payloads",
+        "_row",
+    )
+
+    def __init__(
+        self,
+        doc_title: str,
+        section: str,
+        text: str,
+        source_file: str,
+        chunk_id: str = "",
+        anchor: str = "",
+        parent_text: str = "",
+        block_type: str = "text",
+        metadata: dict[str, str] | None = None,
+    ) -> None:
+        self.doc_title = doc_title
+        self.section = section
+        self.source_file = source_file
+        self.chunk_id = chunk_id
+        self.anchor = anchor
+        self.block_type = block_type
+        self._text = text
+        self._parent_text = parent_text
+        self._metadata = metadata or {}
+        self._payloads: ChunkPayloads | None = None
+        self._row = -1
+
+    def bind(self, payloads: ChunkPayloads, row: int) -> None:
+        """改为从 payload 文件读取正文，释放内存中的副本。"""
+        self._payloads = payloads
+        self._row = row
+        self._text = ""
+        self._parent_text = ""
+        self._metadata = {}
+
+    @property
+    def text(self) -> str:
+        return self._payloads.text(self._row) if self._payloads is not None else self._text
+
+    @property
+    def parent_text(self) -> str:
+        return self._payloads.parent_text(self._row) if self._payloads is not None else self._parent_text
+
+    @property
+    def metadata(self) -> dict[str, str]:
+        return self._payloads.metadata(self._row) if self._payloads is not None else self._metadata
+
+    def __repr__(self) -> str:
+        return f"IndexedChunk(chunk_id={self.chunk_id!r}, doc_title={self.doc_title!r}, section={self.section!r})"
 
 
 class VectorStore:
@@ -35,6 +146,11 @@ class VectorStore:
         self.kb_id = kb_id
         self.index_path = index_path
         self._items: list[IndexedChunk] = []
+        self._matrix: VectorMatrix | None = None
+        self._rescore_candidates = 0
+        self._retrieval_overrides: dict[str, object] = {}
+        self._payload_bytes = 0
+        self._payloads: ChunkPayloads | None = None
         self._bm25: BM25Index | None = None
         self._built_at: str | None = None
         self._embed_model: str | None = None
@@ -48,14 +164,104 @@ class VectorStore:
     def bm25(self) -> BM25Index | None:
         return self._bm25
 
+    @property
+    def matrix(self) -> VectorMatrix | None:
+        return self._matrix
+
+    @property
+    def vectors_path(self) -> Path:
+        return vectors_path_for(Path(self.index_path))
+
     @property
     def size(self) -> int:
         return len(self._items)
 
+    @property
+    def bm25_path(self) -> Path:
+        return bm25_path_for(Path(self.index_path))
+
+    @property
+    def payload_path(self) -> Path:
+        return payload_path_for(Path(self.index_path))
+
+    @staticmethod
+    def _fingerprint_of(built_at: str | None, count: int) -> str:
+        """BM25 / payload 文件与 index.cache.json 的对应关系（同一次构建）。"""
+        return f"{built_at}|{count}"
+
+    def _fingerprint(self) -> str:
+        return self._fingerprint_of(self._built_at, len(self._items))
+
     def _rebuild_bm25(self) -> None:
         self._bm25 = build_bm25_index(self._items)
 
+    def _save_bm25(self) -> None:
+        if self._bm25 is None:
+            self.bm25_path.unlink(missing_ok=True)
+            return
+        self._bm25.save(self.bm25_path, fingerprint=self._fingerprint())
+
+    def _load_bm25(self) -> None:
+        """优先读取持久化的倒排索引；缺失或与当前 chunk 不匹配时重新分词并回写。"""
+        loaded: BM25Index | None = None
+        if self.bm25_path.exists():
+            try:
+                loaded = BM25Index.load(self.bm25_path, fingerprint=self._fingerprint())
+            except (KeyError, OSError, ValueError, UnicodeDecodeError):
+                loaded = None
+        if loaded is not None and loaded.n == len(self._items):
+            self._bm25 = loaded
+            return
+        self._rebuild_bm25()
+        try:
+            self._save_bm25()
+        except OSError:
+            pass
+
+    def _measure_payload(self) -> None:
+        """估算 chunk 常驻内存：payload 已落盘时只计短字段与偏移数组，正文走 memmap。"""
+        total = self._payloads.resident_bytes() if self._payloads is not None else 0
+        for item in self._items:
+            total += 120 + sum(
+                sys.getsizeof(v)
+                for v in (item.doc_title, item.section, item.source_file, item.chunk_id, item.anchor)
+            )
+            if item._payloads is None:
+                total += sys.getsizeof(item.text) + sys.getsizeof(item.parent_text)
+                total += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in item.metadata.items())
+        self._payload_bytes = total
+
+    def resident_bytes(self) -> int:
+        """常驻内存估算：chunk 文本 + 向量矩阵（不含 memmap）+ BM25。"""
+        total = self._payload_bytes
+        if self._matrix is not None:
+            total += self._matrix.resident_bytes()
+        if self._bm25 is not None:
+            total += self._bm25.memory_bytes()
+        return total
+
+    def mapped_bytes(self) -> int:
+        total = self._matrix.mapped_bytes() if self._matrix is not None else 0
+        if self._payloads is not None:
+            total += self._payloads.mapped_bytes()
+        return total
+
+    def _quantization(self) -> tuple[str, int]:
+        try:
+            return get_kb_vector_params(self.kb_id)
+        except (FileNotFoundError, ValueError, OSError):
+            return "none", 0
+
+    def _vector_matrix(self, raw: np.ndarray) -> tuple[VectorMatrix, int]:
+        mode, rescore = self._quantization()
+        return VectorMatrix(raw, mode), rescore
+
+    def _attach_vectors(self, raw: np.ndarray) -> None:
+        self._matrix, self._rescore_candidates = self._vector_matrix(raw)
+        self.refresh_retrieval_params()
+
     def status(self) -> dict[str, object]:
+        mode, _ = self._quantization()
         return {
             "kbId": self.kb_id,
             "chunks": self.size,
@@ -64,16 +270,19 @@ class VectorStore:
             "builtAt": self._built_at,
             "indexVersion": self._index_version,
             "cachePath": str(self.index_path),
+            "vectorQuantization": self._matrix.mode if self._matrix else mode,
+            "rescoreCandidates": self._rescore_candidates,
+            "vectorBytes": self._matrix.resident_bytes() if self._matrix else 0,
+            "retrieval": self.retrieval_params().to_dict(),
         }
 
     @staticmethod
-    def _item_from_raw(c: RawChunk, vector: list[float]) -> IndexedChunk:
+    def _item_from_raw(c: RawChunk) -> IndexedChunk:
         return IndexedChunk(
             c.doc_title,
             c.section,
             c.text,
             c.source_file,
-            np.array(vector, dtype=np.float32),
             chunk_id=c.chunk_id,
             anchor=c.anchor,
             parent_text=c.parent_text,
@@ -81,6 +290,20 @@ class VectorStore:
             metadata=dict(c.metadata),
         )
 
+    @staticmethod
+    def _lazy_item(item: dict, payloads: ChunkPayloads, row: int) -> IndexedChunk:
+        chunk = IndexedChunk(
+            item["doc_title"],
+            item["section"],
+            "",
+            item["source_file"],
+            chunk_id=str(item.get("chunk_id", "")),
+            anchor=str(item.get("anchor", "")),
+            block_type=str(item.get("block_type", "text")),
+        )
+        chunk.bind(payloads, row)
+        return chunk
+
     @staticmethod
     def _item_from_cache(item: dict) -> IndexedChunk:
         return IndexedChunk(
@@ -88,7 +311,6 @@ class VectorStore:
             item["section"],
             item["text"],
             item["source_file"],
-            np.array(item["vector"], dtype=np.float32),
             chunk_id=str(item.get("chunk_id", "")),
             anchor=str(item.get("anchor", "")),
             parent_text=str(item.get("parent_text", "")),
@@ -97,53 +319,108 @@ class VectorStore:
         )
 
     def load_cache(self) -> bool:
+        if not self.index_path.exists():
+            return False
+        # 共享锁：其它 worker 重建索引时等待整组文件写完，避免读到新向量配旧 JSON
+        with file_lock(index_lock_for(self.index_path), shared=True):
+            return self._read_cache()
+
+    def _read_cache(self) -> bool:
         if not self.index_path.exists():
             return False
         try:
             data = json.loads(self.index_path.read_text(encoding="utf-8"))
-            if data.get("embedModel") != EMBED_MODEL:
+            if data.get("embedModel") != config.EMBED_MODEL:
                 return False
             version = int(data.get("indexVersion", 1))
             items = data.get("items", [])
             if not isinstance(items, list) or not items:
                 return False
-            self._items = [self._item_from_cache(item) for item in items]
-            self._built_at = data.get("builtAt")
+            if version >= 3:
+                raw = np.load(self.vectors_path, mmap_mode="r")
+            else:
+                raw = np.array([item["vector"] for item in items], dtype=np.float32)
+            if raw.ndim != 2 or raw.shape[0] != len(items):
+                return False
+            built_at = data.get("builtAt")
+            if version >= 4:
+                payloads = ChunkPayloads.open(self.payload_path, fingerprint=f"{built_at}|{len(items)}", chunks=len(items))
+                if payloads is None:
+                    return False
+                self._payloads = payloads
+                self._items = [self._lazy_item(item, payloads, row) for row, item in enumerate(items)]
+            else:
+                self._payloads = None
+                self._items = [self._item_from_cache(item) for item in items]
+            self._attach_vectors(raw)
+            self._built_at = built_at
             self._embed_model = data.get("embedModel")
             self._index_version = version
-            self._rebuild_bm25()
+            self._load_bm25()
+            self._measure_payload()
             return True
         except (json.JSONDecodeError, KeyError, OSError, TypeError, ValueError):
             self.clear()
             return False
 
-    def save_cache(self) -> None:
+    def save_cache(
+        self,
+        vectors: np.ndarray,
+        items: list[IndexedChunk],
+        bm25: BM25Index | None,
+        built_at: str,
+    ) -> None:
+        """把一次构建的结果整组落盘；不修改当前实例，检索在写入期间继续使用旧快照。"""
         self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        with file_lock(index_lock_for(self.index_path)):
+            self._write_cache(vectors, items, bm25, built_at)
+
+    def _write_cache(
+        self,
+        vectors: np.ndarray,
+        items: list[IndexedChunk],
+        bm25: BM25Index | None,
+        built_at: str,
+    ) -> None:
+        # 各文件均为临时文件 + rename；已 memmap 旧向量的 worker 继续使用旧快照直到收到代数通知
+        fingerprint = self._fingerprint_of(built_at, len(items))
+        _atomic_save_npy(self.vectors_path, np.asarray(vectors, dtype=np.float32))
+        if bm25 is None:
+            self.bm25_path.unlink(missing_ok=True)
+        else:
+            bm25.save(self.bm25_path, fingerprint=fingerprint)
+        write_chunk_payloads(
+            self.payload_path,
+            [item.text for item in items],
+            [item.metadata for item in items],
+            [item.parent_text for item in items],
+            fingerprint=fingerprint,
+        )
         payload = {
             "kbId": self.kb_id,
-            "embedModel": EMBED_MODEL,
-            "builtAt": self._built_at,
+            "embedModel": config.EMBED_MODEL,
+            "builtAt": built_at,
             "indexVersion": INDEX_VERSION,
             "items": [
                 {
                     "doc_title": item.doc_title,
                     "section": item.section,
-                    "text": item.text,
                     "source_file": item.source_file,
-                    "vector": item.vector.tolist(),
                     "chunk_id": item.chunk_id,
                     "anchor": item.anchor,
-                    "parent_text": item.parent_text,
                     "block_type": item.block_type,
-                    "metadata": item.metadata,
                 }
-                for item in self._items
+                for item in items
             ],
         }
-        self.index_path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+        atomic_write_text(self.index_path, json.dumps(payload, ensure_ascii=False))
 
     def clear(self) -> None:
         self._items = []
+        self._matrix = None
+        self._rescore_candidates = 0
+        self._payload_bytes = 0
+        self._payloads = None
         self._bm25 = None
         self._built_at = None
         self._embed_model = None
@@ -153,56 +430,280 @@ class VectorStore:
         chunk_size, chunk_overlap = get_kb_chunk_params(self.kb_id)
         raw = load_kb_chunks(content_path, chunk_size, chunk_overlap)
         vectors = embed_texts([f"{c.doc_title}\n{c.section}\n{c.text}" for c in raw])
-        self._items = [self._item_from_raw(c, v) for c, v in zip(raw, vectors)]
-        self._built_at = datetime.now(timezone.utc).isoformat()
-        self._embed_model = EMBED_MODEL
+        # 新的 chunk / 向量 / BM25 / payload 先在局部变量中构建并落盘，全部成功后再一起替换，
+        # 期间并发检索始终使用旧快照，不会出现旧矩阵行号对应新 chunk 列表的情况
+        items = [self._item_from_raw(c) for c in raw]
+        built_at = datetime.now(timezone.utc).isoformat()
+        bm25 = build_bm25_index(items)
+        self.save_cache(np.array(vectors, dtype=np.float32), items, bm25, built_at)
+        matrix, rescore = self._vector_matrix(np.load(self.vectors_path, mmap_mode="r"))
+        # 落盘后正文改为按需读取，构建时的内存副本随之释放
+        payloads = ChunkPayloads.open(
+            self.payload_path, fingerprint=self._fingerprint_of(built_at, len(items)), chunks=len(items)
+        )
+        if payloads is not None:
+            for row, item in enumerate(items):
+                item.bind(payloads, row)
+
+        self._items, self._matrix, self._bm25, self._payloads = items, matrix, bm25, payloads
+        self._rescore_candidates = rescore
+        self._built_at = built_at
+        self._embed_model = config.EMBED_MODEL
         self._index_version = INDEX_VERSION
-        self._rebuild_bm25()
-        self.save_cache()
+        self.refresh_retrieval_params()
+        self._measure_payload()
+        bump_generation(f"index:{self.kb_id}")
         return self.size
 
-    def search(self, query: str, top_k: int = 5) -> list[tuple[IndexedChunk, float]]:
+    def vector_scores(self, qv: np.ndarray, limit: int) -> list[tuple[int, float]]:
+        """向量召回；量化模式下可对前 rescoreCandidates 个候选用原始向量精确重打分。"""
+        if self._matrix is None:
+            return []
+        if not self._rescoring():
+            return self._matrix.top(qv, limit)
+        ranked = self._matrix.top(qv, max(limit, self._rescore_candidates))
+        return self._rescore(qv, ranked, limit)
+
+    def vector_scores_batch(self, queries: np.ndarray, limit: int) -> list[list[tuple[int, float]]]:
+        """批量向量召回：一次矩阵乘完成全部 query 打分，重打分规则同 vector_scores。"""
+        if self._matrix is None:
+            return [[] for _ in range(len(queries))]
+        if not self._rescoring():
+            return self._matrix.top_batch(queries, limit)
+        ranked_lists = self._matrix.top_batch(queries, max(limit, self._rescore_candidates))
+        return [self._rescore(qv, ranked, limit) for qv, ranked in zip(queries, ranked_lists)]
+
+    def _rescoring(self) -> bool:
+        return self._rescore_candidates > 0 and self._matrix is not None and self._matrix.can_rescore
+
+    def _rescore(self, qv: np.ndarray, ranked: list[tuple[int, float]], limit: int) -> list[tuple[int, float]]:
+        head = [idx for idx, _ in ranked[: self._rescore_candidates]]
+        exact = dict(self._matrix.exact_scores(qv, head))
+        merged = [(idx, exact.get(idx, score)) for idx, score in ranked]
+        merged.sort(key=lambda x: x[1], reverse=True)
+        return merged[:limit]
+
+    def with_quantization(self, mode: str) -> VectorStore:
+        """共享 chunk / BM25，按指定量化模式重建向量矩阵（供召回评测对比）。"""
+        if self._matrix is None or self._matrix.raw is None:
+            raise ValueError("当前索引不含原始向量，请重建索引后再对比量化模式")
+        clone = VectorStore(self.kb_id, self.index_path)
+        clone._items = self._items
+        clone._bm25 = self._bm25
+        clone._built_at = self._built_at
+        clone._embed_model = self._embed_model
+        clone._index_version = self._index_version
+        clone._matrix = VectorMatrix(self._matrix.raw, mode)
+        clone._rescore_candidates = self._rescore_candidates
+        clone._retrieval_overrides = self._retrieval_overrides
+        clone._payload_bytes = self._payload_bytes
+        clone._payloads = self._payloads
+        return clone
+
+    def retrieval_params(self, **overrides: object) -> RetrievalParams:
+        """全局配置 + 知识库 meta.json 覆盖 + 调用方覆盖（snake_case，None 忽略）。"""
+        params = RetrievalParams.from_config().merged(self._retrieval_overrides)
+        return params.with_overrides(**overrides)
+
+    def refresh_retrieval_params(self) -> None:
+        try:
+            self._retrieval_overrides = get_kb_retrieval_overrides(self.kb_id)
+        except (FileNotFoundError, ValueError, OSError):
+            self._retrieval_overrides = {}
+
+    def _params(self, top_k: int | None, params: RetrievalParams | None) -> RetrievalParams:
+        base = params if params is not None else self.retrieval_params()
+        return base.with_overrides(top_k=top_k)
+
+    def search(
+        self,
+        query: str,
+        top_k: int | None = None,
+        *,
+        params: RetrievalParams | None = None,
+    ) -> list[tuple[IndexedChunk, float]]:
         """混合检索，返回 (chunk, score)。"""
-        hits = hybrid_search(self, query, top_k)
+        hits = hybrid_search(self, query, self._params(top_k, params))
         return [(chunk, score) for chunk, score, _ in hits]
 
     def search_with_vector(
         self,
         query: str,
         query_vector: np.ndarray | None,
-        top_k: int = 5,
+        top_k: int | None = None,
+        *,
+        params: RetrievalParams | None = None,
     ) -> list[tuple[IndexedChunk, float]]:
         """混合检索（可传入预计算的 query 向量，避免重复 embed）。"""
-        hits = hybrid_search(self, query, top_k, query_vector=query_vector)
+        hits = hybrid_search(self, query, self._params(top_k, params), query_vector=query_vector)
         return [(chunk, score) for chunk, score, _ in hits]
 
-    def search_detailed(self, query: str, top_k: int = 5) -> list[tuple[IndexedChunk, float, dict[str, float]]]:
-        return hybrid_search(self, query, top_k)
+    def search_detailed(
+        self,
+        query: str,
+        top_k: int | None = None,
+        *,
+        params: RetrievalParams | None = None,
+        query_vector: np.ndarray | None = None,
+    ) -> list[tuple[IndexedChunk, float, dict[str, float]]]:
+        return hybrid_search(self, query, self._params(top_k, params), query_vector=query_vector)
+
+    def search_batch(
+        self,
+        queries: list[str],
+        top_k: int | None = None,
+        *,
+        params: RetrievalParams | None = None,
+    ) -> list[list[tuple[IndexedChunk, float, dict[str, float]]]]:
+        """批量混合检索：query 一次性 embed，向量分一次矩阵乘，BM25 逐条走倒排表。"""
+        return hybrid_search_batch(self, queries, self._params(top_k, params))
 
 
 class StoreManager:
-    def __init__(self) -> None:
-        self._stores: dict[str, VectorStore] = {}
+    """已加载知识库的驻留管理：LRU 淘汰冷库，使用中的库常驻（pin）。
+
+    被淘汰的库只是从字典移除，下次检索时经 get_store_for_search 重新 load_cache，
+    向量部分通过 memmap 按需读盘，重载成本主要是 JSON 元数据解析。
+    """
+
+    def __init__(self, memory_budget_bytes: int = KB_MEMORY_BUDGET_MB * 1024 * 1024) -> None:
+        self._stores: OrderedDict[str, VectorStore] = OrderedDict()
+        self._pinned: set[str] = set()
+        self._loading: dict[str, Future[VectorStore]] = {}
+        self._budget = memory_budget_bytes
+        self._lock = threading.RLock()
 
     def get(self, kb_id: str) -> VectorStore:
-        if kb_id not in self._stores:
-            _, index_path = get_kb_paths(kb_id)
-            self._stores[kb_id] = VectorStore(kb_id, index_path)
-        return self._stores[kb_id]
+        with self._lock:
+            store = self._stores.get(kb_id)
+            if store is None:
+                _, index_path = get_kb_paths(kb_id)
+                store = VectorStore(kb_id, index_path)
+                self._stores[kb_id] = store
+            self._stores.move_to_end(kb_id)
+            return store
 
     @property
     def active(self) -> VectorStore:
         return self.get(get_active_id())
 
+    def pin(self, kb_id: str) -> None:
+        """仅保留一个 pin：切换使用中的库时旧库回到 LRU 队列。"""
+        with self._lock:
+            self._pinned = {kb_id}
+
     def reload_active(self) -> VectorStore:
         kb_id = get_active_id()
-        self._stores.pop(kb_id, None)
-        store = self.get(kb_id)
+        with self._lock:
+            self._stores.pop(kb_id, None)
+            self.pin(kb_id)
+            store = self.get(kb_id)
         store.load_cache()
+        self.trim()
         return store
 
     def invalidate(self, kb_id: str) -> None:
-        self._stores.pop(kb_id, None)
+        with self._lock:
+            self._stores.pop(kb_id, None)
+
+    def refresh_params(self, kb_id: str) -> None:
+        """仅刷新已加载库的检索参数覆盖（未加载的库下次加载时自然读取）。"""
+        with self._lock:
+            store = self._stores.get(kb_id)
+        if store is not None:
+            store.refresh_retrieval_params()
+
+    def ensure_active(self) -> VectorStore:
+        """使用中的库已切换或尚未加载时重新加载并 pin。"""
+        kb_id = get_active_id()
+        with self._lock:
+            store = self._stores.get(kb_id)
+            current = store is not None and store.size > 0 and kb_id in self._pinned
+        if current:
+            return store
+        return self.reload_active()
+
+    def load(self, kb_id: str) -> VectorStore:
+        """加载指定库索引；同一库并发加载时后来者等待首个加载者的 readiness future。"""
+        with self._lock:
+            store = self.get(kb_id)
+            if store.size > 0:
+                return store
+            future = self._loading.get(kb_id)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._loading[kb_id] = future
+        if not owner:
+            return future.result()
+
+        try:
+            loaded = store.load_cache()
+            future.set_result(store)
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        finally:
+            with self._lock:
+                self._loading.pop(kb_id, None)
+        if loaded:
+            self.trim()
+        return store
+
+    async def load_async(self, kb_id: str) -> VectorStore:
+        """异步版 load：正在预热的库直接 await 其 future，否则在线程中加载。"""
+        with self._lock:
+            store = self._stores.get(kb_id)
+            if store is not None and store.size > 0:
+                self._stores.move_to_end(kb_id)
+                return store
+            future = self._loading.get(kb_id)
+        if future is not None:
+            return await asyncio.wrap_future(future)
+        return await asyncio.to_thread(self.load, kb_id)
+
+    def over_budget(self) -> bool:
+        with self._lock:
+            return sum(store.resident_bytes() for store in self._stores.values()) > self._budget
+
+    def trim(self) -> list[str]:
+        """按 LRU 淘汰未 pin 的库，直到常驻内存不超过预算；返回被淘汰的 kb_id。
+
+        最近一次访问的库总是保留，避免单库超预算时反复加载。
+        """
+        evicted: list[str] = []
+        with self._lock:
+            total = sum(store.resident_bytes() for store in self._stores.values())
+            for kb_id in list(self._stores)[:-1]:
+                if total <= self._budget:
+                    break
+                if kb_id in self._pinned:
+                    continue
+                total -= self._stores.pop(kb_id).resident_bytes()
+                evicted.append(kb_id)
+        return evicted
+
+    def residency(self) -> dict[str, object]:
+        with self._lock:
+            stores = list(self._stores.values())
+            pinned = set(self._pinned)
+        items = [
+            {
+                "kbId": store.kb_id,
+                "chunks": store.size,
+                "residentBytes": store.resident_bytes(),
+                "mappedBytes": store.mapped_bytes(),
+                "quantization": store.matrix.mode if store.matrix else None,
+                "pinned": store.kb_id in pinned,
+            }
+            for store in reversed(stores)
+            if store.size > 0
+        ]
+        return {
+            "budgetBytes": self._budget,
+            "residentBytes": sum(item["residentBytes"] for item in items),
+            "stores": items,
+        }
 
 
 store_manager = StoreManager()
@@ -213,8 +714,72 @@ def get_active_store() -> VectorStore:
 
 
 def get_store_for_search(kb_id: str) -> VectorStore:
-    """获取指定知识库向量存储，必要时从磁盘加载索引。"""
-    store = store_manager.get(kb_id)
-    if store.size == 0:
-        store.load_cache()
-    return store
+    """获取指定知识库向量存储，必要时从磁盘加载索引（加载后按内存预算淘汰冷库）。"""
+    return store_manager.load(kb_id)
+
+
+async def get_store_for_search_async(kb_id: str) -> VectorStore:
+    return await store_manager.load_async(kb_id)
+
+
+_T = TypeVar("_T")
+# 检索打分专用线程池：有界并发，避免多路对话同时检索时抢占默认线程池或阻塞事件循环
+_search_pool = ThreadPoolExecutor(max_workers=max(1, SEARCH_WORKERS), thread_name_prefix="kb-search")
+
+
+async def run_search(fn: Callable[..., _T], *args, **kwargs) -> _T:
+    """在检索线程池中执行同步打分函数（numpy 矩阵乘 / BM25 倒排遍历会释放 GIL）。"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_search_pool, partial(fn, *args, **kwargs))
+
+
+def _on_index_changed(kb_id: str) -> None:
+    """其它 worker 重建 / 删除了索引：丢弃本进程快照；使用中的库立即 memmap 新文件。"""
+    store_manager.invalidate(kb_id)
+    if kb_id == get_active_id():
+        store_manager.reload_active()
+
+
+def _on_registry_changed(_: str) -> None:
+    store_manager.ensure_active()
+
+
+generation_watcher.on_change("index", _on_index_changed)
+generation_watcher.on_change("params", store_manager.refresh_params)
+generation_watcher.on_change("kb-registry", _on_registry_changed)
+
+
+def _warmup_targets() -> list[str]:
+    mode = KB_WARMUP.lower()
+    if mode in ("", "none", "false", "off"):
+        return []
+    indexed = [str(b["id"]) for b in list_bases() if b.get("indexReady")]
+    if mode == "all":
+        targets = indexed
+    else:
+        wanted = [part.strip() for part in KB_WARMUP.split(",") if part.strip()]
+        targets = [kb_id for kb_id in wanted if kb_id in indexed]
+    active_id = get_active_id()
+    if active_id in targets:
+        targets = [active_id] + [t for t in targets if t != active_id]
+    return targets
+
+
+async def warm_up_stores(kb_ids: list[str] | None = None) -> list[str]:
+    """服务开始接收请求后在后台逐个预热知识库索引；超出内存预算即停止。"""
+    targets = kb_ids if kb_ids is not None else await asyncio.to_thread(_warmup_targets)
+    warmed: list[str] = []
+    for kb_id in targets:
+        if store_manager.over_budget():
+            print(f"知识库预热已达内存预算，跳过剩余 {len(targets) - len(warmed)} 个库")
+            break
+        try:
+            store = await store_manager.load_async(kb_id)
+        except (FileNotFoundError, ValueError, OSError) as exc:
+            print(f"知识库「{kb_id}」预热失败：{exc}")
+            continue
+        if store.size > 0:
+            warmed.append(kb_id)
+    if warmed:
+        print(f"已预热 {len(warmed)} 个知识库索引：{', '.join(warmed)}")
+    return warmed
@@ -0,0 +1,117 @@
+"""SSE 输出：token 合并发送、空闲心跳、客户端断开检测。"""
+from __future__ import annotations
+
+import asyncio
+import json
+from contextlib import suppress
+from typing import AsyncIterator
+
+from starlette.requests import Request
+
+from config import SSE_FLUSH_CHARS, SSE_FLUSH_MS, SSE_HEARTBEAT_SECONDS
+
+# request.is_disconnected() 的最小检查间隔（秒）
+_DISCONNECT_CHECK_INTERVAL = 0.5
+
+
+class _EndOfStream:
+    """上游流正常结束的队列标记。"""
+
+
+_END = _EndOfStream()
+
+
+def sse_event(event: str, payload: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+async def coalesced_sse(
+    request: Request,
+    source: AsyncIterator[tuple[str, dict | None]],
+) -> AsyncIterator[str]:
+    """
+    将 rag_stream 的 (token, meta) 流转为 SSE 帧。
+
+    - token 先缓冲，累计 SSE_FLUSH_CHARS 字符或距首个未发送 token 超过 SSE_FLUSH_MS 毫秒时合并为一帧
+    - 空闲超过 SSE_HEARTBEAT_SECONDS 秒发送注释行心跳，防止代理断开长连接
+    - 客户端断开后取消上游生成任务（连带取消 LLM 流式请求与后台 summary 任务）
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue[tuple[str, dict | None] | Exception | _EndOfStream] = asyncio.Queue()
+
+    async def pump() -> None:
+        try:
+            async for item in source:
+                queue.put_nowait(item)
+        except Exception as exc:
+            queue.put_nowait(exc)
+        else:
+            queue.put_nowait(_END)
+
+    producer = asyncio.create_task(pump())
+    flush_after = max(0, SSE_FLUSH_MS) / 1000
+    heartbeat = max(1, SSE_HEARTBEAT_SECONDS)
+    buffer: list[str] = []
+    buffered = 0
+    first_buffered_at = 0.0
+    last_sent_at = loop.time()
+    next_disconnect_check = loop.time() + _DISCONNECT_CHECK_INTERVAL
+    meta: dict | None = None
+
+    def flush() -> str:
+        nonlocal buffer, buffered, last_sent_at
+        frame = sse_event("token", {"text": "".join(buffer)})
+        buffer, buffered = [], 0
+        last_sent_at = loop.time()
+        return frame
+
+    try:
+        while True:
+            now = loop.time()
+            deadline = first_buffered_at + flush_after if buffer else last_sent_at + heartbeat
+            timeout = min(max(0.0, deadline - now), _DISCONNECT_CHECK_INTERVAL)
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                item = None
+
+            now = loop.time()
+            if now >= next_disconnect_check:
+                next_disconnect_check = now + _DISCONNECT_CHECK_INTERVAL
+                if await request.is_disconnected():
+                    return
+
+            if isinstance(item, _EndOfStream):
+                break
+            if isinstance(item, Exception):
+                if buffer:
+                    yield flush()
+                yield sse_event("error", {"message": str(item)})
+                return
+            if item is None:
+                if buffer and now - first_buffered_at >= flush_after:
+                    yield flush()
+                elif not buffer and now - last_sent_at >= heartbeat:
+                    last_sent_at = now
+                    yield ": ping\n\n"
+                continue
+
+            token, done = item
+            if done is not None:
+                meta = done
+            if token:
+                if not buffer:
+                    first_buffered_at = now
+                buffer.append(token)
+                buffered += len(token)
+                if buffered >= SSE_FLUSH_CHARS or now - first_buffered_at >= flush_after:
+                    yield flush()
+
+        if buffer:
+            yield flush()
+        yield sse_event("done", meta or {"citations": [], "refused": False})
+    finally:
+        if not producer.done():
+            producer.cancel()
+            with suppress(asyncio.CancelledError):
+                await producer
@@ -0,0 +1,65 @@
+"""extract_edit_slots_by_rules 规则快速路径用例（基于 examples/demo-list.spec.json）。"""
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from config import PROTOTYPE_SKELETON_DIR
+from prototype_edit_slots import EditOperationSlots, extract_edit_slots_by_rules
+
+SPEC = json.loads((PROTOTYPE_SKELETON_DIR / "examples" / "demo-list.spec.json").read_text(encoding="utf-8"))
+
+# (指令, 期望槽位)；None 表示规则路径放弃，交给 LLM
+CASES: list[tuple[str, dict | None]] = [
+    ("新增审核按钮", {"opType": "add", "targetType": "toolbarButton", "payload": {"label": "审核"}}),
+    ("新增按钮：审核", {"opType": "add", "targetType": "toolbarButton", "payload": {"label": "审核"}}),
+    ("新增按钮叫审核", {"opType": "add", "targetType": "toolbarButton", "payload": {"label": "审核"}}),
+    ("新增一个名为审核的按钮", None),
+    ("新增审核按钮和导出按钮", None),
+    ("新增备注列", {"opType": "add", "targetType": "column", "payload": {"label": "备注", "fieldType": "text"}}),
+    ("删除创建时间列", {"opType": "remove", "targetType": "column", "targetMatch": "创建时间"}),
+    ("删除创建时间列和状态列", None),
+    ("删除状态筛选", {"opType": "remove", "targetType": "filter", "targetMatch": "状态"}),
+    ("删除状态", None),
+    (
+        "把新增价卡改名为新建",
+        {
+            "opType": "update",
+            "targetType": "toolbarButton",
+            "targetMatch": "新增价卡",
+            "changeKind": "label",
+            "payload": {"label": "新建"},
+        },
+    ),
+    (
+        "把新增价卡改成红色",
+        {
+            "opType": "update",
+            "targetType": "toolbarButton",
+            "targetMatch": "新增价卡",
+            "changeKind": "style",
+            "payload": {"variant": "danger"},
+        },
+    ),
+    ("把价卡名称改名为名称", None),
+    ("不要删除状态列", None),
+    ("删除状态列吗", None),
+    ("删除状态列？", None),
+    ("不要新增备注列", None),
+    ("别新增审核按钮", None),
+    ("不用把新增价卡改成红色", None),
+    ("是否删除创建时间列", None),
+]
+
+
+@pytest.mark.parametrize(("instruction", "expected"), CASES)
+def test_extract_edit_slots_by_rules(instruction: str, expected: dict | None) -> None:
+    result = extract_edit_slots_by_rules(SPEC, instruction, EditOperationSlots())
+    if expected is None:
+        assert result is None
+        return
+    assert result is not None
+    got = result.to_dict()
+    for key, value in expected.items():
+        assert got[key] == value, key
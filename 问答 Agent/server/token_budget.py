@@ -0,0 +1,40 @@
+"""提示词 token 估算（不依赖具体 tokenizer，按中英文字符粗估）。"""
+from __future__ import annotations
+
+import re
+
+# CJK 字符通常 1 字 ≈ 1 token；英文 / 数字按约 4 字符 1 token；其余符号单独计
+_CJK_RE = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]")
+_LATIN_RE = re.compile(r"[A-Za-z0-9_]+")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗估文本 token 数：CJK 按字计，拉丁词按 4 字符 1 token，标点等其余字符各计 1。"""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    latin = 0
+    latin_chars = 0
+    for word in _LATIN_RE.findall(text):
+        latin += (len(word) + 3) // 4
+        latin_chars += len(word)
+    spaces = sum(len(m) for m in _SPACE_RE.findall(text))
+    other = max(0, len(text) - cjk - latin_chars - spaces)
+    return cjk + latin + other
+
+
+def truncate_to_tokens(text: str, budget: int, *, ellipsis: str = "…") -> str:
+    """截断到约 budget 个 token（二分查找字符位置），超出时追加省略号。"""
+    if budget <= 0:
+        return ""
+    if estimate_tokens(text) <= budget:
+        return text
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if estimate_tokens(text[:mid]) <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo].rstrip() + ellipsis
@@ -0,0 +1,172 @@
+"""向量矩阵：float32 / float16 / int8 标量量化存储与余弦打分。"""
+from __future__ import annotations
+
+import numpy as np
+
+QUANTIZATION_MODES = ("none", "float16", "int8")
+
+# 分块打分，避免量化矩阵整体反量化成 float32 临时副本
+_BLOCK_ROWS = 4096
+
+
+def _row_norms(raw: np.ndarray) -> np.ndarray:
+    norms = np.empty(raw.shape[0], dtype=np.float32)
+    for start in range(0, raw.shape[0], _BLOCK_ROWS):
+        block = np.asarray(raw[start : start + _BLOCK_ROWS], dtype=np.float32)
+        norms[start : start + len(block)] = np.sqrt(np.einsum("ij,ij->i", block, block))
+    norms[norms == 0] = 1.0
+    return norms
+
+
+class VectorMatrix:
+    """按知识库持有的向量矩阵。
+
+    - none：直接使用原始 float32 矩阵（通常为 np.memmap，常驻内存只有范数）
+    - float16：单位向量半精度存储，内存约 1/2
+    - int8：单位向量按行缩放到 [-127, 127]，附每行 scale，内存约 1/4
+
+    原始矩阵为 memmap 时保留引用，供 top 候选精确重打分（只会读入被访问的行）。
+    """
+
+    def __init__(self, raw: np.ndarray, mode: str = "none") -> None:
+        if mode not in QUANTIZATION_MODES:
+            raise ValueError(f"不支持的向量量化模式: {mode}")
+        if raw.ndim != 2:
+            raise ValueError("向量矩阵必须是二维")
+        self.mode = mode
+        self.dim = int(raw.shape[1])
+        self._size = int(raw.shape[0])
+        norms = _row_norms(raw)
+        self._inv_norm = (1.0 / norms).astype(np.float32)
+        self._codes: np.ndarray | None = None
+        self._scale: np.ndarray | None = None
+        self._raw: np.ndarray | None = None
+
+        if mode == "none":
+            self._raw = raw
+            return
+
+        dtype = np.float16 if mode == "float16" else np.int8
+        codes = np.empty(raw.shape, dtype=dtype)
+        scale = np.ones(self._size, dtype=np.float32) if mode == "int8" else None
+        for start in range(0, self._size, _BLOCK_ROWS):
+            end = min(start + _BLOCK_ROWS, self._size)
+            unit = np.asarray(raw[start:end], dtype=np.float32) * self._inv_norm[start:end, None]
+            if mode == "float16":
+                codes[start:end] = unit.astype(np.float16)
+                continue
+            peak = np.abs(unit).max(axis=1)
+            peak[peak == 0] = 1.0
+            block_scale = (peak / 127.0).astype(np.float32)
+            codes[start:end] = np.clip(np.rint(unit / block_scale[:, None]), -127, 127).astype(np.int8)
+            scale[start:end] = block_scale
+        self._codes = codes
+        self._scale = scale
+        # 量化后仅在原始矩阵为 memmap 时保留（精确重打分按需读盘，不占常驻内存）
+        if isinstance(raw, np.memmap):
+            self._raw = raw
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def raw(self) -> np.ndarray | None:
+        return self._raw
+
+    @property
+    def can_rescore(self) -> bool:
+        return self.mode != "none" and self._raw is not None
+
+    def resident_bytes(self) -> int:
+        total = self._inv_norm.nbytes
+        if self._codes is not None:
+            total += self._codes.nbytes
+        if self._scale is not None:
+            total += self._scale.nbytes
+        if self._raw is not None and not isinstance(self._raw, np.memmap):
+            total += self._raw.nbytes
+        return total
+
+    def mapped_bytes(self) -> int:
+        if isinstance(self._raw, np.memmap):
+            return int(self._raw.nbytes)
+        return 0
+
+    def scores(self, qv: np.ndarray) -> np.ndarray:
+        """返回全部行与 query 的余弦分（float32，长度 size）。"""
+        q = np.asarray(qv, dtype=np.float32).reshape(-1)
+        qn = float(np.linalg.norm(q)) or 1.0
+        q = q / qn
+        out = np.empty(self._size, dtype=np.float32)
+        for start in range(0, self._size, _BLOCK_ROWS):
+            end = min(start + _BLOCK_ROWS, self._size)
+            if self.mode == "none":
+                block = np.asarray(self._raw[start:end], dtype=np.float32)
+                out[start:end] = (block @ q) * self._inv_norm[start:end]
+            else:
+                block = self._codes[start:end].astype(np.float32)
+                out[start:end] = block @ q
+                if self._scale is not None:
+                    out[start:end] *= self._scale[start:end]
+        return out
+
+    def scores_batch(self, queries: np.ndarray) -> np.ndarray:
+        """多个 query 一次矩阵乘打分，返回 (len(queries), size) 的余弦分矩阵。"""
+        q = np.asarray(queries, dtype=np.float32)
+        if q.ndim == 1:
+            q = q.reshape(1, -1)
+        qn = np.linalg.norm(q, axis=1)
+        qn[qn == 0] = 1.0
+        qt = (q / qn[:, None]).T
+        out = np.empty((q.shape[0], self._size), dtype=np.float32)
+        for start in range(0, self._size, _BLOCK_ROWS):
+            end = min(start + _BLOCK_ROWS, self._size)
+            if self.mode == "none":
+                block = np.asarray(self._raw[start:end], dtype=np.float32)
+                out[:, start:end] = ((block @ qt) * self._inv_norm[start:end, None]).T
+            else:
+                block = self._codes[start:end].astype(np.float32) @ qt
+                if self._scale is not None:
+                    block *= self._scale[start:end, None]
+                out[:, start:end] = block.T
+        return out
+
+    def top_batch(self, queries: np.ndarray, limit: int) -> list[list[tuple[int, float]]]:
+        q = np.asarray(queries, dtype=np.float32)
+        count = 1 if q.ndim == 1 else q.shape[0]
+        if self._size == 0 or limit <= 0:
+            return [[] for _ in range(count)]
+        return [top_from_scores(row, limit) for row in self.scores_batch(q)]
+
+    def top(self, qv: np.ndarray, limit: int) -> list[tuple[int, float]]:
+        if self._size == 0 or limit <= 0:
+            return []
+        scores = self.scores(qv)
+        return top_from_scores(scores, limit)
+
+    def exact_scores(self, qv: np.ndarray, indices: list[int]) -> list[tuple[int, float]]:
+        """对指定行用原始 float32 向量精确重打分（不可用时原样返回空列表）。"""
+        if self._raw is None or not indices:
+            return []
+        q = np.asarray(qv, dtype=np.float32).reshape(-1)
+        qn = float(np.linalg.norm(q)) or 1.0
+        idx = np.asarray(indices, dtype=np.int64)
+        rows = np.asarray(self._raw[np.sort(idx)], dtype=np.float32)
+        order = np.argsort(np.argsort(idx))
+        rows = rows[order]
+        exact = (rows @ q) * self._inv_norm[idx] / qn
+        return [(int(i), float(s)) for i, s in zip(idx, exact)]
+
+
+def top_from_scores(scores: np.ndarray, limit: int) -> list[tuple[int, float]]:
+    """取分数最高的 limit 项（同分按下标升序），返回 (idx, score)。"""
+    k = min(limit, len(scores))
+    if k <= 0:
+        return []
+    if k < len(scores):
+        part = np.argpartition(-scores, k - 1)[:k]
+    else:
+        part = np.arange(len(scores))
+    ordered = part[np.lexsort((part, -scores[part]))]
+    return [(int(i), float(scores[i])) for i in ordered]